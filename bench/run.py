@@ -0,0 +1,210 @@
+# bench/run.py
+"""
+Benchmark des étapes d'un calcul Epeire, sans accès réseau : GraphHopper et Nominatim sont remplacés par
+bench.stub_server et filtered_nodes par une table synthétique chargée dans une base PostGIS locale
+(la base doit exister ; l'extension postgis est créée si besoin).
+
+    python -m bench.run --dbname epeire_bench --nodes 10000 100000 1000000 --engines sql numpy incremental --output bench.json
+
+Le résultat est un JSON : pour chaque taille et chaque moteur, la durée de chaque étape à chaque répétition.
+"""
+import argparse
+import json
+import logging
+import random
+import statistics
+import subprocess
+from contextlib import contextmanager
+from time import perf_counter, time
+from typing import Dict, List
+
+from bench.stub_server import start_stub_server, load_recordings, SYNTHETIC_SPEED, FIXTURE_FILE
+from bench.synthetic import prepare_database
+from core.epeire import DYNAMIC_COLUMNS
+from core.scoring import compute_base_features, score_matrix, iter_points, iter_points_incremental
+from core.zone import Zone
+from utils.db_utils import (
+    DatabaseSession,
+    NON_FEATURE_COLUMNS,
+    apply_sigmoid,
+    close_pool,
+    count_rows,
+    create_table_from_isochrone,
+    get_db_attributes,
+    get_top_point,
+    normalize_column,
+    score_zone,
+    set_distance_to_point,
+    set_sigmoid,
+    update_score_from_points_repeltion,
+)
+from utils.geocoding import geocode, get_geocoding_cache
+from utils.utils import get_isochrones, set_config, simplify_geometry, to_mercator_geometry
+
+TABLE_NAME: str = "zone_bench"
+ADDRESS: str = "Place de la Libération, Auch"
+CENTER = (43.6465, 0.5855)
+# Direction de fuite (degrés) : l'azimut est toujours calculé
+ANGLE_FUITE: int = 0
+
+class StageTimer:
+    """
+    Enregistre la durée de chaque étape nommée.
+    """
+    def __init__(self) -> None:
+        self.stages: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = perf_counter() - start
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+def run_sql_engine(timer: StageTimer, strategie: Dict, coords, angle_fuite, n_points: int, rng: random.Random) -> None:
+    """
+    Étapes du moteur SQL : score en une requête, puis une passe de répulsion par point.
+    """
+    attrs = get_db_attributes(blacklist=NON_FEATURE_COLUMNS + DYNAMIC_COLUMNS, table_name=TABLE_NAME)
+    with timer.stage("scoring"):
+        score_zone(TABLE_NAME, coords, angle_fuite, strategie, attrs)
+
+    points = []
+    for i in range(n_points):
+        with timer.stage(f"pick_{i}"):
+            if i > 0:
+                column = f"distance_to_point_{i}"
+                set_distance_to_point(TABLE_NAME, points[-1], column)
+                normalize_column(TABLE_NAME, column)
+                apply_sigmoid(TABLE_NAME, column, scale=strategie['points_repeltion_alpha'])
+                update_score_from_points_repeltion(TABLE_NAME, strategie, column)
+            points.append(get_top_point(TABLE_NAME, rng))
+
+def run_numpy_engine(timer: StageTimer, strategie: Dict, coords, angle_fuite, n_points: int, rng: random.Random, incremental: bool) -> None:
+    """
+    Étapes des moteurs en mémoire, avec les fonctions de core.scoring utilisées par Epeire :
+    chargement de la zone, attributs normalisés indépendants de la stratégie, score, points.
+    """
+    attrs = get_db_attributes(blacklist=NON_FEATURE_COLUMNS + DYNAMIC_COLUMNS, table_name=TABLE_NAME)
+    with timer.stage("zone_load"):
+        zone = Zone.from_table(TABLE_NAME, attrs)
+
+    with timer.stage("base_features"):
+        base = compute_base_features(zone, coords, angle_fuite)
+
+    with timer.stage("scoring"):
+        scores = score_matrix(base, [strategie])[:, 0]
+
+    picker = iter_points_incremental if incremental else iter_points
+    points = picker(zone, scores, strategie, rng)
+    for i in range(n_points):
+        with timer.stage(f"pick_{i}"):
+            if next(points, None) is None:
+                break
+
+def run_once(engine: str, strategie: Dict, time_limit: int, delta_time: int, n_points: int, seed: int) -> Dict:
+    """
+    Exécute un calcul complet et retourne la durée de chaque étape et la taille de la zone.
+    """
+    timer = StageTimer()
+    get_geocoding_cache().clear()
+    with timer.stage("geocode"):
+        coords = geocode(ADDRESS)
+
+    with timer.stage("isochrones"):
+        isochrones = get_isochrones(coords, [time_limit + delta_time + 10*60, time_limit + delta_time, time_limit])
+        isochrone_A, isochrone_B, _ = (simplify_geometry(to_mercator_geometry(iso)) for iso in isochrones)
+        valid_zone = isochrone_A.difference(isochrone_B)
+
+    session = DatabaseSession()
+    try:
+        with session.activate():
+            with timer.stage("zone_extraction"):
+                create_table_from_isochrone(TABLE_NAME, valid_zone, srid=3857)
+            zone_nodes = count_rows(TABLE_NAME)
+
+            rng = random.Random(seed)
+            if engine == "sql":
+                run_sql_engine(timer, strategie, coords, ANGLE_FUITE, n_points, rng)
+            else:
+                run_numpy_engine(timer, strategie, coords, ANGLE_FUITE, n_points, rng, engine == "incremental")
+    finally:
+        session.close(commit=False)
+
+    return {"stages": timer.stages, "zone_nodes": zone_nodes}
+
+def summarize(runs: List[Dict[str, float]]) -> Dict[str, Dict]:
+    stages = {}
+    for name in runs[0]:
+        values = [run[name] for run in runs if name in run]
+        stages[name] = {"runs": values, "median": statistics.median(values), "min": min(values)}
+    return stages
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark par étape d'Epeire, sans accès réseau")
+    parser.add_argument("--dbname", default="epeire_bench", help="base PostGIS locale utilisée pour les nœuds synthétiques")
+    parser.add_argument("--nodes", type=int, nargs="+", default=[10_000, 100_000], help="tailles de filtered_nodes")
+    parser.add_argument("--engines", nargs="+", default=["sql", "numpy", "incremental"])
+    parser.add_argument("--points", type=int, default=5)
+    parser.add_argument("--time", type=int, default=30 * 60, help="temps de fuite (s)")
+    parser.add_argument("--dt", type=int, default=10 * 60, help="délai de positionnement (s)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fixtures", default=FIXTURE_FILE, help="isochrones enregistrées (sinon générées)")
+    parser.add_argument("--strategy", default="force", help="stratégie de data/modes.json")
+    parser.add_argument("--output", help="fichier JSON de sortie (sinon la sortie standard)")
+    args = parser.parse_args()
+
+    with open("data/modes.json") as infile:
+        strategie = json.load(infile)[args.strategy]
+
+    server, address = start_stub_server(recordings=load_recordings(args.fixtures), address_coords=CENTER)
+    set_config("graphhopper", {"url": f"http://{address}"})
+    set_config("geocoding", {"domain": address, "scheme": "http", "path": None})
+    set_config("isochrone_cache", {"enabled": False})
+    set_config("database", {"dbname": args.dbname})
+    close_pool()
+    set_sigmoid()
+
+    # Les nœuds couvrent l'isochrone la plus large
+    radius = 1.3 * (args.time + args.dt + 10 * 60) * SYNTHETIC_SPEED
+    results = []
+    try:
+        for n_nodes in args.nodes:
+            start = perf_counter()
+            prepare_database(n_nodes, CENTER, radius, args.seed)
+            logging.info(f"{n_nodes} nœuds chargés en {perf_counter() - start:.2f}s")
+
+            for engine in args.engines:
+                runs = [run_once(engine, strategie, args.time, args.dt, args.points, args.seed) for _ in range(args.repeat)]
+                results.append({
+                    "nodes": n_nodes,
+                    "engine": engine,
+                    "zone_nodes": runs[0]["zone_nodes"],
+                    "stages": summarize([run["stages"] for run in runs]),
+                })
+    finally:
+        server.shutdown()
+        close_pool()
+
+    report = {
+        "commit": git_commit(),
+        "created": time(),
+        "params": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as outfile:
+            json.dump(report, outfile, indent=4)
+    else:
+        print(json.dumps(report, indent=4))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+# bench/stub_server.py
+"""
+Serveur HTTP local qui imite GraphHopper (/isochrone) et Nominatim (/search) pour les benchmarks.
+
+Les isochrones sont servies depuis un enregistrement (voir la commande `record`), translatées vers le
+point demandé, ou à défaut générées : un disque irrégulier dont le rayon croît avec la durée.
+
+    python -m bench.stub_server record --url http://localhost:8989 --lat 43.64 --lon 0.58 --times 1800 2400 3000
+    python -m bench.stub_server serve --port 8990
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+import requests
+
+FIXTURE_FILE: str = "bench/fixtures/isochrones.json"
+# Vitesse moyenne utilisée pour les isochrones générées (m/s)
+SYNTHETIC_SPEED: float = 13.9
+METERS_PER_DEGREE: float = 111320.0
+
+def load_recordings(path: str = FIXTURE_FILE) -> Optional[Dict]:
+    """
+    Charge les isochrones enregistrées ({"center": [lat, lon], "polygons": {temps: géométrie}}), si le fichier existe.
+    """
+    try:
+        with open(path) as infile:
+            return json.load(infile)
+    except FileNotFoundError:
+        return None
+
+def synthetic_isochrone(center: Tuple[float, float], time_limit: int, vertices: int = 2000) -> Dict:
+    """
+    Génère un polygone isochrone déterministe : un disque irrégulier de rayon proportionnel à la durée.
+    """
+    lat, lon = center
+    radius = time_limit * SYNTHETIC_SPEED
+    rng = random.Random(time_limit)
+    ring = []
+    for i in range(vertices):
+        theta = 2 * math.pi * i / vertices
+        r = radius * (1 + 0.15 * math.sin(7 * theta) + 0.03 * rng.random())
+        ring.append([
+            lon + r * math.sin(theta) / (METERS_PER_DEGREE * math.cos(math.radians(lat))),
+            lat + r * math.cos(theta) / METERS_PER_DEGREE,
+        ])
+    ring.append(ring[0])
+    return {"type": "Polygon", "coordinates": [ring]}
+
+def recorded_isochrone(recordings: Dict, center: Tuple[float, float], time_limit: int) -> Dict:
+    """
+    Retourne l'isochrone enregistrée de durée la plus proche, translatée vers le point demandé.
+    """
+    polygons = recordings["polygons"]
+    closest = min(polygons, key=lambda t: abs(int(t) - time_limit))
+    d_lat = center[0] - recordings["center"][0]
+    d_lon = center[1] - recordings["center"][1]
+    geometry = polygons[closest]
+
+    def shift(coords):
+        if isinstance(coords[0], (int, float)):
+            return [coords[0] + d_lon, coords[1] + d_lat]
+        return [shift(c) for c in coords]
+
+    return {"type": geometry["type"], "coordinates": shift(geometry["coordinates"])}
+
+class StubHandler(BaseHTTPRequestHandler):
+    recordings: Optional[Dict] = None
+    vertices: int = 2000
+    address_coords: Tuple[float, float] = (43.6465, 0.5855)
+
+    def log_message(self, format, *args) -> None:
+        logging.debug(format % args)
+
+    def _send_json(self, data, status: int = 200) -> None:
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path == "/isochrone":
+            lat, lon = map(float, query["point"][0].split(","))
+            time_limit = int(float(query["time_limit"][0]))
+            if self.recordings:
+                geometry = recorded_isochrone(self.recordings, (lat, lon), time_limit)
+            else:
+                geometry = synthetic_isochrone((lat, lon), time_limit, self.vertices)
+            self._send_json({"polygons": [{"type": "Feature", "properties": {"bucket": 0}, "geometry": geometry}]})
+        elif url.path == "/search":
+            lat, lon = self.address_coords
+            self._send_json([{"place_id": 1, "lat": str(lat), "lon": str(lon), "display_name": query.get("q", [""])[0]}])
+        else:
+            self._send_json({"message": "not found"}, 404)
+
+def start_stub_server(port: int = 0, recordings: Optional[Dict] = None, vertices: int = 2000, address_coords: Tuple[float, float] = None) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Démarre le serveur dans un thread et retourne le serveur et son adresse (host:port).
+    """
+    handler = type("Handler", (StubHandler,), {
+        "recordings": recordings,
+        "vertices": vertices,
+        "address_coords": address_coords or StubHandler.address_coords,
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"127.0.0.1:{server.server_address[1]}"
+
+def record(url: str, center: Tuple[float, float], times: List[int], output: str, profile: str = "car") -> None:
+    """
+    Enregistre des isochrones d'un vrai serveur GraphHopper dans un fichier de fixtures.
+    """
+    polygons = {}
+    for time_limit in times:
+        response = requests.get(f"{url}/isochrone", params={"point": f"{center[0]},{center[1]}", "time_limit": time_limit, "profile": profile})
+        response.raise_for_status()
+        polygons[str(time_limit)] = response.json()["polygons"][0]["geometry"]
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as outfile:
+        json.dump({"center": list(center), "polygons": polygons}, outfile)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serveur GraphHopper/Nominatim local pour les benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="sert les isochrones enregistrées ou générées")
+    serve.add_argument("--port", type=int, default=8990)
+    serve.add_argument("--fixtures", default=FIXTURE_FILE)
+    serve.add_argument("--vertices", type=int, default=2000)
+
+    rec = commands.add_parser("record", help="enregistre des isochrones d'un serveur GraphHopper")
+    rec.add_argument("--url", default="http://localhost:8989")
+    rec.add_argument("--lat", type=float, required=True)
+    rec.add_argument("--lon", type=float, required=True)
+    rec.add_argument("--times", type=int, nargs="+", required=True)
+    rec.add_argument("--output", default=FIXTURE_FILE)
+
+    args = parser.parse_args()
+    if args.command == "record":
+        record(args.url, (args.lat, args.lon), args.times, args.output)
+        return
+
+    server, address = start_stub_server(args.port, load_recordings(args.fixtures), args.vertices)
+    logging.info(f"Serveur de test sur http://{address}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
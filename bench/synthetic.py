@@ -0,0 +1,60 @@
+# bench/synthetic.py
+"""
+Génération d'une table filtered_nodes synthétique de taille donnée, chargée par COPY dans une base PostGIS locale.
+"""
+import io
+import math
+import psycopg2
+import numpy as np
+from typing import Tuple
+
+from utils.db_utils import connect_database, refresh_node_stats, STATIC_FEATURES, FILTERED_NODES_DDL, FILTERED_NODES_INDEXES
+from utils.np_utils import to_mercator
+
+CHUNK_SIZE: int = 100_000
+
+@connect_database
+def load_synthetic_nodes(cur: psycopg2.extensions.cursor, n_nodes: int, center: Tuple[float, float], radius: float, seed: int = 0) -> None:
+    """
+    Remplace filtered_nodes par n_nodes intersections tirées uniformément dans un disque de `radius` mètres
+    autour de `center` (lat, lon), avec des attributs statiques plausibles.
+    """
+    rng = np.random.default_rng(seed)
+    center_x, center_y = to_mercator(*center)
+    # Les distances EPSG:3857 sont dilatées d'un facteur 1 / cos(lat)
+    scale = radius / math.cos(math.radians(center[0]))
+
+    cur.execute(f"""
+        CREATE EXTENSION IF NOT EXISTS postgis;
+        DROP TABLE IF EXISTS filtered_nodes;
+        {FILTERED_NODES_DDL}
+    """)
+    columns = ["osmid", "region"] + STATIC_FEATURES + ["geometry"]
+    for start in range(0, n_nodes, CHUNK_SIZE):
+        size = min(CHUNK_SIZE, n_nodes - start)
+        r = scale * np.sqrt(rng.random(size))
+        theta = 2 * np.pi * rng.random(size)
+        x = center_x + r * np.cos(theta)
+        y = center_y + r * np.sin(theta)
+        degree = rng.choice([1, 3, 3, 3, 4, 4, 5], size)
+        speeds = np.sort(rng.choice([30, 50, 70, 80, 90, 110, 130], (size, 2)), axis=1)
+        lanes = np.sort(rng.integers(1, 4, (size, 2)), axis=1)
+        importance = rng.integers(1, 8, size)
+
+        buffer = io.StringIO()
+        for i in range(size):
+            buffer.write(
+                f"{start + i}\tbench\t{degree[i]}\t{speeds[i, 1]}\t{speeds[i].mean()}\t{speeds[i, 0]}\t"
+                f"{lanes[i, 1]}\t{lanes[i].mean()}\t{lanes[i, 0]}\t{importance[i]}\tSRID=3857;POINT({x[i]} {y[i]})\n"
+            )
+        buffer.seek(0)
+        cur.copy_expert(f"COPY filtered_nodes ({', '.join(columns)}) FROM STDIN", buffer)
+
+    cur.execute(FILTERED_NODES_INDEXES)
+
+def prepare_database(n_nodes: int, center: Tuple[float, float], radius: float, seed: int = 0) -> None:
+    """
+    Charge les nœuds synthétiques puis calcule leurs statistiques.
+    """
+    load_synthetic_nodes(n_nodes, center, radius, seed)
+    refresh_node_stats()
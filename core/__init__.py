@@ -1,5 +1,8 @@
 # core/__init__.py
 
 from .epeire import Epeire
+from .zone import Zone, PreparedZone
+from .node_store import NodeStore
+from .road_graph import RoadGraph
 
-__all__ = ["Epeire"]
+__all__ = ["Epeire", "Zone", "PreparedZone", "NodeStore", "RoadGraph"]
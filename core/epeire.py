@@ -1,39 +1,118 @@
 # core/Epeire.py
-import osmnx as ox
+import random
+import threading
+import weakref
 from typing import Tuple, List, Dict, Any
-from shapely.geometry import Polygon, mapping
+import numpy as np
+from shapely.geometry import mapping
 
 
 # Import depuis le dossier utils
 from utils.utils import (
-    get_isochrone,
+    get_isochrones,
     get_angle_fuite,
+    to_mercator_geometry,
+    to_wgs84_geometry,
+    simplify_geometry,
+    load_config,
 )
+from utils.geocoding import geocode
 
 from utils.db_utils import (
     get_db_attributes,
-    set_distance_to_start,
     create_table_from_isochrone,
     normalize_column,
-    set_difference_angle,
-    set_score,
+    score_zone,
     update_score_from_points_repeltion,
     set_distance_to_point,
     get_top_point,
     apply_sigmoid,
-    set_sigmoid
+    install_database_functions,
+    get_node_stats,
+    get_region,
+    DatabaseSession,
+    NON_FEATURE_COLUMNS
 )
 
+from core.zone import Zone, PreparedZone
+from core.node_store import NodeStore
+from core.road_graph import RoadGraph
+from core.scoring import compute_base_features, strategy_features, score_matrix, decimate, pick_points, pick_points_incremental
+from utils.np_utils import weighted_score
+from utils.cache import LRUCache
+from utils.metrics import metrics, SIZE_BUCKETS
+
+# Moteurs de calcul des scores disponibles
+ENGINES: Tuple[str, ...] = ("sql", "numpy", "incremental")
+# Moteurs disponibles pour les scénarios groupés, qui évaluent toutes les stratégies d'une zone en mémoire
+BATCH_ENGINES: Tuple[str, ...] = ("numpy", "incremental")
+# Statistiques utilisées pour normaliser les attributs statiques : la zone, tous les nœuds ou la région du départ
+NORMALIZATIONS: Tuple[str, ...] = ("zone", "global", "region")
+# Colonnes calculées par Epeire, absentes de filtered_nodes
+DYNAMIC_COLUMNS: List[str] = ["distance_to_start", "difference_angle", "score"]
+
+ZONE_CACHE_DEFAULTS: Dict = {
+    "enabled": True,
+    "max_size": 16,
+    "ttl": 900,
+}
+
+# Réduction des très grandes zones aux meilleurs candidats de chaque cellule d'une grille, avant le score
+DECIMATION_DEFAULTS: Dict = {
+    "enabled": False,
+    "min_nodes": 50_000,
+    "max_cells": 5_000,
+    "top_k": 3,
+    "min_cell_size": 100.0,
+}
+
+_zone_cache: LRUCache = None
+_zone_cache_lock = threading.Lock()
+
+def get_zone_cache() -> LRUCache:
+    """
+    Retourne le cache des zones préparées du processus (None s'il est désactivé dans la configuration).
+    """
+    global _zone_cache
+    params = load_config("zone_cache", ZONE_CACHE_DEFAULTS)
+    if not params["enabled"]:
+        return None
+    if _zone_cache is None:
+        with _zone_cache_lock:
+            if _zone_cache is None:
+                _zone_cache = LRUCache(params["max_size"], params["ttl"])
+    return _zone_cache
+
+def new_seed() -> int:
+    """
+    Tire une nouvelle graine pour la sélection des points.
+    """
+    return random.SystemRandom().randrange(2**31)
+
 class Epeire:
-    def __init__(self, starting_point: str, direction_fuite: float | str = None) -> None:
+    def __init__(self, starting_point: str, direction_fuite: float | str = None, starting_coords: Tuple[float, float] = None, normalization: str = "zone", node_store: NodeStore = None, road_graph: RoadGraph = None) -> None:
         """
         Initialise la classe Epeire avec un point de départ et une direction de fuite.
+        Si `starting_coords` (lat, lon) est fourni, l'adresse n'est pas géocodée.
+        `normalization` choisit les bornes min-max des attributs statiques : celles de la zone (exact),
+        ou celles précalculées à l'import pour tous les nœuds ("global") ou la région du départ ("region").
+        Avec un `node_store`, les zones sont extraites du magasin de nœuds en mémoire, sans base de données :
+        seuls les moteurs "numpy" et "incremental" sont alors disponibles.
+        Avec un `road_graph`, les isochrones et la zone sont calculées localement par une seule recherche dans le graphe
+        routier, sans serveur d'isochrones ni base de données (mêmes restrictions de moteurs).
         """
+        if normalization not in NORMALIZATIONS:
+            raise ValueError(f"Normalisation inconnue: {normalization}")
+        self.normalization = normalization
+
         # Obtention des coordonnées de commission de l'infraction
-        try:
-            self.starting_coords: Tuple[float, float] = ox.geocode(starting_point)
-        except Exception as e:
-            raise ValueError(f"Erreur de géocodage pour l'adresse '{starting_point}': {e}")
+        if starting_coords is not None:
+            self.starting_coords: Tuple[float, float] = (float(starting_coords[0]), float(starting_coords[1]))
+        else:
+            try:
+                self.starting_coords: Tuple[float, float] = geocode(starting_point)
+            except Exception as e:
+                raise ValueError(f"Erreur de géocodage pour l'adresse '{starting_point}': {e}")
         
         # Obtention de l'angle de fuite
         try:
@@ -41,70 +120,152 @@ class Epeire:
         except Exception as e:
             raise RuntimeError(f"Erreur lors de l'obtention de l'angle de fuite: {e}")
         
+        # Chaque instance a sa propre connexion et sa propre transaction : la zone est une table
+        # temporaire, invisible des autres requêtes et supprimée à la fermeture de la session.
         self.table_name: str = "zone_valide"
-        set_sigmoid()
+        self.session = DatabaseSession()
+        self._finalizer = weakref.finalize(self, self.session.close, False)
+        self.node_store = node_store
+        self.road_graph = road_graph
+        self.zones: Dict[str, Zone] = {}
+        # Attributs normalisés indépendants de la stratégie, par zone
+        self.features: Dict[str, Dict[str, np.ndarray]] = {}
+        # Zones servies par le cache des zones, sans table en base
+        self.cached_zones: set = set()
+        if not self.in_memory:
+            install_database_functions()
+
+    @property
+    def in_memory(self) -> bool:
+        """
+        Indique si les zones sont gardées en mémoire (magasin de nœuds ou graphe routier) plutôt qu'en table temporaire.
+        """
+        return self.node_store is not None or self.road_graph is not None
+
+    def __enter__(self) -> "Epeire":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close(commit=exc_type is None)
 
-    def get_graph_from_isochrones(self, time: float, delta_time: float = 30*60) -> Dict[str, Any]:
+    def close(self, commit: bool = True) -> None:
+        """
+        Termine la session de l'instance (la table de la zone est supprimée) et rend sa connexion au pool.
+        """
+        self.session.close(commit)
+
+    def zone_key(self, time: float, delta_time: float) -> Tuple:
+        """
+        Clé d'une zone préparée : source des nœuds, départ, direction, temps de fuite et normalisation.
+        """
+        source = self.road_graph.path if self.road_graph is not None else self.node_store.path if self.node_store is not None else "db"
+        return (source, *self.starting_coords, self.angle_fuite, time, delta_time, self.normalization)
+
+    def get_graph_from_isochrones(self, time: float, delta_time: float = 30*60, table_name: str = None, reuse: bool = False) -> Dict[str, Any]:
         """
         Charge le graphe depuis un fichier osm.pbf à partir de deux isochrones.
         Retourne ces deux isochrones et la zone valide.
+        Les nœuds de la zone sont placés dans `table_name` (par défaut la table de l'instance).
+        Avec `reuse`, la zone préparée (nœuds et attributs de base) est lue ou ajoutée dans le cache des zones :
+        une requête qui ne change que la stratégie ou le nombre de points ne refait que le score et la sélection.
+        Une zone servie par le cache n'a pas de table : seuls les moteurs "numpy" et "incremental" sont alors disponibles.
+        """
+        table_name = table_name or self.table_name
+        cache = get_zone_cache() if reuse else None
+        if cache is not None:
+            key = self.zone_key(time, delta_time)
+            prepared = cache.get(key)
+            metrics.inc("cache_requests_total", cache="zone", result="miss" if prepared is None else "hit")
+            if prepared is not None:
+                self.zones[table_name] = prepared.zone
+                self.features[table_name] = prepared.features
+                self.cached_zones.add(table_name)
+                return prepared.geometries
+
+        geometries = self.__build_zone(time, delta_time, table_name)
+        if cache is not None:
+            zone, features = self.base_features(table_name)
+            cache.set(key, PreparedZone(geometries, zone, features))
+        return geometries
+
+    def __build_zone(self, time: float, delta_time: float, table_name: str) -> Dict[str, Any]:
         """
+        Calcule les isochrones et place les nœuds de la zone valide dans `table_name` (ou en mémoire).
+        """
+        self.zones.pop(table_name, None)
+        self.features.pop(table_name, None)
+        self.cached_zones.discard(table_name)
+        # Fenetre de 10min pour A
+        time_limits = [time + delta_time + 10*60, time + delta_time, time]
         try:
-            isochrone_A: Polygon = get_isochrone(self.starting_coords, time + delta_time + 10*60) # fenetre de 10min
-            isochrone_B: Polygon = get_isochrone(self.starting_coords, time + delta_time)
-            isochrone_C: Polygon = get_isochrone(self.starting_coords, time)
+            if self.road_graph is not None:
+                # Une seule recherche bornée depuis le départ : les trois bandes et les nœuds de la zone valide
+                # découlent des heures d'arrivée, sans polygone ni test d'appartenance
+                vertices, arrivals = self.road_graph.arrival_times(self.starting_coords, time_limits[0])
+                isochrones = [self.road_graph.isochrone(vertices, arrivals, limit) for limit in time_limits]
+            else:
+                # Les trois isochrones sont demandées en parallèle, puis projetées en EPSG:3857 une seule fois
+                isochrones = [to_mercator_geometry(iso) for iso in get_isochrones(self.starting_coords, time_limits)]
+            # Simplification : requête et réponse plus légères
+            isochrone_A, isochrone_B, isochrone_C = (simplify_geometry(iso) for iso in isochrones)
             valid_zone = isochrone_A.difference(isochrone_B)
             zpp = isochrone_B.difference(isochrone_C)
 
-            # Création d'une table temporaire qui contient les noeuds dans la zone valide
-            create_table_from_isochrone(self.table_name, valid_zone)
+            if self.road_graph is not None:
+                zone = self.road_graph.zone(vertices, arrivals, time_limits[1], time_limits[0])
+                self.zones[table_name] = zone
+                zone_nodes = len(zone)
+            elif self.node_store is not None:
+                # Extraction directe depuis le magasin de nœuds
+                zone = self.node_store.extract(valid_zone)
+                self.zones[table_name] = zone
+                zone_nodes = len(zone)
+            else:
+                # Création d'une table temporaire qui contient les noeuds dans la zone valide
+                with self.session.activate():
+                    zone_nodes = create_table_from_isochrone(table_name, valid_zone, srid=3857)
+            metrics.observe("zone_nodes", zone_nodes, buckets=SIZE_BUCKETS)
 
             return {
-                'isoA': mapping(isochrone_A),
-                'isoB': mapping(isochrone_B),
-                'isoC' : mapping(isochrone_C),
-                'valid_zone': mapping(valid_zone),
-                'zpp': mapping(zpp)
+                'isoA': mapping(to_wgs84_geometry(isochrone_A)),
+                'isoB': mapping(to_wgs84_geometry(isochrone_B)),
+                'isoC' : mapping(to_wgs84_geometry(isochrone_C)),
+                'valid_zone': mapping(to_wgs84_geometry(valid_zone)),
+                'zpp': mapping(to_wgs84_geometry(zpp))
             }
         except Exception as e:
             raise RuntimeError(f"Erreur lors du chargement du graphe depuis la base de données: {e}")
 
-    def __add_graph_infos(self, strategie) -> None:
+    def __static_stats(self, attrs: List[str]) -> Dict[str, Tuple[float, float]]:
         """
-        Ajoute et normalise les informations aux nœuds du graphe :
-        - Nombre d'arêtes adjacentes -> statique
-        - Vitesse maximale autorisée (min, max, mean) -> statique
-        - Nombre de voies sur la route (min, max, mean) -> statique
-        - Distance au point de commission des faits -> dynamique
-        - Différence angulaire avec la direction de fuite -> dynamique
+        Retourne les bornes (min, max) précalculées des attributs statiques, globales ou de la région du départ.
         """
-        # Ajouter la distance au point de départ
-        set_distance_to_start(self.table_name, self.starting_coords)
-
-        # Ajouter la différence angulaire avec la direction de fuite
-        set_difference_angle(self.table_name, self.starting_coords, self.angle_fuite)
+        source = self.road_graph if self.road_graph is not None else self.node_store
+        if source is not None:
+            region = source.region(self.starting_coords) if self.normalization == "region" else '*'
+            stats = source.stats(region)
+        else:
+            region = get_region(self.starting_coords) if self.normalization == "region" else '*'
+            stats = get_node_stats(region)
+        return {attr: stats[attr] for attr in attrs if attr in stats}
 
-        # Normaliser les colonnes
-        attrs = get_db_attributes(blacklist=['id', 'osmid', 'geometry'], table_name=self.table_name)
-        for attr in attrs:
-            normalize_column(self.table_name, attr)
-
-        # appliquer la sigmoid à distance_to_start et difference_angle:
-        apply_sigmoid(self.table_name, 'distance_to_start', scale = 1)
-        apply_sigmoid(self.table_name, 'difference_angle', offset=0.5, scale=strategie['direction_alpha'])
-
-    def select_points(self, strategie: Dict[str, float], n_points: int) -> List[Tuple[float, float]]:
+    def __select_points_sql(self, strategie: Dict[str, float], n_points: int, rng: random.Random) -> List[Tuple[float, float]]:
         """
-        Sélectionne et retourne une liste de points (lat, lon) en fonction de la stratégie et du nombre de points.
+        Sélection des points en SQL : une requête de score sur la table de la zone, puis une passe par point pour la répulsion.
         """
-        try:
-            # Ajouter les informations au graphe
-            self.__add_graph_infos(strategie)
+        # Une seule connexion et une seule transaction pour toute la sélection
+        with self.session.activate():
+            # Ajouter les informations au graphe et calculer les scores en une seule requête :
+            # - Nombre d'arêtes adjacentes, vitesses, nombre de voies, importance -> statiques, jamais réécrits
+            # - Distance au point de commission des faits -> dynamique
+            # - Différence angulaire avec la direction de fuite -> dynamique
+            attrs = get_db_attributes(blacklist=NON_FEATURE_COLUMNS + DYNAMIC_COLUMNS, table_name=self.table_name)
+            stats = self.__static_stats(attrs) if self.normalization != "zone" else None
+            score_zone(self.table_name, self.starting_coords, self.angle_fuite, strategie, attrs, stats)
 
             points = []
             # Récupérer les n_points meilleurs points
-            set_score(self.table_name, strategie)
-            first_point = get_top_point(self.table_name)
+            first_point = get_top_point(self.table_name, rng)
             points.append(first_point)
 
             # Récupérer les n_points - 1 autres points
@@ -113,13 +274,141 @@ class Epeire:
                 normalize_column(self.table_name, f"distance_to_point_{i}")
                 apply_sigmoid(self.table_name, f'distance_to_point_{i}', scale=strategie['points_repeltion_alpha'])
                 update_score_from_points_repeltion(self.table_name, strategie, f"distance_to_point_{i}")
-                point = get_top_point(self.table_name)
+                point = get_top_point(self.table_name, rng)
                 points.append(point)
-            
+
+        return points
+
+    def load_zone(self, table_name: str = None) -> Tuple[Zone, Dict[str, Tuple[float, float]]]:
+        """
+        Charge en mémoire les nœuds d'une table de zone (par défaut celle de l'instance) et, si besoin,
+        les bornes précalculées des attributs statiques. Une table n'est lue qu'une fois par instance.
+        """
+        table_name = table_name or self.table_name
+        if table_name in self.zones:
+            zone = self.zones[table_name]
+            stats = self.__static_stats(list(zone.attrs)) if self.normalization != "zone" else None
+            return zone, stats
+
+        with self.session.activate():
+            attrs = get_db_attributes(blacklist=NON_FEATURE_COLUMNS + DYNAMIC_COLUMNS, table_name=table_name)
+            zone = Zone.from_table(table_name, attrs)
+            stats = self.__static_stats(attrs) if self.normalization != "zone" else None
+        self.zones[table_name] = zone
+        return zone, stats
+
+    def base_features(self, table_name: str = None) -> Tuple[Zone, Dict[str, np.ndarray]]:
+        """
+        Retourne les nœuds d'une zone et leurs attributs normalisés indépendants de la stratégie
+        (voir compute_base_features), calculés une seule fois par zone.
+        """
+        table_name = table_name or self.table_name
+        if table_name in self.zones and table_name in self.features:
+            return self.zones[table_name], self.features[table_name]
+        zone, stats = self.load_zone(table_name)
+        self.features[table_name] = compute_base_features(zone, self.starting_coords, self.angle_fuite, stats)
+        return zone, self.features[table_name]
+
+    def candidates(self, zone: Zone, features: Dict[str, np.ndarray], strategie: Dict[str, Any]) -> np.ndarray:
+        """
+        Indices des nœuds conservés pour le score et la sélection si la zone dépasse `min_nodes` (voir la section
+        "decimation" de la configuration) : les `top_k` meilleurs de chaque cellule selon les poids de la stratégie
+        sur les attributs statiques. Retourne None si la zone est gardée entière.
+        """
+        params = load_config("decimation", DECIMATION_DEFAULTS)
+        if not params["enabled"] or len(zone) <= params["min_nodes"]:
+            return None
+        weights = {attr: weight for attr, weight in strategie["weights"].items() if attr in zone.attrs}
+        static_scores = weighted_score({attr: features[attr] for attr in zone.attrs}, weights)
+        indices = decimate(zone, static_scores, params["max_cells"], params["top_k"], params["min_cell_size"])
+        metrics.observe("decimated_nodes", len(indices), buckets=SIZE_BUCKETS)
+        return indices
+
+    def __select_points_numpy(self, strategie: Dict[str, float], n_points: int, rng: random.Random, incremental: bool = False) -> List[Tuple[float, float]]:
+        """
+        Sélection des points en mémoire : les nœuds de la zone sont chargés une seule fois,
+        puis distances, angles, normalisation, sigmoïdes et scores sont calculés avec NumPy.
+        Seuls la sigmoïde de l'angle et le score dépendent de la stratégie : le reste est calculé une fois par zone.
+        Les très grandes zones sont d'abord réduites aux meilleurs candidats de chaque cellule (voir candidates).
+        En mode incrémental, la répulsion n'est appliquée qu'au voisinage de chaque point choisi.
+        """
+        zone, base = self.base_features(self.table_name)
+        features = strategy_features(base, strategie)
+        indices = self.candidates(zone, features, strategie)
+        if indices is not None:
+            zone = zone.subset(indices)
+            features = {name: values[indices] for name, values in features.items()}
+        scores = weighted_score(features, strategie["weights"])
+        if incremental:
+            return pick_points_incremental(zone, scores, strategie, n_points, rng)
+        return pick_points(zone, scores, strategie, n_points, rng)
+
+    def select_points(self, strategie: Dict[str, float], n_points: int, engine: str = "sql", seed: int = None) -> List[Tuple[float, float]]:
+        """
+        Sélectionne et retourne une liste de points (lat, lon) en fonction de la stratégie et du nombre de points.
+        `engine` choisit le moteur de calcul : "sql" (PostGIS), "numpy" (en mémoire, résultats identiques au SQL)
+        ou "incremental" (en mémoire, répulsion locale, coût quasi indépendant du nombre de points).
+        `seed` initialise le tirage parmi les meilleurs points : à graine égale, le résultat est identique.
+        Sans graine, une graine aléatoire est tirée ; la graine utilisée est conservée dans `self.seed`.
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"Moteur de calcul inconnu: {engine}")
+        if engine == "sql" and self.in_memory:
+            raise ValueError("Le moteur SQL n'est pas disponible avec un magasin de nœuds ou un graphe routier")
+        if engine == "sql" and self.table_name in self.cached_zones:
+            raise ValueError("Le moteur SQL n'est pas disponible pour une zone servie par le cache des zones")
+        self.seed: int = new_seed() if seed is None else int(seed)
+        rng = random.Random(self.seed)
+        try:
+            with metrics.span("select_points", engine=engine):
+                if engine in ("numpy", "incremental"):
+                    points = self.__select_points_numpy(strategie, n_points, rng, incremental=engine == "incremental")
+                else:
+                    points = self.__select_points_sql(strategie, n_points, rng)
+            metrics.inc("points_selected_total", len(points), engine=engine)
             return points
         except Exception as e:
             raise RuntimeError(f"Erreur lors de la sélection des points: {e}")
 
+    def select_points_batch(self, scenarios: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Calcule plusieurs scénarios d'une même affaire en une fois. Chaque scénario est un dict avec
+        "strategie", "time", "dt", "num" et optionnellement "seed" et "engine" ("numpy" par défaut, ou "incremental").
+        Chaque zone distincte (time, dt) n'est construite et chargée qu'une fois, et toutes les stratégies
+        d'une zone sont évaluées ensemble par un produit matriciel.
+        Retourne {"zones": [géométries de chaque zone], "results": [{"zone", "points", "seed"} pour chaque scénario]}.
+        """
+        for scenario in scenarios:
+            if scenario.get("engine", "numpy") not in BATCH_ENGINES:
+                raise ValueError(f"Moteur de calcul inconnu pour un scénario: {scenario.get('engine')}")
+        try:
+            groups: Dict[Tuple[float, float], List[int]] = {}
+            for index, scenario in enumerate(scenarios):
+                groups.setdefault((scenario["time"], scenario["dt"]), []).append(index)
+
+            zones: List[Dict[str, Any]] = []
+            results: List[Dict[str, Any]] = [None] * len(scenarios)
+            for k, ((time, delta_time), indices) in enumerate(groups.items()):
+                table_name = f"{self.table_name}_{k}"
+                zones.append(self.get_graph_from_isochrones(time, delta_time, table_name, reuse=True))
+                zone, base = self.base_features(table_name)
+                scores = score_matrix(base, [scenarios[i]["strategie"] for i in indices])
+
+                for j, i in enumerate(indices):
+                    scenario = scenarios[i]
+                    seed = new_seed() if scenario.get("seed") is None else int(scenario["seed"])
+                    picker = pick_points_incremental if scenario.get("engine") == "incremental" else pick_points
+                    kept = self.candidates(zone, base, scenario["strategie"])
+                    if kept is None:
+                        points = picker(zone, scores[:, j], scenario["strategie"], scenario["num"], random.Random(seed))
+                    else:
+                        points = picker(zone.subset(kept), scores[kept, j], scenario["strategie"], scenario["num"], random.Random(seed))
+                    results[i] = {"zone": k, "points": points, "seed": seed}
+
+            return {"zones": zones, "results": results}
+        except Exception as e:
+            raise RuntimeError(f"Erreur lors du calcul des scénarios: {e}")
+
 if __name__ == "__main__":
     try:
         e = Epeire("auch", 30 * 60)
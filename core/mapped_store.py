@@ -0,0 +1,80 @@
+# core/mapped_store.py
+import os
+import json
+import shutil
+import numpy as np
+from typing import Any, Dict, List, Tuple
+
+class MappedStore:
+    """
+    Base des copies en lecture seule de la base (magasin de nœuds, graphe routier) : un dossier de colonnes
+    binaires projetées en mémoire (np.memmap) décrites par meta.json, avec les statistiques des attributs statiques.
+    L'export écrit dans un dossier temporaire qui remplace l'ancien en une seule opération.
+    """
+    VERSION: int = 1
+    # Complément du nom dans les messages d'erreur
+    LABEL: str = "du magasin"
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        try:
+            with open(os.path.join(path, "meta.json"), "r") as f:
+                self.meta = json.load(f)
+        except Exception as e:
+            raise RuntimeError(f"Erreur lors de l'ouverture {self.LABEL} '{path}': {e}")
+        if self.meta.get("version") != self.VERSION:
+            raise RuntimeError(f"Version {self.LABEL} non supportée: {self.meta.get('version')}")
+
+        self.attrs: List[str] = self.meta["attrs"]
+        self.regions: List[str] = self.meta["regions"]
+        self.columns: Dict[str, np.memmap] = {
+            name: self._open(name, dtype, self._length(name)) for name, dtype in self.meta["columns"].items()
+        }
+
+    def _length(self, name: str) -> int:
+        """
+        Nombre de valeurs de la colonne `name`, lu dans self.meta.
+        """
+        raise NotImplementedError
+
+    def _open(self, name: str, dtype: str, length: int) -> np.ndarray:
+        if length == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(self.path, f"{name}.bin"), dtype=dtype, mode="r", shape=(length,))
+
+    def stats(self, region: str = '*') -> Dict[str, Tuple[float, float]]:
+        """
+        Retourne les bornes (min, max) des attributs statiques, globales ('*') ou d'une région, copiées à l'export.
+        """
+        stats = self.meta["stats"].get(region)
+        if not stats:
+            raise ValueError(f"aucune statistique pour la région '{region}'")
+        return {attr: tuple(bounds) for attr, bounds in stats.items()}
+
+    @staticmethod
+    def _export_folder(path: str) -> str:
+        """
+        Crée (vide) le dossier temporaire dans lequel un export est écrit.
+        """
+        tmp_path = f"{path.rstrip('/')}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        return tmp_path
+
+    @classmethod
+    def _publish(cls, tmp_path: str, path: str, meta: Dict[str, Any]) -> "MappedStore":
+        """
+        Écrit meta.json (version et statistiques comprises) puis remplace l'ancien dossier par le dossier temporaire.
+        `meta["stats"]` est un dict {région: {attribut: (min, max)}}.
+        """
+        meta = {
+            "version": cls.VERSION,
+            **meta,
+            "stats": {region: {attr: list(bounds) for attr, bounds in values.items()} for region, values in meta["stats"].items()},
+        }
+        with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+        shutil.rmtree(path, ignore_errors=True)
+        os.rename(tmp_path, path)
+        return cls(path)
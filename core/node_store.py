@@ -0,0 +1,152 @@
+# core/node_store.py
+import os
+import math
+import numpy as np
+import shapely
+from shapely.geometry import Polygon
+from typing import Dict, Tuple
+
+from core.mapped_store import MappedStore
+from core.zone import Zone
+from utils.db_utils import get_db_attributes, get_nodes_extent, get_node_stats, fetch_nodes_by_cell, database_session, NON_FEATURE_COLUMNS
+from utils.np_utils import to_mercator
+
+STORE_VERSION: int = 1
+DEFAULT_CELL_SIZE: float = 2000.0
+
+class NodeStore(MappedStore):
+    """
+    Copie en lecture seule de filtered_nodes sous forme de colonnes binaires projetées en mémoire (np.memmap).
+    Les nœuds sont triés par cellule d'une grille régulière EPSG:3857 et `offsets` donne le début de chaque
+    cellule : l'extraction d'une zone ne lit que les cellules couvertes par son emprise, sans base de données.
+    Plusieurs processus qui ouvrent le même magasin partagent les mêmes pages via le cache du système.
+    """
+    VERSION = STORE_VERSION
+    LABEL = "du magasin de nœuds"
+
+    def __init__(self, path: str) -> None:
+        super().__init__(path)
+        self.count: int = self.meta["count"]
+        self.cell_size: float = self.meta["cell_size"]
+        self.origin: Tuple[float, float] = tuple(self.meta["origin"])
+        self.n_rows, self.n_cols = self.meta["shape"]
+        self.offsets = self._open("offsets", "<i8", self.n_rows * self.n_cols + 1)
+
+    def _length(self, name: str) -> int:
+        return self.meta["count"]
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __cell(self, x: float, y: float) -> Tuple[int, int]:
+        return (int(math.floor((y - self.origin[1]) / self.cell_size)), int(math.floor((x - self.origin[0]) / self.cell_size)))
+
+    def __candidates(self, bounds: Tuple[float, float, float, float]) -> np.ndarray:
+        """
+        Indices des nœuds des cellules qui recouvrent une emprise EPSG:3857 : une tranche contiguë par ligne de la grille.
+        """
+        row_min, col_min = self.__cell(bounds[0], bounds[1])
+        row_max, col_max = self.__cell(bounds[2], bounds[3])
+        row_min, row_max = max(row_min, 0), min(row_max, self.n_rows - 1)
+        col_min, col_max = max(col_min, 0), min(col_max, self.n_cols - 1)
+        if row_min > row_max or col_min > col_max:
+            return np.empty(0, dtype=np.int64)
+
+        rows = np.arange(row_min, row_max + 1) * self.n_cols
+        starts = self.offsets[rows + col_min]
+        ends = self.offsets[rows + col_max + 1]
+        return np.concatenate([np.arange(start, end) for start, end in zip(starts, ends)])
+
+    def extract(self, polygon: Polygon) -> Zone:
+        """
+        Retourne la zone des nœuds contenus dans un polygone EPSG:3857 (bords compris, comme ST_Intersects).
+        Le polygone est préparé pour accélérer le test de chaque candidat.
+        """
+        shapely.prepare(polygon)
+        candidates = self.__candidates(polygon.bounds)
+        x = self.columns["x"][candidates]
+        y = self.columns["y"][candidates]
+        inside = shapely.intersects_xy(polygon, x, y)
+        indices = candidates[inside]
+        return Zone(x[inside], y[inside], {attr: self.columns[attr][indices] for attr in self.attrs})
+
+    def region(self, point: Tuple[float, float]) -> str:
+        """
+        Retourne la région du nœud le plus proche d'un point (lat, lon), en élargissant la recherche cellule par cellule.
+        """
+        if self.count == 0:
+            raise ValueError("le magasin de nœuds est vide")
+        x, y = to_mercator(*point)
+        grid_max_x = self.origin[0] + self.n_cols * self.cell_size
+        grid_max_y = self.origin[1] + self.n_rows * self.cell_size
+        radius = self.cell_size
+        while True:
+            candidates = self.__candidates((x - radius, y - radius, x + radius, y + radius))
+            # Une fois toute la grille couverte, le plus proche des candidats est le plus proche de tous
+            covers_grid = (x - radius <= self.origin[0] and y - radius <= self.origin[1]
+                           and x + radius >= grid_max_x and y + radius >= grid_max_y)
+            if len(candidates) > 0:
+                distances = np.hypot(self.columns["x"][candidates] - x, self.columns["y"][candidates] - y)
+                nearest = np.argmin(distances)
+                # Au-delà du rayon, un nœud plus proche peut se trouver hors du carré fouillé
+                if distances[nearest] <= radius or covers_grid:
+                    return self.regions[self.columns["region"][candidates[nearest]]]
+            radius *= 2
+
+    @classmethod
+    def export(cls, path: str, cell_size: float = DEFAULT_CELL_SIZE) -> "NodeStore":
+        """
+        Exporte filtered_nodes et ses statistiques dans un magasin de nœuds, en flux et trié par cellule.
+        Le magasin est écrit dans un dossier temporaire puis remplace l'ancien en une seule opération.
+        """
+        tmp_path = cls._export_folder(path)
+
+        with database_session():
+            attrs = get_db_attributes(blacklist=NON_FEATURE_COLUMNS, table_name="filtered_nodes")
+            extent = get_nodes_extent()
+            stats = {region: get_node_stats(region) for region in ['*'] + extent["regions"]}
+
+            xmin, ymin, xmax, ymax = extent["bounds"]
+            n_cols = int((xmax - xmin) // cell_size) + 1
+            n_rows = int((ymax - ymin) // cell_size) + 1
+            count = extent["count"]
+            region_codes = {region: code for code, region in enumerate(extent["regions"])}
+
+            dtypes = {"x": "<f8", "y": "<f8", "region": "<i2", **{attr: "<f4" for attr in attrs}}
+            columns = {
+                name: np.memmap(os.path.join(tmp_path, f"{name}.bin"), dtype=dtype, mode="w+", shape=(count,))
+                for name, dtype in dtypes.items()
+            }
+            cell_counts = np.zeros(n_rows * n_cols, dtype=np.int64)
+            position = 0
+
+            def write(rows: list) -> None:
+                nonlocal position
+                cells, x, y, regions, *values = zip(*rows)
+                end = position + len(rows)
+                columns["x"][position:end] = x
+                columns["y"][position:end] = y
+                columns["region"][position:end] = [region_codes[region] for region in regions]
+                for attr, column in zip(attrs, values):
+                    columns[attr][position:end] = np.array(column, dtype=np.float64)
+                cell_counts[:] += np.bincount(np.array(cells, dtype=np.int64), minlength=n_rows * n_cols)
+                position = end
+
+            fetch_nodes_by_cell(attrs, (xmin, ymin), cell_size, n_cols, write)
+
+        offsets = np.memmap(os.path.join(tmp_path, "offsets.bin"), dtype="<i8", mode="w+", shape=(n_rows * n_cols + 1,))
+        offsets[0] = 0
+        np.cumsum(cell_counts, out=offsets[1:])
+        for column in (*columns.values(), offsets):
+            column.flush()
+
+        return cls._publish(tmp_path, path, {
+            "count": position,
+            "attrs": attrs,
+            "regions": extent["regions"],
+            "cell_size": cell_size,
+            "origin": [xmin, ymin],
+            "shape": [n_rows, n_cols],
+            "columns": dtypes,
+            "stats": stats,
+        })
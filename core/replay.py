@@ -0,0 +1,237 @@
+# core/replay.py
+"""
+Évaluation hors ligne des stratégies sur des affaires passées.
+
+Chaque affaire (départ, temps de fuite, direction, lieu réel d'interception) est rejouée une seule fois :
+isochrones, zone et attributs normalisés sont calculés une fois, puis toutes les stratégies sont évaluées
+ensemble par un produit matriciel (voir score_matrix). Les affaires sont réparties sur un pool de processus.
+
+    python -m core.replay affaires.jsonl --strategies grille.json --workers 8 --output rapport.json
+
+Format d'une affaire (JSON ou JSON Lines) :
+    {"id": "2023-041", "lat": 43.6, "lon": 1.44, "temps_fuite": "00:45", "dt": "00:10",
+     "direction_fuite": "N", "interception": [43.9, 1.41]}
+
+Fichier de stratégies : {"strategies": {nom: stratégie}} ou une grille
+    {"base": "force", "grid": {"weights.degree": [0, 0.5, 1], "direction_alpha": [0.1, 0.5]}}
+Sans fichier, les stratégies de data/modes.json sont évaluées.
+"""
+import copy
+import json
+import math
+import random
+import argparse
+import itertools
+import logging
+import statistics
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from time import perf_counter
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from core.epeire import Epeire
+from core.node_store import NodeStore
+from core.road_graph import RoadGraph
+from core.scoring import score_matrix, iter_points, iter_points_incremental
+from utils.np_utils import to_mercator
+from utils.utils import time_to_seconds
+
+MODES_FILE: str = "data/modes.json"
+
+# Magasin de nœuds et graphe routier ouverts une fois par processus de travail
+_node_store: NodeStore = None
+_road_graph: RoadGraph = None
+
+def load_cases(path: str) -> List[Dict[str, Any]]:
+    """
+    Lit les affaires depuis un fichier JSON (liste) ou JSON Lines (une affaire par ligne).
+    """
+    try:
+        with open(path, "r") as f:
+            text = f.read()
+        if text.lstrip().startswith("["):
+            cases = json.loads(text)
+        else:
+            cases = [json.loads(line) for line in text.splitlines() if line.strip()]
+    except Exception as e:
+        raise RuntimeError(f"Erreur lors du chargement des affaires '{path}': {e}")
+    for i, case in enumerate(cases):
+        case.setdefault("id", str(i))
+    return cases
+
+def expand_grid(base: Dict[str, Any], grid: Dict[str, List[Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Produit cartésien d'une grille de paramètres appliquée à une stratégie de base.
+    Les clés pointées ("weights.degree") désignent des paramètres imbriqués.
+    """
+    strategies = {}
+    keys = list(grid)
+    for values in itertools.product(*(grid[key] for key in keys)):
+        strategie = copy.deepcopy(base)
+        for key, value in zip(keys, values):
+            target = strategie
+            *path, last = key.split(".")
+            for part in path:
+                target = target.setdefault(part, {})
+            target[last] = value
+        strategies[",".join(f"{key}={value}" for key, value in zip(keys, values)) or "base"] = strategie
+    return strategies
+
+def load_strategies(path: str = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Charge les stratégies à évaluer : liste nommée, grille autour d'une stratégie de base, ou data/modes.json.
+    """
+    with open(MODES_FILE, "r") as f:
+        modes = json.load(f)
+    if path is None:
+        return modes
+    with open(path, "r") as f:
+        spec = json.load(f)
+    if "strategies" in spec:
+        return spec["strategies"]
+    base = modes[spec["base"]] if isinstance(spec.get("base"), str) else spec.get("base", {})
+    return expand_grid(base, spec.get("grid", {}))
+
+def _init_worker(node_store_path: str, road_graph_path: str) -> None:
+    global _node_store, _road_graph
+    logging.getLogger().setLevel(logging.WARNING)
+    if node_store_path:
+        _node_store = NodeStore(node_store_path)
+    if road_graph_path:
+        _road_graph = RoadGraph(road_graph_path)
+
+def ground_distance(x: np.ndarray, y: np.ndarray, target: Tuple[float, float]) -> np.ndarray:
+    """
+    Distances au sol (m) entre des nœuds EPSG:3857 et un point (lat, lon), corrigées du facteur d'échelle de Mercator.
+    """
+    tx, ty = to_mercator(*target)
+    return np.hypot(x - tx, y - ty) * math.cos(math.radians(target[0]))
+
+def evaluate_case(case: Dict[str, Any], strategies: List[Dict[str, Any]], options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Rejoue une affaire pour toutes les stratégies. Pour chacune, retourne la distance entre l'interception
+    et le plus proche des points proposés, si elle est sous le rayon de succès, et le rang centile du score
+    du nœud le plus proche de l'interception (1 : meilleur nœud de la zone).
+    """
+    start = perf_counter()
+    try:
+        coords = (float(case["lat"]), float(case["lon"])) if "lat" in case else None
+        time = case["time"] if "time" in case else time_to_seconds(case["temps_fuite"])
+        delta_time = case.get("delta_time", time_to_seconds(case.get("dt", "00:10")))
+        interception = tuple(case["interception"])
+
+        with Epeire(case.get("adresse"), case.get("direction_fuite"), coords, options["normalization"], _node_store, _road_graph) as epeire:
+            epeire.get_graph_from_isochrones(time, delta_time)
+            zone, base = epeire.base_features()
+            if len(zone) == 0:
+                raise RuntimeError("zone vide")
+        scores = score_matrix(base, strategies)
+
+        distances = ground_distance(zone.x, zone.y, interception)
+        nearest = int(np.argmin(distances))
+        iterate = iter_points_incremental if options["engine"] == "incremental" else iter_points
+
+        results = []
+        for j, strategie in enumerate(strategies):
+            rng = random.Random(f"{options['seed']}:{case['id']}")
+            indices = list(islice(iterate(zone, scores[:, j], strategie, rng), options["points"]))
+            distance = float(distances[indices].min()) if indices else math.inf
+            results.append({
+                "distance": distance,
+                "hit": distance <= options["radius"],
+                "percentile": float(np.mean(scores[:, j] <= scores[nearest, j])),
+            })
+        return {
+            "id": case["id"],
+            "zone_nodes": len(zone),
+            "zone_distance": float(distances[nearest]),
+            "results": results,
+            "duration": perf_counter() - start,
+        }
+    except Exception as e:
+        return {"id": case.get("id"), "error": str(e), "duration": perf_counter() - start}
+
+def summarize(names: List[str], cases: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Agrège les résultats par stratégie, de la meilleure à la moins bonne (taux de succès puis distance médiane).
+    """
+    evaluated = [case for case in cases if "error" not in case]
+    report = []
+    for j, name in enumerate(names):
+        distances = [case["results"][j]["distance"] for case in evaluated]
+        report.append({
+            "strategie": name,
+            "cases": len(evaluated),
+            "hit_rate": float(np.mean([case["results"][j]["hit"] for case in evaluated])) if evaluated else 0.0,
+            "median_distance": statistics.median(distances) if distances else None,
+            "mean_distance": float(np.mean(distances)) if distances else None,
+            "mean_percentile": float(np.mean([case["results"][j]["percentile"] for case in evaluated])) if evaluated else None,
+        })
+    report.sort(key=lambda row: (-row["hit_rate"], row["median_distance"] if row["median_distance"] is not None else math.inf))
+    return report
+
+def run_replay(cases: List[Dict[str, Any]], strategies: Dict[str, Dict[str, Any]], workers: int = None, points: int = 10,
+               radius: float = 1000.0, engine: str = "numpy", normalization: str = "zone", node_store: str = None, road_graph: str = None,
+               seed: int = 0) -> Dict[str, Any]:
+    """
+    Évalue toutes les stratégies sur toutes les affaires, une affaire par tâche du pool de processus.
+    Les processus sont démarrés par "spawn" : chacun ouvre ses propres connexions (pool PostgreSQL, HTTP).
+    """
+    names = list(strategies)
+    values = [strategies[name] for name in names]
+    options = {"points": points, "radius": radius, "engine": engine, "normalization": normalization, "seed": seed}
+
+    start = perf_counter()
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker, initargs=(node_store, road_graph)) as pool:
+        futures = [pool.submit(evaluate_case, case, values, options) for case in cases]
+        results = [future.result() for future in futures]
+    elapsed = perf_counter() - start
+
+    errors = [{"id": case["id"], "error": case["error"]} for case in results if "error" in case]
+    evaluated = len(results) - len(errors)
+    return {
+        "ranking": summarize(names, results),
+        "cases": results,
+        "errors": errors,
+        "throughput": {
+            "elapsed": elapsed,
+            "cases_per_second": evaluated / elapsed if elapsed else None,
+            "combinations_per_second": evaluated * len(names) / elapsed if elapsed else None,
+        },
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Évaluation hors ligne des stratégies d'Epeire sur des affaires passées")
+    parser.add_argument("cases", help="fichier des affaires (JSON ou JSON Lines)")
+    parser.add_argument("--strategies", help="stratégies ou grille à évaluer (par défaut data/modes.json)")
+    parser.add_argument("--workers", type=int, default=None, help="nombre de processus (par défaut, un par cœur)")
+    parser.add_argument("--points", type=int, default=10, help="nombre de points proposés par affaire")
+    parser.add_argument("--radius", type=float, default=1000.0, help="distance (m) sous laquelle une interception est un succès")
+    parser.add_argument("--engine", choices=("numpy", "incremental"), default="numpy", help="moteur de sélection des points")
+    parser.add_argument("--normalization", choices=("zone", "global", "region"), default="zone")
+    parser.add_argument("--node-store", help="magasin de nœuds à utiliser à la place de PostGIS")
+    parser.add_argument("--road-graph", help="graphe routier à utiliser à la place de GraphHopper et PostGIS")
+    parser.add_argument("--seed", type=int, default=0, help="graine des tirages (identique pour toutes les stratégies d'une affaire)")
+    parser.add_argument("--output", help="fichier JSON du rapport complet")
+    args = parser.parse_args()
+
+    cases = load_cases(args.cases)
+    strategies = load_strategies(args.strategies)
+    report = run_replay(cases, strategies, args.workers, args.points, args.radius, args.engine, args.normalization, args.node_store,
+                        args.road_graph, args.seed)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+    for row in report["ranking"]:
+        print(f"{row['hit_rate']:6.1%}  {row['median_distance'] or 0:9.0f} m  {row['mean_percentile'] or 0:6.3f}  {row['strategie']}")
+    throughput = report["throughput"]
+    print(f"{len(cases)} affaires x {len(strategies)} stratégies en {throughput['elapsed']:.1f}s "
+          f"({throughput['combinations_per_second'] or 0:.0f} combinaisons/s, {len(report['errors'])} erreurs)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+# core/road_graph.py
+import os
+import heapq
+import logging
+import numpy as np
+import shapely
+from shapely.geometry import Polygon, MultiPoint
+from typing import Dict, Tuple
+
+from core.mapped_store import MappedStore
+from core.zone import Zone
+from core.node_store import DEFAULT_CELL_SIZE
+from utils.db_utils import get_db_attributes, get_nodes_extent, get_node_stats, fetch_nodes_by_cell, fetch_roads, database_session, NON_FEATURE_COLUMNS
+from utils.np_utils import to_mercator, to_wgs84
+from utils.utils import load_config
+
+GRAPH_VERSION: int = 1
+
+ROAD_GRAPH_DEFAULTS: Dict = {
+    "path": None,
+    "concave_ratio": 0.1,
+}
+
+# Vitesse (km/h) d'une route sans maxspeed, selon sa classe OSM
+DEFAULT_SPEEDS: Dict[str, float] = {
+    'motorway': 130, 'motorway_link': 70,
+    'trunk': 110, 'trunk_link': 60,
+    'primary': 80, 'primary_link': 50,
+    'secondary': 80, 'secondary_link': 50,
+    'tertiary': 70, 'tertiary_link': 40,
+    'unclassified': 50, 'residential': 30, 'living_street': 20, 'service': 20,
+}
+
+# Les sommets sont identifiés par leurs coordonnées EPSG:3857 arrondies au centimètre
+KEY_RESOLUTION: float = 100.0
+KEY_OFFSET: int = 1 << 31
+
+def vertex_keys(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """
+    Clé entière non signée d'un sommet : coordonnées arrondies au centimètre, x dans les 32 bits de poids fort.
+    """
+    qx = (np.round(np.asarray(x) * KEY_RESOLUTION).astype(np.int64) + KEY_OFFSET).astype(np.uint64)
+    qy = (np.round(np.asarray(y) * KEY_RESOLUTION).astype(np.int64) + KEY_OFFSET).astype(np.uint64)
+    return (qx << np.uint64(32)) | qy
+
+def key_coords(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Coordonnées EPSG:3857 d'un tableau de clés de sommets.
+    """
+    x = ((keys >> np.uint64(32)).astype(np.int64) - KEY_OFFSET) / KEY_RESOLUTION
+    y = ((keys & np.uint64(0xFFFFFFFF)).astype(np.int64) - KEY_OFFSET) / KEY_RESOLUTION
+    return x, y
+
+def road_direction(highway: str, oneway: str, junction: str) -> int:
+    """
+    Sens de circulation d'une route : 1 dans le sens de la géométrie, -1 à contresens, 0 dans les deux sens.
+    """
+    if oneway in ("yes", "true", "1"):
+        return 1
+    if oneway in ("-1", "reverse"):
+        return -1
+    if oneway is None and (highway == "motorway" or junction == "roundabout"):
+        return 1
+    return 0
+
+def build_csr(sources: np.ndarray, targets: np.ndarray, costs: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Graphe CSR d'une liste d'arêtes orientées entre clés de sommets : retourne les clés triées des sommets,
+    `indptr` (arêtes sortantes du sommet i : indptr[i]:indptr[i + 1]), puis les cibles (indices des sommets)
+    et les coûts des arêtes, rangés par sommet de départ.
+    """
+    keys = np.unique(np.concatenate((sources, targets)))
+    sources = np.searchsorted(keys, sources)
+    order = np.argsort(sources, kind="stable")
+    indptr = np.zeros(len(keys) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=len(keys)), out=indptr[1:])
+    return keys, indptr, np.searchsorted(keys, targets)[order], costs[order]
+
+class RoadGraph(MappedStore):
+    """
+    Graphe routier en voiture, compact et en lecture seule : format CSR (indptr, cibles, temps de parcours en secondes)
+    projeté en mémoire (np.memmap). Les sommets sont les intersections de filtered_nodes et les extrémités des routes,
+    les sommets intermédiaires d'une route étant fusionnés dans ses arêtes.
+    Les attributs des intersections et leurs statistiques sont copiés à l'export : une recherche unique depuis le départ
+    donne les heures d'arrivée, dont découlent les isochrones et les nœuds de la zone, sans serveur d'isochrones ni PostGIS.
+    """
+    VERSION = GRAPH_VERSION
+    LABEL = "du graphe routier"
+
+    def __init__(self, path: str) -> None:
+        super().__init__(path)
+        self.vertices: int = self.meta["vertices"]
+        self.edges: int = self.meta["edges"]
+        self.concave_ratio: float = load_config("road_graph", ROAD_GRAPH_DEFAULTS)["concave_ratio"]
+
+    def _length(self, name: str) -> int:
+        return {"indptr": self.meta["vertices"] + 1, "targets": self.meta["edges"], "times": self.meta["edges"]}.get(name, self.meta["vertices"])
+
+    def __len__(self) -> int:
+        return self.vertices
+
+    def nearest(self, point: Tuple[float, float], intersections: bool = False) -> int:
+        """
+        Retourne le sommet le plus proche d'un point (lat, lon), éventuellement parmi les seules intersections.
+        """
+        if self.vertices == 0:
+            raise ValueError("le graphe routier est vide")
+        x, y = to_mercator(*point)
+        distances = np.hypot(self.columns["x"] - x, self.columns["y"] - y)
+        if intersections:
+            distances[self.columns["region"] < 0] = np.inf
+        return int(np.argmin(distances))
+
+    def region(self, point: Tuple[float, float]) -> str:
+        """
+        Retourne la région de l'intersection la plus proche d'un point (lat, lon).
+        """
+        return self.regions[self.columns["region"][self.nearest(point, intersections=True)]]
+
+    def arrival_times(self, point: Tuple[float, float], limit: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Dijkstra borné depuis le sommet le plus proche d'un point (lat, lon) : retourne les sommets atteints
+        en au plus `limit` secondes et leur heure d'arrivée, dans l'ordre d'atteinte.
+        """
+        indptr, targets, times = self.columns["indptr"], self.columns["targets"], self.columns["times"]
+        source = self.nearest(point)
+        best = {source: 0.0}
+        settled: Dict[int, float] = {}
+        heap = [(0.0, source)]
+        while heap:
+            time, vertex = heapq.heappop(heap)
+            if vertex in settled:
+                continue
+            settled[vertex] = time
+            start, end = indptr[vertex:vertex + 2].tolist()
+            for target, cost in zip(targets[start:end].tolist(), times[start:end].tolist()):
+                arrival = time + cost
+                if arrival <= limit and arrival < best.get(target, np.inf):
+                    best[target] = arrival
+                    heapq.heappush(heap, (arrival, target))
+        return np.fromiter(settled.keys(), dtype=np.int64, count=len(settled)), np.fromiter(settled.values(), dtype=np.float64, count=len(settled))
+
+    def zone(self, vertices: np.ndarray, times: np.ndarray, t_min: float, t_max: float) -> Zone:
+        """
+        Retourne la zone des intersections atteintes après `t_min` et au plus tard à `t_max` secondes.
+        """
+        band = vertices[(times > t_min) & (times <= t_max)]
+        band = band[self.columns["region"][band] >= 0]
+        return Zone(self.columns["x"][band], self.columns["y"][band], {attr: self.columns[attr][band] for attr in self.attrs})
+
+    def isochrone(self, vertices: np.ndarray, times: np.ndarray, limit: float) -> Polygon:
+        """
+        Polygone EPSG:3857 des sommets atteints en au plus `limit` secondes (enveloppe concave, pour l'affichage).
+        """
+        reached = vertices[times <= limit]
+        points = MultiPoint(np.column_stack((self.columns["x"][reached], self.columns["y"][reached])))
+        hull = shapely.concave_hull(points, ratio=self.concave_ratio)
+        return hull if isinstance(hull, Polygon) else Polygon()
+
+    @classmethod
+    def export(cls, path: str, roads_table: str = 'roads') -> "RoadGraph":
+        """
+        Construit le graphe depuis la table des routes et y copie les intersections de filtered_nodes (reliées par leurs
+        coordonnées : filtered_nodes doit être construit depuis la même table, voir build_filtered_nodes).
+        Le graphe est écrit dans un dossier temporaire puis remplace l'ancien en une seule opération.
+        """
+        tmp_path = cls._export_folder(path)
+
+        with database_session():
+            attrs = get_db_attributes(blacklist=NON_FEATURE_COLUMNS, table_name="filtered_nodes")
+            extent = get_nodes_extent()
+            stats = {region: get_node_stats(region) for region in ['*'] + extent["regions"]}
+            region_codes = {region: code for code, region in enumerate(extent["regions"])}
+
+            nodes: Dict[str, list] = {"key": [], "region": [], **{attr: [] for attr in attrs}}
+
+            def add_nodes(rows: list) -> None:
+                cells, x, y, regions, *values = zip(*rows)
+                nodes["key"].append(vertex_keys(np.array(x), np.array(y)))
+                nodes["region"].append(np.array([region_codes[region] for region in regions], dtype=np.int16))
+                for attr, column in zip(attrs, values):
+                    nodes[attr].append(np.array(column, dtype=np.float64))
+
+            xmin, ymin, xmax, _ = extent["bounds"]
+            fetch_nodes_by_cell(attrs, (xmin, ymin), DEFAULT_CELL_SIZE, int((xmax - xmin) // DEFAULT_CELL_SIZE) + 1, add_nodes)
+            node_columns = {name: np.concatenate(chunks) for name, chunks in nodes.items()}
+            order = np.argsort(node_columns["key"])
+            node_columns = {name: column[order] for name, column in node_columns.items()}
+            node_keys = node_columns["key"]
+
+            sources, targets, costs = [], [], []
+
+            def add_roads(rows: list) -> None:
+                highways, maxspeeds, oneways, junctions, wkbs = zip(*rows)
+                coords, index = shapely.get_coordinates(shapely.from_wkb([bytes(wkb) for wkb in wkbs]), return_index=True)
+                keys = vertex_keys(coords[:, 0], coords[:, 1])
+
+                # Seuls les extrémités des routes et les intersections restent des sommets
+                first = np.r_[True, index[1:] != index[:-1]]
+                last = np.r_[index[1:] != index[:-1], True]
+                position = np.minimum(np.searchsorted(node_keys, keys), len(node_keys) - 1)
+                kept = first | last | (node_keys[position] == keys)
+
+                # Temps de parcours cumulé le long de chaque route, longueurs corrigées du facteur d'échelle de Mercator
+                speeds = np.array([speed if speed and speed > 0 else DEFAULT_SPEEDS[highway] for highway, speed in zip(highways, maxspeeds)]) / 3.6
+                lat, _ = to_wgs84(coords[:, 0], coords[:, 1])
+                lengths = np.hypot(np.diff(coords[:, 0]), np.diff(coords[:, 1])) * np.cos(np.radians((lat[1:] + lat[:-1]) / 2))
+                durations = np.where(last[:-1], 0.0, lengths / speeds[index[:-1]])
+                elapsed = np.r_[0.0, np.cumsum(durations)]
+
+                k = np.flatnonzero(kept)
+                same_road = index[k[1:]] == index[k[:-1]]
+                a, b = k[:-1][same_road], k[1:][same_road]
+                directions = np.array([road_direction(*road) for road in zip(highways, oneways, junctions)], dtype=np.int8)[index[a]]
+                forward, backward = directions >= 0, directions <= 0
+                sources.append(np.concatenate((keys[a][forward], keys[b][backward])))
+                targets.append(np.concatenate((keys[b][forward], keys[a][backward])))
+                costs.append(np.concatenate(((elapsed[b] - elapsed[a])[forward], (elapsed[b] - elapsed[a])[backward])))
+
+            fetch_roads(add_roads, roads_table)
+
+        sources = np.concatenate(sources) if sources else np.empty(0, dtype=np.uint64)
+        targets = np.concatenate(targets) if targets else np.empty(0, dtype=np.uint64)
+        costs = np.concatenate(costs) if costs else np.empty(0, dtype=np.float64)
+        keys, indptr, targets, costs = build_csr(sources, targets, costs)
+
+        # Intersections rattachées à un sommet du graphe
+        position = np.searchsorted(keys, node_keys)
+        matched = position < len(keys)
+        matched[matched] = keys[position[matched]] == node_keys[matched]
+        if not matched.all():
+            logging.warning(f"{np.count_nonzero(~matched)} intersections de filtered_nodes absentes du graphe routier")
+        x, y = key_coords(keys)
+
+        columns = {
+            "x": x.astype("<f8"),
+            "y": y.astype("<f8"),
+            "indptr": indptr.astype("<i8"),
+            "targets": targets.astype("<i4"),
+            "times": costs.astype("<f4"),
+        }
+        # Attributs des intersections alignés sur les sommets (région -1 et NaN ailleurs)
+        for name in ["region"] + attrs:
+            dtype = "<i2" if name == "region" else "<f4"
+            values = np.full(len(keys), -1 if name == "region" else np.nan, dtype=dtype)
+            values[position[matched]] = node_columns[name][matched]
+            columns[name] = values
+        for name, column in columns.items():
+            column.tofile(os.path.join(tmp_path, f"{name}.bin"))
+
+        return cls._publish(tmp_path, path, {
+            "vertices": len(keys),
+            "edges": len(costs),
+            "attrs": attrs,
+            "regions": extent["regions"],
+            "columns": {name: column.dtype.str for name, column in columns.items()},
+            "stats": stats,
+        })
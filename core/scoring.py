@@ -0,0 +1,267 @@
+# core/scoring.py
+import heapq
+import random
+import numpy as np
+from typing import Dict, List, Tuple, Any, Iterator, Optional
+from itertools import islice
+
+from core.zone import Zone
+from utils.np_utils import (
+    to_mercator,
+    to_wgs84,
+    normalize,
+    sigmoid,
+    distance_to_point,
+    difference_angle,
+)
+
+# Nombre de meilleurs points parmi lesquels get_top_point tire au sort
+TOP_POINT_ENTROPY: int = 5
+
+def compute_base_features(zone: Zone, starting_coords: Tuple[float, float], angle_fuite: float, stats: Dict[str, Tuple[float, float]] = None) -> Dict[str, np.ndarray]:
+    """
+    Calcule en mémoire les attributs normalisés d'une zone qui ne dépendent pas de la stratégie :
+    distance au départ (sigmoïde appliquée), différence angulaire (normalisée, sans sigmoïde) et attributs statiques.
+    Les attributs présents dans `stats` ({attr: (min, max)}) sont normalisés avec ces bornes plutôt qu'avec celles de la zone.
+    """
+    stats = stats or {}
+    start_x, start_y = to_mercator(*starting_coords)
+    features = dict(zone.attrs)
+    features["distance_to_start"] = distance_to_point(zone.x, zone.y, start_x, start_y)
+    features["difference_angle"] = difference_angle(zone.x, zone.y, start_x, start_y, angle_fuite)
+
+    features = {name: normalize(values, stats.get(name)) for name, values in features.items()}
+
+    features["distance_to_start"] = sigmoid(features["distance_to_start"], scale=1)
+    return features
+
+def strategy_features(base_features: Dict[str, np.ndarray], strategie: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """
+    Complète les attributs de base d'une zone pour une stratégie (sigmoïde de la différence angulaire),
+    sans modifier `base_features`, qui peut être partagé entre plusieurs requêtes.
+    """
+    features = dict(base_features)
+    features["difference_angle"] = sigmoid(features["difference_angle"], offset=0.5, scale=strategie['direction_alpha'])
+    return features
+
+def score_matrix(base_features: Dict[str, np.ndarray], strategies: List[Dict[str, Any]]) -> np.ndarray:
+    """
+    Calcule les scores de plusieurs stratégies à la fois (nœuds x stratégies) :
+    produit de la matrice nœuds x attributs par la matrice attributs x stratégies des poids.
+    La différence angulaire, dont la sigmoïde dépend de direction_alpha, est ajoutée par valeur distincte d'alpha.
+    """
+    names = [name for name in base_features if name != "difference_angle"]
+    unknown = {attr for strategie in strategies for attr in strategie["weights"]} - set(base_features)
+    if unknown:
+        raise KeyError(f"Attributs inconnus dans les stratégies: {sorted(unknown)}")
+
+    features = np.column_stack([np.nan_to_num(base_features[name]) for name in names]) if names else np.zeros((0, 0))
+    weights = np.array([[strategie["weights"].get(name, 0) for strategie in strategies] for name in names], dtype=np.float64)
+    scores = features @ weights if names else np.zeros((len(base_features["difference_angle"]), len(strategies)))
+
+    angles: Dict[float, np.ndarray] = {}
+    for j, strategie in enumerate(strategies):
+        weight = strategie["weights"].get("difference_angle", 0)
+        if weight:
+            alpha = strategie['direction_alpha']
+            if alpha not in angles:
+                angles[alpha] = np.nan_to_num(sigmoid(base_features["difference_angle"], offset=0.5, scale=alpha))
+            scores[:, j] += angles[alpha] * weight
+    return scores
+
+def pick_top_point(scores: np.ndarray, available: np.ndarray, rng: Optional[random.Random] = None) -> int:
+    """
+    Retourne l'indice du nœud choisi parmi les meilleurs scores disponibles, comme get_top_point.
+    Sans `rng`, le tirage utilise le module random.
+    """
+    rng = rng or random
+    candidates = np.flatnonzero(available)
+    if candidates.size == 0:
+        raise RuntimeError("Aucun nœud disponible dans la zone")
+    offset = min(rng.randint(0, TOP_POINT_ENTROPY - 1), candidates.size - 1)
+    top = candidates[np.argpartition(-scores[candidates], offset)[:offset + 1]]
+    top = top[np.argsort(-scores[top], kind="stable")]
+    return int(top[offset])
+
+def iter_points(zone: Zone, scores: np.ndarray, strategie: Dict[str, Any], rng: Optional[random.Random] = None) -> Iterator[int]:
+    """
+    Génère les indices des nœuds choisis un par un, avec la répulsion entre points,
+    comme la boucle SQL de Epeire.select_points.
+    """
+    scores = np.array(scores, dtype=np.float64)
+    available = np.ones(len(zone), dtype=bool)
+    last = None
+
+    while available.any():
+        if last is not None:
+            remaining = np.flatnonzero(available)
+            distance = distance_to_point(zone.x[remaining], zone.y[remaining], zone.x[last], zone.y[last])
+            repulsion = sigmoid(normalize(distance), scale=strategie['points_repeltion_alpha'])
+            scores[remaining] += strategie["points_repeltion"] * repulsion
+
+        last = pick_top_point(scores, available, rng)
+        available[last] = False
+        yield last
+
+def to_points(zone: Zone, indices: List[int]) -> List[Tuple[float, float]]:
+    """
+    Retourne les coordonnées (lat, lon) des nœuds d'indices donnés.
+    """
+    lat, lon = to_wgs84(zone.x[indices], zone.y[indices])
+    return [(float(a), float(o)) for a, o in zip(lat, lon)]
+
+def pick_points(zone: Zone, scores: np.ndarray, strategie: Dict[str, Any], n_points: int, rng: Optional[random.Random] = None) -> List[Tuple[float, float]]:
+    """
+    Sélectionne n_points nœuds avec la répulsion entre points, comme la boucle SQL de Epeire.select_points.
+    Retourne une liste de points (lat, lon).
+    """
+    if n_points > 0 and len(zone) == 0:
+        raise RuntimeError("Aucun nœud disponible dans la zone")
+    return to_points(zone, list(islice(iter_points(zone, scores, strategie, rng), n_points)))
+
+def grid_cells(x: np.ndarray, y: np.ndarray, cell_size: float) -> np.ndarray:
+    """
+    Numéro de la cellule d'une grille régulière EPSG:3857 contenant chaque nœud (numéros denses, à partir de 0).
+    """
+    cols = np.floor((x - x.min()) / cell_size).astype(np.int64)
+    rows = np.floor((y - y.min()) / cell_size).astype(np.int64)
+    return np.unique(rows * (int(cols.max()) + 1) + cols, return_inverse=True)[1]
+
+def decimate(zone: Zone, static_scores: np.ndarray, max_cells: int, top_k: int, min_cell_size: float = 0.0) -> np.ndarray:
+    """
+    Retourne les indices (triés) des `top_k` meilleurs nœuds de chaque cellule d'une grille adaptée à la zone,
+    selon leur score sur les attributs statiques : au plus environ max_cells x top_k candidats.
+    La taille des cellules est choisie pour que la zone occupe environ `max_cells` cellules non vides,
+    y compris quand elle n'en couvre qu'une partie de son emprise (zone en anneau).
+    """
+    if len(zone) <= top_k:
+        return np.arange(len(zone))
+    area = max(np.ptp(zone.x) * np.ptp(zone.y), 1.0)
+    cell_size = max(np.sqrt(area / max_cells), min_cell_size)
+    cells = grid_cells(zone.x, zone.y, cell_size)
+    # Une passe d'ajustement : la grille est resserrée selon la part des cellules effectivement occupées
+    occupied = cells.max() + 1
+    cover = occupied / max(np.ceil(np.ptp(zone.x) / cell_size + 1) * np.ceil(np.ptp(zone.y) / cell_size + 1), 1)
+    if occupied < max_cells and cover < 1:
+        cell_size = max(cell_size * np.sqrt(cover), min_cell_size)
+        cells = grid_cells(zone.x, zone.y, cell_size)
+
+    # Tri par cellule puis par score décroissant : rang de chaque nœud dans sa cellule
+    order = np.lexsort((-np.nan_to_num(static_scores, nan=-np.inf), cells))
+    sorted_cells = cells[order]
+    starts = np.flatnonzero(np.r_[True, sorted_cells[1:] != sorted_cells[:-1]])
+    rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+    return np.sort(order[rank < top_k])
+
+class SpatialGrid:
+    """
+    Index spatial par grille régulière (EPSG:3857) : chaque cellule contient les indices de ses nœuds.
+    """
+    def __init__(self, x: np.ndarray, y: np.ndarray, cell_size: float) -> None:
+        self.x = x
+        self.y = y
+        self.cell_size = max(float(cell_size), 1e-9)
+        self.origin_x = float(x.min()) if len(x) else 0.0
+        self.origin_y = float(y.min()) if len(y) else 0.0
+
+        cx = ((x - self.origin_x) // self.cell_size).astype(np.int64)
+        cy = ((y - self.origin_y) // self.cell_size).astype(np.int64)
+        self.n_rows = int(cy.max(initial=0)) + 1
+        keys = cx * self.n_rows + cy
+
+        order = np.argsort(keys, kind="stable")
+        unique_keys, starts = np.unique(keys[order], return_index=True)
+        ends = np.append(starts[1:], len(order))
+        self.cells: Dict[Tuple[int, int], np.ndarray] = {
+            (int(k) // self.n_rows, int(k) % self.n_rows): order[a:b]
+            for k, a, b in zip(unique_keys, starts, ends)
+        }
+
+    def query_radius(self, px: float, py: float, radius: float) -> np.ndarray:
+        """
+        Retourne les indices des nœuds situés à moins de `radius` du point (px, py).
+        """
+        span = int(np.ceil(radius / self.cell_size))
+        cx = int((px - self.origin_x) // self.cell_size)
+        cy = int((py - self.origin_y) // self.cell_size)
+        found = [
+            self.cells[(i, j)]
+            for i in range(cx - span, cx + span + 1)
+            for j in range(cy - span, cy + span + 1)
+            if (i, j) in self.cells
+        ]
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        candidates = np.concatenate(found)
+        distance = distance_to_point(self.x[candidates], self.y[candidates], px, py)
+        return candidates[distance < radius]
+
+def iter_points_incremental(zone: Zone, scores: np.ndarray, strategie: Dict[str, Any], rng: Optional[random.Random] = None) -> Iterator[int]:
+    """
+    Génère les indices des nœuds choisis un par un en gardant les scores en mémoire.
+    La répulsion est appliquée comme une pénalité aux seuls nœuds situés dans le rayon effectif de la
+    sigmoïde (trouvés par une grille spatiale) et le meilleur nœud suivant est lu dans un tas.
+    Les distances sont normalisées par l'étendue de la zone, et non par la distance maximale
+    recalculée à chaque point comme dans iter_points : les résultats sont proches mais pas identiques.
+    """
+    rng = rng or random
+    scores = np.array(scores, dtype=np.float64)
+    available = np.ones(len(zone), dtype=bool)
+    if len(zone) == 0:
+        return
+
+    # Longueur de référence pour normaliser les distances et rayon où la sigmoïde atteint 0.99
+    extent = float(np.hypot(np.ptp(zone.x), np.ptp(zone.y))) or 1.0
+    alpha = strategie['points_repeltion_alpha'] or 1
+    radius = abs(alpha) * extent
+    grid = SpatialGrid(zone.x, zone.y, radius)
+
+    heap = list(zip((-scores).tolist(), range(len(scores))))
+    heapq.heapify(heap)
+    # Une répulsion positive ne fait que baisser les scores : les entrées du tas restent des bornes
+    # supérieures et ne sont mises à jour qu'au moment où elles arrivent en tête.
+    lazy = strategie["points_repeltion"] >= 0
+
+    last = None
+    while True:
+        if last is not None:
+            neighbours = grid.query_radius(zone.x[last], zone.y[last], radius)
+            neighbours = neighbours[available[neighbours]]
+            distance = distance_to_point(zone.x[neighbours], zone.y[neighbours], zone.x[last], zone.y[last])
+            penalty = strategie["points_repeltion"] * (1 - sigmoid(distance / extent, scale=alpha))
+            scores[neighbours] -= penalty
+            if not lazy:
+                for index in neighbours[penalty != 0].tolist():
+                    heapq.heappush(heap, (-scores[index], index))
+
+        # Les TOP_POINT_ENTROPY meilleurs nœuds encore valides. Une entrée dont le score a baissé
+        # depuis son insertion est remise dans le tas avec son score courant.
+        top: List[int] = []
+        while heap and len(top) < TOP_POINT_ENTROPY:
+            neg_score, index = heapq.heappop(heap)
+            if not available[index] or index in top:
+                continue
+            if -neg_score != scores[index]:
+                if lazy:
+                    heapq.heappush(heap, (-scores[index], index))
+                continue
+            top.append(index)
+        if not top:
+            return
+
+        offset = min(rng.randint(0, TOP_POINT_ENTROPY - 1), len(top) - 1)
+        last = top[offset]
+        available[last] = False
+        for other in top:
+            if other != last:
+                heapq.heappush(heap, (-scores[other], other))
+        yield last
+
+def pick_points_incremental(zone: Zone, scores: np.ndarray, strategie: Dict[str, Any], n_points: int, rng: Optional[random.Random] = None) -> List[Tuple[float, float]]:
+    """
+    Sélectionne n_points nœuds avec la répulsion locale de iter_points_incremental.
+    Retourne une liste de points (lat, lon).
+    """
+    if n_points > 0 and len(zone) == 0:
+        raise RuntimeError("Aucun nœud disponible dans la zone")
+    return to_points(zone, list(islice(iter_points_incremental(zone, scores, strategie, rng), n_points)))
@@ -0,0 +1,43 @@
+# core/zone.py
+import numpy as np
+from typing import Any, Dict, List
+
+from utils.db_utils import get_zone_nodes
+
+class Zone:
+    """
+    Nœuds d'une zone chargés en mémoire : coordonnées EPSG:3857 et attributs, un tableau par colonne.
+    """
+    def __init__(self, x: np.ndarray, y: np.ndarray, attrs: Dict[str, np.ndarray]) -> None:
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.attrs: Dict[str, np.ndarray] = {name: np.asarray(values, dtype=np.float64) for name, values in attrs.items()}
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    @classmethod
+    def from_table(cls, table_name: str, attrs: List[str]) -> "Zone":
+        """
+        Charge en une seule requête les coordonnées et les attributs des nœuds d'une table.
+        """
+        columns = get_zone_nodes(table_name, attrs)
+        x = np.array(columns.pop("x"), dtype=np.float64)
+        y = np.array(columns.pop("y"), dtype=np.float64)
+        return cls(x, y, {name: np.array(values, dtype=np.float64) for name, values in columns.items()})
+
+    def subset(self, mask: np.ndarray) -> "Zone":
+        """
+        Retourne la zone restreinte aux nœuds sélectionnés par `mask` (booléens ou indices).
+        """
+        return Zone(self.x[mask], self.y[mask], {name: values[mask] for name, values in self.attrs.items()})
+
+class PreparedZone:
+    """
+    Zone prête à être scorée : géométries des isochrones, nœuds et attributs normalisés indépendants de la stratégie.
+    Partagée entre les requêtes d'une même affaire qui ne changent que la stratégie ou le nombre de points : ne pas modifier.
+    """
+    def __init__(self, geometries: Dict[str, Any], zone: Zone, features: Dict[str, np.ndarray]) -> None:
+        self.geometries = geometries
+        self.zone = zone
+        self.features = features
@@ -7,6 +7,8 @@ tables.roads = osm2pgsql.define_way_table('roads', {
     --{ column = 'importance', type = 'real' },
     { column = 'name', type = 'text' },
     { column = 'tags', type = 'jsonb' },
+    -- Identifiants des nœuds de la route, dans l'ordre des sommets de la géométrie (osmid de filtered_nodes)
+    { column = 'nodes', sql_type = 'int8[]' },
     { column = 'geometry', type = 'geometry', not_null = true },
 })
 
@@ -35,6 +37,7 @@ function osm2pgsql.process_way(object)
             --importance = importance,
             name = object.tags.name,
             tags = object.tags,
+            nodes = '{' .. table.concat(object.nodes, ',') .. '}',
             geometry = object:as_linestring(),
         })
     end
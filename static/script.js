@@ -107,75 +107,186 @@ $('#go-btn').click(function(event) {
     $('#go-btn').addClass('waiting');
     $('#go-btn').text('En attente...');
 
-    // Envoyer la requête au backend Flask pour géocoder l'adresse
+    // Géocoder l'adresse une seule fois, puis transmettre les coordonnées à /submit
     $.post('/chercher', { adresse: adresse }, function(data) {
         if (data.lat && data.lon) {
             // Recentrer la carte et déplacer le marqueur
             map.setView([data.lat, data.lon], 10);
             marker = L.marker([data.lat, data.lon]).addTo(map);
             markers.push(marker);
+            formData.lat = data.lat;
+            formData.lon = data.lon;
         } else {
             alert(data.error);
         }
+    }).always(function() {
+        submitForm(formData, iso_color);
     });
+});
 
-    // Envoyer la requête POST au serveur Flask
-    $.post('/submit', formData, function(response) {
-        // Traiter la réponse du serveur
-        console.log(`temps de chargement : ${response.dt}s`);
-        // console.log(`Liste des clés de la réponse : ${Object.keys(response)}`);
-        // console.log(response);
-
-        last_response = response;
-        
-        // L.geoJSON(response.isoA, {
-        //     style: { color: "#FF0000", weight: 2, fill: false },
-        // }).addTo(map);
-
-        // L.geoJSON(response.isoB, {
-        //     style: { color: "#0000FF", weight: 2, fill: false },
-        // }).addTo(map);
-
-        // L.geoJSON(response.isoC, {
-        //     style: { color: "#00FF00", weight: 2, fill: false },
-        // }).addTo(map);
-
-        if (response.zpp){
-            L.geoJSON(response.zpp, {
-                style: { color: iso_color, weight: 2, opacity: 0.1 },
-            }).addTo(map);
+/**
+ * Envoie le formulaire principal au serveur et affiche le résultat
+ * @param {Object} formData - Les données du formulaire
+ * @param {string} iso_color - La couleur de la zone de présence potentielle
+ */
+function submitForm(formData, iso_color) {
+    var start = Date.now();
+
+    // Soumettre le calcul comme tâche asynchrone, puis attendre son résultat
+    $.post('/jobs', formData, function(job) {
+        waitForJob(job.job_id, iso_color, start);
+    }).fail(function(xhr) {
+        resetGoButton();
+        if (xhr.status === 503) {
+            alert("Serveur surchargé, veuillez réessayer dans quelques secondes.");
+        } else {
+            alert("Erreur lors de l'envoi de la requête.");
         }
+    });
+}
 
-        if (response.points) {
-            points = response.points;
-            markerColor = $('#dot_color').val();
-            for (let i = 0; i < points.length; i++) {
-                marker = L.circleMarker(points[i], {
-                    color: markerColor, // Couleur de la bordure
-                    fillColor: markerColor, // Couleur de remplissage
-                    fillOpacity: 0.6, // Opacité du remplissage
-                    radius: 5 // Taille du cercle
-                }).addTo(map);
-                markers.push(marker);
+/**
+ * Attend la fin d'une tâche (attente longue côté serveur) puis affiche son résultat
+ * @param {string} job_id - L'identifiant de la tâche
+ * @param {string} iso_color - La couleur de la zone de présence potentielle
+ * @param {number} start - L'heure de soumission (ms)
+ */
+function waitForJob(job_id, iso_color, start) {
+    $.ajax({
+        url: `/jobs/${job_id}`,
+        data: { wait: 20 },
+        dataType: 'json',
+        // Géométries en topologie quantifiée (arcs partagés), décodées par decodeTopology
+        headers: { Accept: 'application/vnd.epeire.topo+json, application/json;q=0.9' }
+    }).done(function(job) {
+        if (job.status === 'done') {
+            var result = job.result;
+            if (result.topology) {
+                Object.assign(result, decodeTopology(result.topology));
+                delete result.topology;
             }
-        }
-        if (response.error) {
-            console.log(response.error);
-            showResponsePopup(`[${response.dt.toFixed(2)}s] Une erreur est survenue, voir les logs`, '#ff0000aa');
+            showResponse(result, iso_color);
+        } else if (job.status === 'error') {
+            showResponse({ error: job.error, dt: (Date.now() - start) / 1000 }, iso_color);
         } else {
-            showResponsePopup(`[${response.dt.toFixed(2)}s] Requête traitée avec succès`, '#ffffffaa');
+            waitForJob(job_id, iso_color, start);
         }
-
-        // Réinitialiser le bouton à son style initial une fois la réponse reçue
-        $('#go-btn').removeClass('waiting');
-        $('#go-btn').text('GO');
     }).fail(function() {
-        // En cas d'erreur, également réinitialiser le bouton
-        $('#go-btn').removeClass('waiting');
-        $('#go-btn').text('GO');
-        alert("Erreur lors de l'envoi de la requête.");
+        resetGoButton();
+        alert("Erreur lors de la récupération du résultat.");
     });
-});
+}
+
+/**
+ * Décode une topologie quantifiée (TopoJSON) en géométries GeoJSON
+ * @param {Object} topology - La topologie retournée par le serveur
+ * @returns {Object} Les géométries GeoJSON, indexées par nom
+ */
+function decodeTopology(topology) {
+    var scale = topology.transform.scale;
+    var translate = topology.transform.translate;
+
+    // Arcs codés en différences successives sur la grille quantifiée
+    var arcs = topology.arcs.map(function(arc) {
+        var x = 0, y = 0;
+        return arc.map(function(delta) {
+            x += delta[0];
+            y += delta[1];
+            return [x * scale[0] + translate[0], y * scale[1] + translate[1]];
+        });
+    });
+
+    // Un indice négatif (~i) désigne l'arc i parcouru à l'envers ; arcs consécutifs partagent une extrémité
+    function ring(indices) {
+        var points = [];
+        indices.forEach(function(index) {
+            var arc = index >= 0 ? arcs[index] : arcs[~index].slice().reverse();
+            points = points.concat(points.length ? arc.slice(1) : arc);
+        });
+        return points;
+    }
+
+    function geometry(object) {
+        if (object.type === 'Polygon') {
+            return { type: 'Polygon', coordinates: object.arcs.map(ring) };
+        } else if (object.type === 'MultiPolygon') {
+            return { type: 'MultiPolygon', coordinates: object.arcs.map(function(polygon) { return polygon.map(ring); }) };
+        } else if (object.type === 'GeometryCollection') {
+            return { type: 'GeometryCollection', geometries: object.geometries.map(geometry) };
+        }
+        return null;
+    }
+
+    var geometries = {};
+    Object.keys(topology.objects).forEach(function(name) {
+        geometries[name] = geometry(topology.objects[name]);
+    });
+    return geometries;
+}
+
+/**
+ * Réinitialise le bouton "GO" à son style initial
+ */
+function resetGoButton() {
+    $('#go-btn').removeClass('waiting');
+    $('#go-btn').text('GO');
+}
+
+/**
+ * Affiche le résultat d'un calcul sur la carte
+ * @param {Object} response - La réponse du serveur
+ * @param {string} iso_color - La couleur de la zone de présence potentielle
+ */
+function showResponse(response, iso_color) {
+    // Traiter la réponse du serveur
+    console.log(`temps de chargement : ${response.dt}s`);
+    console.log(`graine de sélection : ${response.seed}`);
+    // console.log(`Liste des clés de la réponse : ${Object.keys(response)}`);
+    // console.log(response);
+
+    last_response = response;
+    
+    // L.geoJSON(response.isoA, {
+    //     style: { color: "#FF0000", weight: 2, fill: false },
+    // }).addTo(map);
+
+    // L.geoJSON(response.isoB, {
+    //     style: { color: "#0000FF", weight: 2, fill: false },
+    // }).addTo(map);
+
+    // L.geoJSON(response.isoC, {
+    //     style: { color: "#00FF00", weight: 2, fill: false },
+    // }).addTo(map);
+
+    if (response.zpp){
+        L.geoJSON(response.zpp, {
+            style: { color: iso_color, weight: 2, opacity: 0.1 },
+        }).addTo(map);
+    }
+
+    if (response.points) {
+        points = response.points;
+        markerColor = $('#dot_color').val();
+        for (let i = 0; i < points.length; i++) {
+            marker = L.circleMarker(points[i], {
+                color: markerColor, // Couleur de la bordure
+                fillColor: markerColor, // Couleur de remplissage
+                fillOpacity: 0.6, // Opacité du remplissage
+                radius: 5 // Taille du cercle
+            }).addTo(map);
+            markers.push(marker);
+        }
+    }
+    if (response.error) {
+        console.log(response.error);
+        showResponsePopup(`[${response.dt.toFixed(2)}s] Une erreur est survenue, voir les logs`, '#ff0000aa');
+    } else {
+        showResponsePopup(`[${response.dt.toFixed(2)}s] Requête traitée avec succès`, '#ffffffaa');
+    }
+
+    // Réinitialiser le bouton à son style initial une fois la réponse reçue
+    resetGoButton();
+}
 
 // Fonction pour réinitialiser la carte
 $('#rst-btn').click(function(event) {
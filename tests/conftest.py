@@ -0,0 +1,9 @@
+# tests/conftest.py
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Les modules chargent data/config.json et data/modes.json relativement à la racine du dépôt
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
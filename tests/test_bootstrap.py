@@ -0,0 +1,60 @@
+# tests/test_bootstrap.py
+import json
+
+import pytest
+
+from web.bootstrap import AppMetadata
+
+STRATEGIE = {"weights": {"degree": 1, "difference_angle": -1}, "points_repeltion": 1, "points_repeltion_alpha": 0.5, "direction_alpha": 0.1}
+
+class FlakyLoader:
+    """
+    Lecture des attributs qui échoue `failures` fois (base indisponible) puis réussit.
+    """
+    def __init__(self, failures: int, attrs=("degree", "max_speed")) -> None:
+        self.failures = failures
+        self.attrs = list(attrs)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RuntimeError("base indisponible")
+        return self.attrs
+
+@pytest.fixture
+def modes_file(tmp_path):
+    path = tmp_path / "modes.json"
+    path.write_text(json.dumps({"force": STRATEGIE}))
+    return str(path)
+
+def test_attributes_retried_after_failed_start(modes_file):
+    loader = FlakyLoader(failures=1)
+    metadata = AppMetadata(modes_file, loader)
+    metadata.refresh()
+    assert loader.calls == 1
+    assert "max_speed" not in metadata.advanced_menu
+
+    metadata.refresh()
+    assert loader.calls == 2
+    assert "max_speed" in metadata.advanced_menu
+    assert metadata.attrs == ["degree", "max_speed"]
+
+    # Une fois les attributs lus, un fichier inchangé n'est plus rechargé
+    metadata.refresh()
+    metadata.refresh()
+    assert loader.calls == 2
+
+def test_weights_validated_once_attributes_are_available(modes_file):
+    with open(modes_file, "w") as f:
+        json.dump({"force": STRATEGIE, "inconnu": {**STRATEGIE, "weights": {"absent": 1}}}, f)
+    loader = FlakyLoader(failures=1)
+    metadata = AppMetadata(modes_file, loader)
+    # Sans attributs, les poids ne peuvent pas être vérifiés : les stratégies sont servies
+    assert set(metadata.refresh().modes) == {"force", "inconnu"}
+    # Les attributs lus, la validation est refaite et échoue : l'erreur est journalisée, la dernière version conservée
+    metadata.refresh()
+    assert loader.calls == 2
+    assert metadata.attrs == ["degree", "max_speed"]
+    with pytest.raises(ValueError):
+        metadata.load()
@@ -0,0 +1,82 @@
+# tests/test_cache.py
+import json
+import threading
+
+import utils.cache
+from utils.cache import LRUCache
+
+def test_lru_eviction():
+    cache = LRUCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert "b" not in cache
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats() == {"size": 2, "max_size": 2, "hits": 3, "misses": 0}
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(utils.cache, "time", lambda: now[0])
+    cache = LRUCache(max_size=8, ttl=10)
+    cache.set(("lat", "lon"), [1, 2])
+    now[0] += 5
+    assert cache.get(("lat", "lon")) == [1, 2]
+    now[0] += 6
+    assert cache.get(("lat", "lon")) is None
+    assert cache.misses == 1
+    assert len(cache) == 0
+
+def test_persistence_round_trip(tmp_path):
+    path = str(tmp_path / "cache.json")
+    cache = LRUCache(max_size=8, path=path, save_interval=3600)
+    cache.set(("a", 1), {"x": 1})
+    cache.set("b", [1, 2])
+    cache.flush()
+
+    reloaded = LRUCache(max_size=8, path=path)
+    assert reloaded.get(("a", 1)) == {"x": 1}
+    assert reloaded.get("b") == [1, 2]
+
+def test_set_does_not_save_every_insert(tmp_path, monkeypatch):
+    saves = []
+    cache = LRUCache(max_size=64, path=str(tmp_path / "cache.json"), save_interval=3600)
+    save = cache.save
+    monkeypatch.setattr(cache, "save", lambda: (saves.append(1), save()))
+    for i in range(50):
+        cache.set(i, i)
+    assert saves == []
+    cache.flush()
+    cache.flush()
+    assert saves == [1]
+
+def test_expired_entries_not_reloaded(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(utils.cache, "time", lambda: now[0])
+    path = str(tmp_path / "cache.json")
+    cache = LRUCache(max_size=8, ttl=10, path=path, save_interval=3600)
+    cache.set("old", 1)
+    now[0] += 8
+    cache.set("new", 2)
+    cache.flush()
+    now[0] += 5
+    reloaded = LRUCache(max_size=8, ttl=10, path=path)
+    assert "old" not in reloaded
+    assert reloaded.get("new") == 2
+
+def test_concurrent_saves_leave_valid_file(tmp_path):
+    path = tmp_path / "cache.json"
+    caches = [LRUCache(max_size=256, path=str(path), save_interval=3600) for _ in range(4)]
+    for n, cache in enumerate(caches):
+        for i in range(200):
+            cache.set(f"{n}:{i}", i)
+
+    threads = [threading.Thread(target=cache.save) for cache in caches for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(json.loads(path.read_text())) == 200
+    assert [p.name for p in tmp_path.iterdir()] == ["cache.json"]
@@ -0,0 +1,38 @@
+# tests/test_db_utils.py
+from psycopg2 import sql
+
+from utils import db_utils
+from utils.db_utils import QueryParams, execute_prepared
+
+class FakeConnection:
+    pass
+
+class FakeCursor:
+    """
+    Curseur qui enregistre les requêtes au lieu de les envoyer au serveur.
+    """
+    def __init__(self) -> None:
+        self.connection = FakeConnection()
+        self.queries = []
+
+    def execute(self, query, values=None) -> None:
+        self.queries.append(query)
+
+def test_statement_prepared_once_per_connection():
+    cur = FakeCursor()
+    for value in range(3):
+        params = QueryParams()
+        execute_prepared(cur, sql.SQL("SELECT {}").format(params(value)), params)
+    assert sum(query.startswith("PREPARE") for query in cur.queries) == 1
+    assert sum(query.startswith("EXECUTE") for query in cur.queries) == 3
+
+def test_prepared_statements_capped(monkeypatch):
+    monkeypatch.setattr(db_utils, "MAX_PREPARED_STATEMENTS", 2)
+    cur = FakeCursor()
+    for table in ("a", "b", "a", "c"):
+        execute_prepared(cur, sql.SQL(f"SELECT * FROM {table}"))
+    assert sum(query.startswith("DEALLOCATE") for query in cur.queries) == 1
+    assert len(db_utils._prepared_statements[cur.connection]) == 2
+    # "a" a été réutilisée après "b" : c'est "b" qui a été libérée, "a" est toujours préparée
+    execute_prepared(cur, sql.SQL("SELECT * FROM a"))
+    assert sum(query.startswith("PREPARE") for query in cur.queries) == 3
@@ -0,0 +1,56 @@
+# tests/test_decimation.py
+import numpy as np
+
+from core.scoring import decimate, grid_cells
+from core.zone import Zone
+
+def make_zone(x, y):
+    return Zone(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64), {})
+
+def test_grid_cells_dense_numbering():
+    x = np.array([0.0, 5.0, 15.0, 25.0, 0.0])
+    y = np.array([0.0, 5.0, 0.0, 0.0, 12.0])
+    cells = grid_cells(x, y, 10.0)
+    # (0, 0) et (5, 5) partagent la cellule d'origine ; les autres nœuds sont chacun dans la leur
+    assert cells[0] == cells[1]
+    assert len(set(cells.tolist())) == 4
+    assert sorted(set(cells.tolist())) == [0, 1, 2, 3]
+
+def test_decimate_keeps_top_k_per_cell():
+    rng = np.random.default_rng(0)
+    x = rng.uniform(0, 1000, 5000)
+    y = rng.uniform(0, 1000, 5000)
+    scores = rng.random(5000)
+    zone = make_zone(x, y)
+    kept = decimate(zone, scores, max_cells=16, top_k=3)
+
+    assert np.all(np.diff(kept) > 0)
+    # La meilleure valeur de la zone est toujours conservée
+    assert int(np.argmax(scores)) in kept
+
+    # Recalcul par force brute avec la taille de cellule retenue par decimate (emprise pleine : pas d'ajustement)
+    cell_size = np.sqrt(np.ptp(x) * np.ptp(y) / 16)
+    cells = grid_cells(x, y, cell_size)
+    expected = []
+    for cell in np.unique(cells):
+        members = np.flatnonzero(cells == cell)
+        expected.extend(members[np.argsort(-scores[members], kind="stable")[:3]].tolist())
+    assert kept.tolist() == sorted(expected)
+
+def test_decimate_small_zone_is_kept_whole():
+    zone = make_zone([0.0, 1.0, 2.0], [0.0, 1.0, 2.0])
+    assert decimate(zone, np.array([0.1, 0.2, 0.3]), max_cells=4, top_k=5).tolist() == [0, 1, 2]
+
+def test_decimate_ring_zone_uses_about_max_cells():
+    # Zone en anneau : seule une partie de l'emprise est occupée, la grille est resserrée
+    rng = np.random.default_rng(1)
+    angle = rng.uniform(0, 2 * np.pi, 20000)
+    radius = rng.uniform(900, 1000, 20000)
+    zone = make_zone(radius * np.cos(angle), radius * np.sin(angle))
+    kept = decimate(zone, rng.random(20000), max_cells=100, top_k=1)
+    assert 60 <= len(kept) <= 200
+
+def test_decimate_nan_scores_ranked_last():
+    zone = make_zone(np.zeros(4), np.zeros(4))
+    kept = decimate(zone, np.array([np.nan, 0.5, np.nan, 0.1]), max_cells=1, top_k=2)
+    assert kept.tolist() == [1, 3]
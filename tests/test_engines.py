@@ -0,0 +1,178 @@
+# tests/test_engines.py
+import json
+import math
+import random
+
+import numpy as np
+import pytest
+
+from core.epeire import Epeire
+from core.scoring import compute_base_features, pick_points, score_matrix
+from core.zone import Zone
+from utils.db_utils import STATIC_FEATURES, close_pool, get_pool
+from utils.np_utils import SIGMOID_STEEPNESS, to_mercator, to_wgs84
+
+START = (43.6465, 0.5855)
+
+with open("data/modes.json") as f:
+    MODES = json.load(f)
+
+STRATEGIES = {
+    **MODES,
+    "distance": {"weights": {"distance_to_start": 1, "difference_angle": 0.5, "max_speed": 0.3},
+                 "points_repeltion": 2, "points_repeltion_alpha": 0.2, "direction_alpha": 0.5},
+}
+
+@pytest.fixture(scope="module")
+def database():
+    """
+    Base PostGIS de data/db_params.json ; les tests sont ignorés si elle n'est pas joignable.
+    """
+    try:
+        pool = get_pool()
+        conn = pool.getconn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT postgis_version()")
+        finally:
+            conn.rollback()
+            pool.putconn(conn)
+    except Exception as e:
+        close_pool()
+        pytest.skip(f"PostGIS indisponible: {e}")
+    yield
+    close_pool()
+
+def fill_zone(epeire: Epeire, n_nodes: int = 2000, seed: int = 0) -> None:
+    """
+    Remplit la table temporaire de la zone de l'instance avec des intersections synthétiques autour du départ.
+    """
+    rng = np.random.default_rng(seed)
+    x0, y0 = to_mercator(*START)
+    x = x0 + rng.uniform(-8000, 8000, n_nodes)
+    y = y0 + rng.uniform(-8000, 8000, n_nodes)
+    values = rng.integers(1, 8, (n_nodes, len(STATIC_FEATURES))) + rng.random((n_nodes, len(STATIC_FEATURES)))
+    columns = ", ".join(f"{attr} REAL" for attr in STATIC_FEATURES)
+    with epeire.session.activate() as session, session.conn.cursor() as cur:
+        cur.execute(f"CREATE TEMP TABLE {epeire.table_name} (id BIGSERIAL, {columns}, geometry geometry(Point, 3857)) ON COMMIT DROP")
+        cur.executemany(
+            f"INSERT INTO {epeire.table_name} ({', '.join(STATIC_FEATURES)}, geometry) "
+            f"VALUES ({', '.join(['%s'] * len(STATIC_FEATURES))}, ST_SetSRID(ST_MakePoint(%s, %s), 3857))",
+            [(*map(float, row), float(a), float(b)) for row, a, b in zip(values, x, y)]
+        )
+
+@pytest.mark.parametrize("name", sorted(STRATEGIES))
+@pytest.mark.parametrize("direction", ["N", "SE", "None"])
+def test_numpy_engine_matches_sql(database, name, direction):
+    strategie = STRATEGIES[name]
+    with Epeire(None, direction, START) as epeire:
+        fill_zone(epeire)
+        # Le moteur en mémoire lit la table sans la modifier ; le moteur SQL supprime les points choisis
+        expected = epeire.select_points(strategie, 8, "numpy", seed=7)
+        points = epeire.select_points(strategie, 8, "sql", seed=7)
+    assert len(points) == len(expected) == 8
+    for point, reference in zip(points, expected):
+        assert point == pytest.approx(reference, abs=1e-7)
+
+# Zone de référence sans base : décalages (m) au départ et attributs ; le premier nœud est confondu avec le départ
+OFFSETS = [(0, 0), (1000, 0), (0, 2000), (-1500, -1500), (3000, 1000), (500, -2500), (-2000, 500)]
+ATTRS = {
+    "degree": [3, 4, 1, 2, 5, 3, 4],
+    "max_speed": [50, math.nan, 30, 90, 70, 50, 110],
+    "min_speed": [30, math.nan, 30, 50, 50, 30, 90],
+    "road_importance": [1, 3, 1, 5, 4, 2, 7],
+}
+ANGLE_FUITE = 90
+
+def reference_sigmoid(value, offset=0.0, scale=1.0):
+    return 2 / (1 + math.exp((offset - value) * SIGMOID_STEEPNESS / (scale or 1))) - 1
+
+def reference_normalize(values):
+    """
+    Normalisation min-max de normalize_column : les valeurs manquantes (None) sont ignorées et conservées.
+    """
+    known = [v for v in values if v is not None]
+    low, high = min(known), max(known)
+    return [None if v is None else (0.0 if high == low else (v - low) / (high - low)) for v in values]
+
+def reference_features():
+    """
+    Attributs calculés nœud par nœud, comme score_zone : l'azimut d'un nœud confondu avec le départ est NULL.
+    """
+    angles = []
+    for dx, dy in OFFSETS:
+        if dx == 0 and dy == 0:
+            angles.append(None)
+            continue
+        diff = abs(math.degrees(math.atan2(dx, dy)) % 360 - ANGLE_FUITE)
+        angles.append(min(diff, 360 - diff))
+    return {
+        "distance_to_start": [reference_sigmoid(v) for v in reference_normalize([math.hypot(dx, dy) for dx, dy in OFFSETS])],
+        "difference_angle": reference_normalize(angles),
+        **{name: reference_normalize([None if math.isnan(v) else v for v in values]) for name, values in ATTRS.items()},
+    }
+
+def reference_scores(features, strategie):
+    scores = []
+    for i in range(len(OFFSETS)):
+        score = 0.0
+        for attr, weight in strategie["weights"].items():
+            value = features[attr][i]
+            if value is not None and attr == "difference_angle":
+                value = reference_sigmoid(value, 0.5, strategie["direction_alpha"])
+            # COALESCE(n.attr, 0) de score_zone
+            score += (value or 0.0) * weight
+        scores.append(score)
+    return scores
+
+def reference_picks(scores, strategie, n_points, rng):
+    """
+    Boucle de Epeire.select_points : meilleur score tiré parmi les TOP_POINT_ENTROPY premiers, puis répulsion.
+    """
+    scores = list(scores)
+    remaining = list(range(len(OFFSETS)))
+    picked = []
+    while remaining and len(picked) < n_points:
+        if picked:
+            last = OFFSETS[picked[-1]]
+            distances = reference_normalize([math.hypot(OFFSETS[i][0] - last[0], OFFSETS[i][1] - last[1]) for i in remaining])
+            for i, distance in zip(remaining, distances):
+                scores[i] += strategie["points_repeltion"] * reference_sigmoid(distance, scale=strategie["points_repeltion_alpha"])
+        ranked = sorted(remaining, key=lambda i: (-scores[i], i))
+        picked.append(ranked[min(rng.randint(0, 4), len(ranked) - 1)])
+        remaining.remove(picked[-1])
+    return picked
+
+@pytest.fixture
+def reference_zone():
+    x0, y0 = to_mercator(*START)
+    return Zone([x0 + dx for dx, _ in OFFSETS], [y0 + dy for _, dy in OFFSETS], ATTRS)
+
+def test_base_features_match_reference(reference_zone):
+    features = compute_base_features(reference_zone, START, ANGLE_FUITE)
+    for name, expected in reference_features().items():
+        expected = [math.nan if v is None else v for v in expected]
+        assert features[name] == pytest.approx(expected, nan_ok=True), name
+
+@pytest.mark.parametrize("name", sorted(STRATEGIES))
+def test_numpy_scores_and_picks_match_reference(reference_zone, name):
+    strategie = STRATEGIES[name]
+    base = compute_base_features(reference_zone, START, ANGLE_FUITE)
+    scores = score_matrix(base, [strategie])[:, 0]
+    expected = reference_scores(reference_features(), strategie)
+    assert scores == pytest.approx(expected)
+
+    points = pick_points(reference_zone, scores, strategie, 5, random.Random(3))
+    indices = reference_picks(expected, strategie, 5, random.Random(3))
+    lat, lon = to_wgs84(reference_zone.x[indices], reference_zone.y[indices])
+    assert points == pytest.approx(list(zip(lat, lon)))
+
+def test_start_node_has_no_direction(reference_zone):
+    """
+    Le nœud confondu avec le départ n'a pas d'azimut (NULL en SQL) : il ne compte ni dans la normalisation
+    de la différence angulaire ni dans le score, au lieu de l'azimut 0 (nord) que donne arctan2(0, 0).
+    """
+    base = compute_base_features(reference_zone, START, ANGLE_FUITE)
+    assert math.isnan(base["difference_angle"][0])
+    strategie = {"weights": {"difference_angle": 1}, "direction_alpha": 0.5}
+    assert score_matrix(base, [strategie])[0, 0] == 0
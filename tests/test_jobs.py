@@ -0,0 +1,61 @@
+# tests/test_jobs.py
+import threading
+
+import pytest
+
+from web.jobs import JobQueue, QueueFullError
+
+def blocking(release: threading.Event, value):
+    release.wait(5)
+    return value
+
+def test_identical_jobs_are_deduplicated():
+    queue = JobQueue(max_workers=2, max_pending=4)
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        return blocking(release, "ok")
+
+    first = queue.submit("key", work)
+    second = queue.submit("key", work)
+    assert second is first
+    release.set()
+    assert first.done.wait(5)
+    assert first.to_dict() == {"job_id": first.id, "status": "done", "result": "ok"}
+    assert calls == [1]
+
+def test_finished_job_is_not_reused():
+    queue = JobQueue(max_workers=1, max_pending=4)
+    first = queue.submit("key", lambda: 1)
+    assert first.done.wait(5)
+    second = queue.submit("key", lambda: 2)
+    assert second is not first
+    assert second.done.wait(5)
+    assert second.result == 2
+
+def test_backpressure_when_queue_is_full():
+    queue = JobQueue(max_workers=1, max_pending=2)
+    release = threading.Event()
+    jobs = [queue.submit(i, blocking, release, i) for i in range(2)]
+    with pytest.raises(QueueFullError):
+        queue.submit("other", blocking, release, "other")
+    # Une tâche identique à une tâche en cours est acceptée même quand la file est pleine
+    assert queue.submit(0, blocking, release, 0) is jobs[0]
+    assert queue.stats()["in_flight"] == 2
+
+    release.set()
+    for job in jobs:
+        assert job.done.wait(5)
+    assert queue.submit("other", lambda: "other").done.wait(5)
+
+def test_error_is_reported():
+    queue = JobQueue(max_workers=1)
+
+    def fail():
+        raise ValueError("boom")
+
+    job = queue.submit("key", fail)
+    assert job.done.wait(5)
+    assert job.to_dict() == {"job_id": job.id, "status": "error", "error": "boom"}
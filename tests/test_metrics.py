@@ -0,0 +1,80 @@
+# tests/test_metrics.py
+import importlib
+
+import psycopg2.extensions
+import pytest
+
+from utils.metrics import InstrumentedCursor, InstrumentedCursorMixin, Metrics, sql_fingerprint
+from web import webapp
+
+# Le paquet utils réexporte l'instance `metrics` sous le nom du module
+metrics_module = importlib.import_module("utils.metrics")
+
+class StubCursor:
+    """
+    Curseur sans base : chaque requête affecte `rows` lignes, une requête contenant ERREUR échoue.
+    """
+    def __init__(self, rows: int) -> None:
+        self.rows = rows
+        self.rowcount = -1
+        self.queries = []
+
+    def execute(self, query, vars=None):
+        self.queries.append((query, vars))
+        if b"ERREUR" in (query if isinstance(query, bytes) else query.encode()):
+            raise RuntimeError("requête invalide")
+        self.rowcount = self.rows
+
+class InstrumentedStubCursor(InstrumentedCursorMixin, StubCursor):
+    pass
+
+@pytest.fixture
+def registry(monkeypatch):
+    """
+    Registre activé, isolé du registre global, utilisé par le curseur et par /metrics.
+    """
+    registry = Metrics(enabled=True)
+    monkeypatch.setattr(metrics_module, "metrics", registry)
+    monkeypatch.setattr(webapp, "metrics", registry)
+    return registry
+
+def test_instrumented_cursor_is_a_psycopg2_cursor():
+    assert issubclass(InstrumentedCursor, psycopg2.extensions.cursor)
+    # La mesure enveloppe l'execute de psycopg2
+    assert InstrumentedCursor.execute is InstrumentedCursorMixin.execute
+
+def test_cursor_calls_exported_on_metrics_endpoint(registry):
+    cur = InstrumentedStubCursor(rows=3)
+    cur.execute("UPDATE zone SET score = 1 WHERE id = %s", (7,))
+    # Même requête aux littéraux près : même empreinte
+    cur.execute(b"UPDATE zone SET score = 2 WHERE id = %s", (8,))
+    assert cur.queries == [("UPDATE zone SET score = 1 WHERE id = %s", (7,)), (b"UPDATE zone SET score = 2 WHERE id = %s", (8,))]
+
+    fingerprint = sql_fingerprint("UPDATE zone SET score = 1 WHERE id = %s")
+    labels = f'fingerprint="{fingerprint}"'
+    webapp.app.config["TESTING"] = True
+    response = webapp.app.test_client().get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    lines = response.get_data(as_text=True).splitlines()
+    assert "# TYPE epeire_db_rows_total counter" in lines
+    assert f"epeire_db_rows_total{{{labels}}} 6" in lines
+    assert "# TYPE epeire_db_query_seconds histogram" in lines
+    assert f'epeire_db_query_seconds_bucket{{{labels},le="+Inf"}} 2' in lines
+    assert f"epeire_db_query_seconds_count{{{labels}}} 2" in lines
+
+def test_failed_query_is_measured_and_reraised(registry):
+    cur = InstrumentedStubCursor(rows=3)
+    with pytest.raises(RuntimeError):
+        cur.execute("SELECT 'ERREUR'")
+    fingerprint = sql_fingerprint("SELECT 'ERREUR'")
+    text = registry.render()
+    # Aucune ligne affectée (rowcount -1), mais la durée est observée
+    assert f'epeire_db_rows_total{{fingerprint="{fingerprint}"}} 0' in text
+    assert f'epeire_db_query_seconds_count{{fingerprint="{fingerprint}"}} 1' in text
+
+def test_disabled_metrics_record_nothing(monkeypatch):
+    registry = Metrics(enabled=False)
+    monkeypatch.setattr(metrics_module, "metrics", registry)
+    InstrumentedStubCursor(rows=1).execute("SELECT 1")
+    assert registry.render() == "\n"
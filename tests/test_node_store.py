@@ -0,0 +1,93 @@
+# tests/test_node_store.py
+import json
+import os
+
+import numpy as np
+import pytest
+from shapely.geometry import Point, Polygon, box
+
+from core.node_store import NodeStore, STORE_VERSION
+from utils.np_utils import to_wgs84
+
+CELL_SIZE = 500.0
+
+@pytest.fixture(scope="module")
+def store(tmp_path_factory):
+    """
+    Magasin de nœuds écrit au format de NodeStore.export, sans base de données :
+    nœuds aléatoires, quelques-uns placés exactement sur les bords de cellules et du polygone testé.
+    """
+    path = str(tmp_path_factory.mktemp("node_store"))
+    rng = np.random.default_rng(0)
+    x = np.concatenate([rng.uniform(0, 10_000, 20_000), [2000.0, 3000.0, 2500.0, 4000.0]])
+    y = np.concatenate([rng.uniform(0, 8_000, 20_000), [2000.0, 2500.0, 3000.0, 3000.0]])
+    region = (x > 5000).astype("<i2")
+    degree = rng.integers(1, 6, len(x)).astype("<f4")
+
+    n_cols = int(np.ptp(x) // CELL_SIZE) + 1
+    n_rows = int(np.ptp(y) // CELL_SIZE) + 1
+    origin = (float(x.min()), float(y.min()))
+    cells = np.floor((y - origin[1]) / CELL_SIZE).astype(np.int64) * n_cols + np.floor((x - origin[0]) / CELL_SIZE).astype(np.int64)
+    order = np.argsort(cells, kind="stable")
+
+    dtypes = {"x": "<f8", "y": "<f8", "region": "<i2", "degree": "<f4"}
+    for name, values in {"x": x, "y": y, "region": region, "degree": degree}.items():
+        values[order].astype(dtypes[name]).tofile(os.path.join(path, f"{name}.bin"))
+    offsets = np.zeros(n_rows * n_cols + 1, dtype="<i8")
+    offsets[1:] = np.cumsum(np.bincount(cells, minlength=n_rows * n_cols))
+    offsets.tofile(os.path.join(path, "offsets.bin"))
+
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump({
+            "version": STORE_VERSION,
+            "count": len(x),
+            "attrs": ["degree"],
+            "regions": ["ouest", "est"],
+            "cell_size": CELL_SIZE,
+            "origin": list(origin),
+            "shape": [n_rows, n_cols],
+            "columns": dtypes,
+            "stats": {"*": {"degree": [1, 5]}},
+        }, f)
+    return NodeStore(path)
+
+def brute_force(store, polygon):
+    """
+    Nœuds du magasin qui intersectent le polygone, testés un par un sans la grille.
+    """
+    x = np.asarray(store.columns["x"])
+    y = np.asarray(store.columns["y"])
+    inside = np.array([polygon.intersects(Point(a, b)) for a, b in zip(x, y)])
+    return x[inside], y[inside], np.asarray(store.columns["degree"])[inside]
+
+def as_set(x, y, degree):
+    return set(zip(x.tolist(), y.tolist(), degree.tolist()))
+
+@pytest.mark.parametrize("polygon", [
+    # Anneau (zone valide entre deux isochrones)
+    Point(4000, 3000).buffer(2500).difference(Point(4500, 3200).buffer(1000)),
+    # Rectangle dont les bords passent par des nœuds et des limites de cellules
+    box(2000, 2000, 3000, 3000),
+    # Polygone qui déborde de l'emprise du magasin
+    Polygon([(-1000, -1000), (3000, -500), (1500, 12_000)]),
+    # Polygone hors de l'emprise du magasin
+    box(20_000, 20_000, 21_000, 21_000),
+])
+def test_extract_matches_brute_force(store, polygon):
+    zone = store.extract(polygon)
+    expected = brute_force(store, polygon)
+    assert len(zone) == len(expected[0])
+    assert as_set(zone.x, zone.y, zone.attrs["degree"]) == as_set(*expected)
+
+def test_extract_includes_boundary_nodes(store):
+    zone = store.extract(box(2000, 2000, 3000, 3000))
+    points = set(zip(zone.x.tolist(), zone.y.tolist()))
+    assert {(2000.0, 2000.0), (3000.0, 2500.0), (2500.0, 3000.0)} <= points
+    assert (4000.0, 3000.0) not in points
+
+@pytest.mark.parametrize("x, y", [(9000.0, 100.0), (100.0, 7900.0), (5001.0, 4000.0), (-5000.0, 20_000.0)])
+def test_region_of_nearest_node(store, x, y):
+    xs, ys = np.asarray(store.columns["x"]), np.asarray(store.columns["y"])
+    nearest = int(np.argmin(np.hypot(xs - x, ys - y)))
+    lat, lon = to_wgs84(np.array([x]), np.array([y]))
+    assert store.region((float(lat[0]), float(lon[0]))) == store.regions[store.columns["region"][nearest]]
@@ -0,0 +1,75 @@
+# tests/test_osm_import.py
+import math
+import struct
+from array import array
+
+import pytest
+
+from utils.np_utils import to_mercator
+from utils.osm_import import COPY_HEADER, COPY_TRAILER, encode_copy_chunk, parse_lanes, parse_maxspeed, way_node_edges
+
+def decode_copy_rows(data: bytes):
+    """
+    Relit ligne par ligne un flux COPY binaire (lecture indépendante de encode_copy_chunk).
+    """
+    formats = ["q", "h", "h", "f", "f", "d", "d"]
+    assert data.startswith(COPY_HEADER) and data.endswith(COPY_TRAILER)
+    data = data[len(COPY_HEADER):-len(COPY_TRAILER)]
+    rows, offset = [], 0
+    while offset < len(data):
+        (count,) = struct.unpack_from(">h", data, offset)
+        offset += 2
+        assert count == len(formats)
+        row = []
+        for fmt in formats:
+            (length,) = struct.unpack_from(">i", data, offset)
+            assert length == struct.calcsize(fmt)
+            row.append(struct.unpack_from(f">{fmt}", data, offset + 4)[0])
+            offset += 4 + length
+        rows.append(row)
+    return rows
+
+def test_copy_chunk_encoding():
+    lat, lon = [43.6465, -33.9], [0.5855, 151.2]
+    chunk = encode_copy_chunk(
+        array('q', [1, 2**40 + 7]), array('h', [1, 2]), array('h', [3, 7]),
+        array('f', [50.0, math.nan]), array('f', [math.nan, 2.0]), array('d', lat), array('d', lon),
+    )
+    rows = decode_copy_rows(COPY_HEADER + chunk + COPY_TRAILER)
+    assert len(rows) == 2
+    x, y = to_mercator(lat, lon)
+    assert rows[0][:4] == [1, 1, 3, 50.0] and math.isnan(rows[0][4])
+    assert rows[1][:3] == [2**40 + 7, 2, 7] and math.isnan(rows[1][3]) and rows[1][4] == 2.0
+    for row, a, b in zip(rows, x, y):
+        assert row[5:] == pytest.approx([a, b])
+
+def test_copy_chunk_empty():
+    empty = [array(code) for code in "qhhffdd"]
+    assert encode_copy_chunk(*empty) == b""
+
+@pytest.mark.parametrize("highway, refs, edges", [
+    ("residential", [10, 11, 12, 13], [1, 2, 2, 1]),
+    ("primary", [10, 11], [1, 1]),
+    # Rond-point : le nœud de fermeture est écarté et aucun nœud n'est une extrémité
+    ("tertiary", [10, 11, 12, 10], [2, 2, 2]),
+    # Deux nœuds identiques ne forment pas une boucle
+    ("tertiary", [10, 10], [1, 1]),
+    ("residential", [10], []),
+    ("residential", [], []),
+    ("footway", [10, 11, 12], []),
+    (None, [10, 11, 12], []),
+])
+def test_way_node_edges(highway, refs, edges):
+    assert way_node_edges(highway, refs) == edges
+
+@pytest.mark.parametrize("value, speed", [
+    ("50", 50.0), ("30 mph", 30 * 1.609344), ("50;70", 50.0), ("FR:urban", None), ("", None), (None, None),
+])
+def test_parse_maxspeed(value, speed):
+    result = parse_maxspeed(value)
+    assert math.isnan(result) if speed is None else result == pytest.approx(speed)
+
+@pytest.mark.parametrize("value, lanes", [("2", 2.0), ("2;3", 2.0), ("deux", None), (None, None)])
+def test_parse_lanes(value, lanes):
+    result = parse_lanes(value)
+    assert math.isnan(result) if lanes is None else result == lanes
@@ -0,0 +1,111 @@
+# tests/test_road_graph.py
+import numpy as np
+import pytest
+
+from core.road_graph import RoadGraph, build_csr, key_coords, road_direction, vertex_keys
+from utils.np_utils import to_wgs84
+
+# Sommets (EPSG:3857) et arêtes orientées (départ, arrivée, secondes) d'un petit graphe :
+# A-B, B-C et A-D à double sens, D -> C et C -> E à sens unique
+VERTICES = {"A": (0.0, 0.0), "B": (1000.0, 0.0), "C": (2000.0, 0.0), "D": (1000.0, 1000.0), "E": (5000.0, 5000.0)}
+EDGES = [("A", "B", 60), ("B", "A", 60), ("B", "C", 60), ("C", "B", 60), ("A", "D", 100), ("D", "A", 100),
+         ("D", "C", 30), ("C", "E", 500)]
+# D n'est pas une intersection de filtered_nodes
+REGIONS = {"A": 0, "B": 0, "C": 1, "D": -1, "E": 1}
+
+def key(name):
+    return vertex_keys(np.array([VERTICES[name][0]]), np.array([VERTICES[name][1]]))[0]
+
+def lat_lon(name):
+    lat, lon = to_wgs84(np.array([VERTICES[name][0]]), np.array([VERTICES[name][1]]))
+    return float(lat[0]), float(lon[0])
+
+@pytest.fixture(scope="module")
+def graph(tmp_path_factory):
+    """
+    Graphe écrit au format de RoadGraph.export, sans base de données.
+    """
+    path = str(tmp_path_factory.mktemp("road_graph") / "graph")
+    tmp_path = RoadGraph._export_folder(path)
+    sources = np.array([key(a) for a, _, _ in EDGES], dtype=np.uint64)
+    targets = np.array([key(b) for _, b, _ in EDGES], dtype=np.uint64)
+    keys, indptr, targets, costs = build_csr(sources, targets, np.array([cost for _, _, cost in EDGES], dtype=np.float64))
+    x, y = key_coords(keys)
+    names = {key(name): name for name in VERTICES}
+    columns = {
+        "x": x.astype("<f8"),
+        "y": y.astype("<f8"),
+        "indptr": indptr.astype("<i8"),
+        "targets": targets.astype("<i4"),
+        "times": costs.astype("<f4"),
+        "region": np.array([REGIONS[names[k]] for k in keys.tolist()], dtype="<i2"),
+        "degree": np.arange(len(keys), dtype="<f4"),
+    }
+    for name, column in columns.items():
+        column.tofile(f"{tmp_path}/{name}.bin")
+    return RoadGraph._publish(tmp_path, path, {
+        "vertices": len(keys),
+        "edges": len(costs),
+        "attrs": ["degree"],
+        "regions": ["ouest", "est"],
+        "columns": {name: column.dtype.str for name, column in columns.items()},
+        "stats": {"*": {"degree": (0, 4)}},
+    })
+
+def names_at(x, y):
+    lookup = {value: name for name, value in VERTICES.items()}
+    return [lookup[(float(a), float(b))] for a, b in zip(x, y)]
+
+def names_of(graph, vertices):
+    return names_at(graph.columns["x"][vertices], graph.columns["y"][vertices])
+
+def test_csr_layout():
+    keys, indptr, targets, costs = build_csr(np.array([3, 1, 3, 2], dtype=np.uint64), np.array([1, 2, 2, 3], dtype=np.uint64),
+                                             np.array([10.0, 20.0, 30.0, 40.0]))
+    assert keys.tolist() == [1, 2, 3]
+    assert indptr.tolist() == [0, 1, 2, 4]
+    # Arêtes sortantes de chaque sommet, dans l'ordre d'origine
+    assert targets.tolist() == [1, 2, 0, 1]
+    assert costs.tolist() == [20.0, 40.0, 10.0, 30.0]
+
+def test_vertex_keys_round_trip():
+    x = np.array([-1_000_000.123, 0.0, 2_500_000.5])
+    y = np.array([5_400_000.01, -3.0, 0.0])
+    kx, ky = key_coords(vertex_keys(x, y))
+    assert np.allclose(kx, x, atol=0.005) and np.allclose(ky, y, atol=0.005)
+
+@pytest.mark.parametrize("start, expected", [
+    ("A", {"A": 0, "B": 60, "D": 100, "C": 120, "E": 620}),
+    # D -> C est à sens unique : D n'est atteint depuis C qu'en repassant par A
+    ("C", {"C": 0, "B": 60, "A": 120, "D": 220, "E": 500}),
+    ("E", {"E": 0}),
+])
+def test_arrival_times_are_shortest_paths(graph, start, expected):
+    vertices, times = graph.arrival_times(lat_lon(start), 10_000)
+    assert dict(zip(names_of(graph, vertices), times.tolist())) == expected
+    # Sommets rendus dans l'ordre d'atteinte
+    assert np.all(np.diff(times) >= 0)
+
+def test_arrival_times_bounded(graph):
+    vertices, times = graph.arrival_times(lat_lon("A"), 110)
+    assert set(names_of(graph, vertices)) == {"A", "B", "D"}
+
+def test_zone_keeps_intersections_in_band(graph):
+    vertices, times = graph.arrival_times(lat_lon("A"), 10_000)
+    zone = graph.zone(vertices, times, 50, 130)
+    assert sorted(names_at(zone.x, zone.y)) == ["B", "C"]
+    # D n'est pas une intersection : la région est celle de l'intersection la plus proche
+    assert graph.region(lat_lon("D")) == "ouest"
+    assert graph.region(lat_lon("E")) == "est"
+    assert graph.stats() == {"degree": (0, 4)}
+
+@pytest.mark.parametrize("tags, direction", [
+    (("residential", None, None), 0),
+    (("primary", "yes", None), 1),
+    (("primary", "-1", None), -1),
+    (("motorway", None, None), 1),
+    (("tertiary", None, "roundabout"), 1),
+    (("motorway", "no", None), 0),
+])
+def test_road_direction(tags, direction):
+    assert road_direction(*tags) == direction
@@ -0,0 +1,60 @@
+# tests/test_scoring.py
+import random
+from itertools import islice
+
+import numpy as np
+import pytest
+
+from core.scoring import TOP_POINT_ENTROPY, iter_points_incremental
+from core.zone import Zone
+from utils.np_utils import distance_to_point, sigmoid
+
+def make_zone(n_nodes: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    zone = Zone(rng.uniform(0, 5000, n_nodes), rng.uniform(0, 3000, n_nodes), {})
+    return zone, rng.random(n_nodes)
+
+def brute_force_incremental(zone, scores, strategie, n_points, rng):
+    """
+    Référence de iter_points_incremental sans grille ni tas : après chaque point, la pénalité est
+    recalculée pour tous les nœuds restants et les meilleurs sont relus par un tri complet.
+    """
+    scores = np.array(scores, dtype=np.float64)
+    available = np.ones(len(zone), dtype=bool)
+    extent = float(np.hypot(np.ptp(zone.x), np.ptp(zone.y))) or 1.0
+    alpha = strategie["points_repeltion_alpha"] or 1
+    radius = abs(alpha) * extent
+
+    picked = []
+    while len(picked) < n_points and available.any():
+        if picked:
+            last = picked[-1]
+            remaining = np.flatnonzero(available)
+            distance = distance_to_point(zone.x[remaining], zone.y[remaining], zone.x[last], zone.y[last])
+            near = remaining[distance < radius]
+            penalty = strategie["points_repeltion"] * (1 - sigmoid(distance[distance < radius] / extent, scale=alpha))
+            scores[near] -= penalty
+
+        remaining = np.flatnonzero(available)
+        order = remaining[np.lexsort((remaining, -scores[remaining]))]
+        top = order[:TOP_POINT_ENTROPY]
+        offset = min(rng.randint(0, TOP_POINT_ENTROPY - 1), len(top) - 1)
+        picked.append(int(top[offset]))
+        available[picked[-1]] = False
+    return picked
+
+@pytest.mark.parametrize("repulsion", [1.0, 3.0, -1.0, 0.0])
+@pytest.mark.parametrize("alpha", [0.05, 0.3])
+def test_incremental_matches_brute_force_rescore(repulsion, alpha):
+    zone, scores = make_zone(3000)
+    strategie = {"points_repeltion": repulsion, "points_repeltion_alpha": alpha}
+    picked = list(islice(iter_points_incremental(zone, scores, strategie, random.Random(11)), 25))
+    assert picked == brute_force_incremental(zone, scores, strategie, 25, random.Random(11))
+    assert len(set(picked)) == 25
+
+def test_incremental_exhausts_small_zone():
+    zone, scores = make_zone(7, seed=3)
+    strategie = {"points_repeltion": 2.0, "points_repeltion_alpha": 0.5}
+    picked = list(iter_points_incremental(zone, scores, strategie, random.Random(0)))
+    assert sorted(picked) == list(range(7))
+    assert picked == brute_force_incremental(zone, scores, strategie, 7, random.Random(0))
@@ -0,0 +1,71 @@
+# tests/test_topology.py
+from shapely.geometry import Point, mapping, shape
+
+from utils.topology import to_topology
+
+def decode_arcs(topology):
+    """
+    Coordonnées absolues de chaque arc (différences cumulées puis transformation inverse).
+    """
+    (kx, ky), (x0, y0) = topology["transform"]["scale"], topology["transform"]["translate"]
+    arcs = []
+    for arc in topology["arcs"]:
+        x = y = 0
+        points = []
+        for dx, dy in arc:
+            x, y = x + dx, y + dy
+            points.append((x * kx + x0, y * ky + y0))
+        arcs.append(points)
+    return arcs
+
+def decode_geometry(topology, geometry):
+    """
+    Reconstruit la géométrie GeoJSON d'un objet de la topologie ; un indice négatif ~i parcourt l'arc i à l'envers.
+    """
+    arcs = decode_arcs(topology)
+
+    def ring(indices):
+        points = []
+        for index in indices:
+            arc = arcs[index] if index >= 0 else arcs[~index][::-1]
+            points.extend(arc if not points else arc[1:])
+        return points
+
+    kind = geometry["type"]
+    if kind == "Polygon":
+        return {"type": "Polygon", "coordinates": [ring(indices) for indices in geometry["arcs"]]}
+    if kind == "MultiPolygon":
+        return {"type": "MultiPolygon", "coordinates": [[ring(indices) for indices in polygon] for polygon in geometry["arcs"]]}
+    return {"type": "GeometryCollection", "geometries": [decode_geometry(topology, member) for member in geometry["geometries"]]}
+
+def geometries():
+    iso_a = Point(1.44, 43.60).buffer(0.2)
+    iso_b = Point(1.46, 43.61).buffer(0.1)
+    return {"isoA": iso_a, "isoB": iso_b, "valid_zone": iso_a.difference(iso_b)}
+
+def test_round_trip_within_quantization():
+    source = geometries()
+    topology = to_topology({name: mapping(geometry) for name, geometry in source.items()}, quantization=100_000)
+    tolerance = 2 * max(topology["transform"]["scale"])
+    for name, geometry in source.items():
+        decoded = shape(decode_geometry(topology, topology["objects"][name]))
+        assert decoded.is_valid
+        assert decoded.hausdorff_distance(geometry) <= tolerance
+        assert abs(decoded.area - geometry.area) <= geometry.length * tolerance
+
+def test_shared_borders_are_encoded_once():
+    source = geometries()
+    topology = to_topology({name: mapping(geometry) for name, geometry in source.items()})
+    # La bordure de isoB est aussi le trou de valid_zone, celle de isoA son contour extérieur
+    assert len(topology["arcs"]) == 2
+    hole = topology["objects"]["valid_zone"]["arcs"][1]
+    border = topology["objects"]["isoB"]["arcs"][0]
+    assert [index if index >= 0 else ~index for index in hole] == [index if index >= 0 else ~index for index in border]
+
+def test_multipolygon_and_empty():
+    parts = Point(0, 0).buffer(1).union(Point(5, 5).buffer(1))
+    topology = to_topology({"zpp": mapping(parts), "isoC": None})
+    decoded = shape(decode_geometry(topology, topology["objects"]["zpp"]))
+    assert decoded.geom_type == "MultiPolygon"
+    assert abs(decoded.area - parts.area) <= parts.length * 2 * max(topology["transform"]["scale"])
+    assert topology["objects"]["isoC"] == {"type": None}
@@ -0,0 +1,101 @@
+# tests/test_webapp.py
+import random
+import threading
+import time
+import pytest
+
+from web import webapp
+
+class FakeEpeire:
+    """
+    Epeire sans isochrones ni base de données : les points ne dépendent que de la graine.
+    """
+    instances = 0
+    calls = []
+
+    def __init__(self, *args, **kwargs) -> None:
+        FakeEpeire.instances += 1
+
+    def __enter__(self) -> "FakeEpeire":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+    def get_graph_from_isochrones(self, time, delta_time, table_name=None, reuse=False):
+        FakeEpeire.calls.append(("isochrones", reuse))
+        return {"valid_zone": None}
+
+    def select_points(self, strategie, n_points, engine="sql", seed=None):
+        FakeEpeire.calls.append(("points", engine))
+        rng = random.Random(seed)
+        return [(43 + rng.random(), 1 + rng.random()) for _ in range(n_points)]
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(webapp, "Epeire", FakeEpeire)
+    monkeypatch.setattr(webapp, "result_cache", webapp.LRUCache(16))
+    FakeEpeire.instances = 0
+    FakeEpeire.calls = []
+    webapp.app.config["TESTING"] = True
+    return webapp.app.test_client()
+
+def submit(client, **fields):
+    form = {"adresse": "auch", "lat": "43.64", "lon": "0.58", "temps_fuite": "00:30", "dt": "00:10",
+            "direction_fuite": "N", "strategie": "force", "num": "3", **fields}
+    response = client.post("/submit", data=form)
+    assert response.status_code == 200
+    return response.get_json()
+
+def test_identical_submissions_return_same_points_from_cache(client):
+    first = submit(client)
+    second = submit(client)
+    assert first["points"] == second["points"]
+    assert first["seed"] == second["seed"]
+    assert FakeEpeire.instances == 1
+    assert webapp.result_cache.hits == 1
+
+def test_different_submissions_get_different_seeds(client):
+    first = submit(client)
+    second = submit(client, num="4")
+    assert first["seed"] != second["seed"]
+    assert FakeEpeire.instances == 2
+
+def test_explicit_seed_is_used(client):
+    assert submit(client, seed="42")["seed"] == 42
+
+def test_default_engine_reuses_prepared_zone(client):
+    submit(client)
+    assert FakeEpeire.calls == [("isochrones", True), ("points", "numpy")]
+
+def test_batch_rejects_unknown_engine(client):
+    body = {"lat": "43.64", "lon": "0.58", "direction_fuite": "N",
+            "scenarios": [{"strategie": "force", "temps_fuite": "00:30", "num": 3, "engine": "sql"}]}
+    response = client.post("/batch", json=body)
+    assert response.status_code == 400
+    assert "Moteur" in response.get_json()["error"]
+    assert FakeEpeire.instances == 0
+
+@pytest.fixture
+def job(monkeypatch):
+    """
+    Tâche en cours, qui ne se termine qu'à la fin du test.
+    """
+    queue = webapp.JobQueue(max_workers=1)
+    monkeypatch.setattr(webapp, "jobs", queue)
+    release = threading.Event()
+    yield queue.submit("attente", release.wait, 5)
+    release.set()
+
+@pytest.mark.parametrize("wait", ["-5", "0", "nan"])
+def test_job_wait_negative_or_zero_returns_immediately(client, job, wait):
+    started = time.monotonic()
+    response = client.get(f"/jobs/{job.id}?wait={wait}")
+    assert response.status_code == 200
+    assert response.get_json()["status"] in ("queued", "running")
+    assert time.monotonic() - started < 1
+
+def test_job_wait_rejects_non_numeric(client, job):
+    response = client.get(f"/jobs/{job.id}?wait=abc")
+    assert response.status_code == 400
+    assert "wait" in response.get_json()["error"]
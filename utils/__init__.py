@@ -3,10 +3,23 @@
 from .utils import (
     get_angle_fuite,
     get_isochrone,
+    get_isochrones,
+    get_http_session,
     measure_time,
-    time_to_seconds
+    time_to_seconds,
+    load_config,
+    set_config,
+    get_isochrone_cache,
+    to_mercator_geometry,
+    to_wgs84_geometry,
+    simplify_geometry
 )
 
+from .cache import LRUCache
+from .geocoding import geocode, normalize_address
+from .metrics import metrics, sql_fingerprint
+from .topology import to_topology
+
 from .db_utils import (
     get_db_attributes,
     normalize_column,
@@ -18,14 +31,51 @@ from .db_utils import (
     update_score_from_points_repeltion,
     get_top_point,
     apply_sigmoid,
-    set_sigmoid
+    set_sigmoid,
+    install_database_functions,
+    ensure_spatial_index,
+    check_spatial_index,
+    get_zone_nodes,
+    count_rows,
+    get_column_stats,
+    score_zone,
+    get_node_stats,
+    get_region,
+    get_nodes_extent,
+    fetch_nodes_by_cell,
+    fetch_roads,
+    build_filtered_nodes,
+    refresh_node_stats,
+    cluster_filtered_nodes,
+    NON_FEATURE_COLUMNS,
+    QueryParams,
+    execute_prepared,
+    ConnectionPool,
+    DatabaseSession,
+    database_session,
+    get_pool,
+    close_pool
 )
 
 __all__ = [
     "get_angle_fuite",
     "get_isochrone",
+    "get_isochrones",
+    "get_http_session",
     "measure_time",
     "time_to_seconds",
+    "load_config",
+    "set_config",
+    "get_isochrone_cache",
+    "to_mercator_geometry",
+    "to_wgs84_geometry",
+    "simplify_geometry",
+    "LRUCache",
+    "geocode",
+    "normalize_address",
+    "metrics",
+    "sql_fingerprint",
+    "to_topology",
     "get_db_attributes",
     "normalize_column",
     "set_distance_to_start",
@@ -37,4 +87,27 @@ __all__ = [
     "get_top_point",
     "apply_sigmoid",
     "set_sigmoid",
+    "install_database_functions",
+    "ensure_spatial_index",
+    "check_spatial_index",
+    "get_zone_nodes",
+    "count_rows",
+    "get_column_stats",
+    "score_zone",
+    "get_node_stats",
+    "get_region",
+    "get_nodes_extent",
+    "fetch_nodes_by_cell",
+    "fetch_roads",
+    "build_filtered_nodes",
+    "refresh_node_stats",
+    "cluster_filtered_nodes",
+    "NON_FEATURE_COLUMNS",
+    "QueryParams",
+    "execute_prepared",
+    "ConnectionPool",
+    "DatabaseSession",
+    "database_session",
+    "get_pool",
+    "close_pool",
 ]
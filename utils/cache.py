@@ -0,0 +1,162 @@
+# utils/cache.py
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from time import time
+from typing import Any, Dict, Hashable, Optional
+
+class LRUCache:
+    """
+    Cache clé -> valeur borné en taille (éviction LRU), avec durée de vie des entrées,
+    compteurs de succès/échecs et persistance optionnelle dans un fichier JSON.
+    Les clés sont des tuples ou des chaînes ; les valeurs doivent être sérialisables en JSON si `path` est donné.
+    Le fichier n'est pas réécrit à chaque insertion : les modifications sont enregistrées au plus tard
+    `save_interval` secondes après la première d'entre elles, et à l'arrêt du processus.
+    """
+    def __init__(self, max_size: int = 256, ttl: Optional[float] = None, path: Optional[str] = None, save_interval: float = 30.0) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self.save_interval = save_interval
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Une seule écriture du fichier à la fois ; `_dirty` signale des modifications non enregistrées
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self._save_timer: Optional[threading.Timer] = None
+        if path:
+            self.load()
+            atexit.register(self.flush)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return self._get_entry(key) is not None
+
+    def _get_entry(self, key: Hashable) -> Optional[tuple]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if self.ttl is not None and time() - entry[0] > self.ttl:
+            del self._data[key]
+            return None
+        return entry
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Retourne la valeur associée à la clé (et la marque comme récemment utilisée), ou `default`.
+        """
+        with self._lock:
+            entry = self._get_entry(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Ajoute ou remplace une entrée, en évinçant les moins récemment utilisées si besoin.
+        """
+        with self._lock:
+            self._data[key] = (time(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+        self._schedule_save()
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+        self._schedule_save()
+
+    def _schedule_save(self) -> None:
+        """
+        Marque le cache comme modifié et programme son enregistrement, s'il n'est pas déjà programmé.
+        """
+        if not self.path:
+            return
+        with self._lock:
+            self._dirty = True
+            if self._save_timer is not None:
+                return
+            self._save_timer = threading.Timer(self.save_interval, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self) -> None:
+        """
+        Enregistre immédiatement les modifications en attente.
+        """
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            dirty = self._dirty
+        if dirty:
+            self.save()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Retourne la taille du cache et ses compteurs de succès et d'échecs.
+        """
+        return {"size": len(self._data), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+    def load(self) -> None:
+        """
+        Recharge les entrées non expirées depuis le fichier de persistance.
+        """
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as infile:
+                entries = json.load(infile)
+        except Exception as e:
+            logging.warning(f"Cache '{self.path}' illisible, ignoré: {e}")
+            return
+        with self._lock:
+            for key, timestamp, value in entries[-self.max_size:]:
+                key = tuple(key) if isinstance(key, list) else key
+                if self.ttl is None or time() - timestamp <= self.ttl:
+                    self._data[key] = (timestamp, value)
+
+    def save(self) -> None:
+        """
+        Écrit le cache dans son fichier de persistance (écriture atomique).
+        Chaque écriture passe par un fichier temporaire unique : des écritures concurrentes, du même processus
+        ou d'un autre, ne peuvent pas produire un fichier tronqué.
+        """
+        with self._save_lock:
+            with self._lock:
+                entries = [[list(key) if isinstance(key, tuple) else key, timestamp, value] for key, (timestamp, value) in self._data.items()]
+                self._dirty = False
+            tmp_path = None
+            try:
+                folder = os.path.dirname(self.path) or "."
+                os.makedirs(folder, exist_ok=True)
+                with tempfile.NamedTemporaryFile("w", dir=folder, prefix=f"{os.path.basename(self.path)}.", suffix=".tmp", delete=False) as outfile:
+                    tmp_path = outfile.name
+                    json.dump(entries, outfile)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                logging.warning(f"Impossible d'écrire le cache '{self.path}': {e}")
+                if tmp_path is not None and os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                with self._lock:
+                    self._dirty = True
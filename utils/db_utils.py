@@ -1,67 +1,411 @@
 # utils/db_utils.py
 
 from functools import wraps
+from contextlib import contextmanager
+from contextvars import ContextVar
 import psycopg2
+from psycopg2 import pool as pg_pool
+from psycopg2 import extensions as pg_extensions
+from psycopg2 import sql
 import logging
-from typing import Dict, Tuple
+import threading
+import hashlib
+import weakref
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Callable, Dict, List, Tuple, Optional
 import json
+import shapely
 from shapely import wkt
+from shapely.geometry.base import BaseGeometry
 import random
 
+from utils.utils import load_config
+from utils.metrics import metrics, InstrumentedCursor
+
 DATA_FOLDER: str = "data/"
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 
+# Colonnes de filtered_nodes qui ne sont pas des attributs de score
+NON_FEATURE_COLUMNS: list = ['id', 'osmid', 'geometry', 'region']
+
+# Attributs statiques calculés à l'import pour chaque intersection
+STATIC_FEATURES: list = ['degree', 'max_speed', 'mean_speed', 'min_speed', 'max_lane', 'mean_lane', 'min_lane', 'road_importance']
+
+# Importance des routes selon leur classe OSM (les autres classes sont ignorées)
+ROAD_IMPORTANCE: Dict[str, int] = {
+    'motorway': 7, 'motorway_link': 6,
+    'trunk': 6, 'trunk_link': 5,
+    'primary': 5, 'primary_link': 4,
+    'secondary': 4, 'secondary_link': 3,
+    'tertiary': 3, 'tertiary_link': 2,
+    'unclassified': 2, 'residential': 1, 'living_street': 1, 'service': 1,
+}
+
+# Schéma de filtered_nodes, partagé par les différentes procédures d'import
+FILTERED_NODES_DDL: str = """
+    CREATE TABLE IF NOT EXISTS filtered_nodes (
+        id BIGSERIAL PRIMARY KEY,
+        osmid BIGINT,
+        region TEXT NOT NULL,
+        degree SMALLINT NOT NULL,
+        max_speed REAL,
+        mean_speed REAL,
+        min_speed REAL,
+        max_lane REAL,
+        mean_lane REAL,
+        min_lane REAL,
+        road_importance REAL,
+        geometry geometry(Point, 3857) NOT NULL
+    );
+"""
+
+FILTERED_NODES_INDEXES: str = """
+    CREATE INDEX IF NOT EXISTS filtered_nodes_geometry_idx ON filtered_nodes USING GIST (geometry);
+    CREATE INDEX IF NOT EXISTS filtered_nodes_region_idx ON filtered_nodes (region);
+"""
+
+POOL_DEFAULTS: Dict = {
+    "minconn": 1,
+    "maxconn": 10,
+    "timeout": 10.0,
+    "health_check_interval": 30.0,
+}
+
+def load_db_params() -> Dict:
+    """
+    Charge les paramètres de connexion à la base de données.
+    """
+    try:
+        with open(f"{DATA_FOLDER}/db_params.json") as infile:
+            db_params = json.load(infile)
+        # Surcharges éventuelles (section "database" de la configuration)
+        db_params.update(load_config("database"))
+        return db_params
+    except Exception as e:
+        raise RuntimeError(f"Erreur lors du chargement des paramètres de la base de donnée: {e}")
+
+class ConnectionPool:
+    """
+    Pool de connexions PostgreSQL partagé par tout le processus.
+    Les connexions sont vérifiées avant d'être prêtées et l'attente d'une connexion libre est bornée.
+    """
+    def __init__(self, db_params: Dict, minconn: int = 1, maxconn: int = 10, timeout: float = 10.0, health_check_interval: float = 30.0) -> None:
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._pool = pg_pool.ThreadedConnectionPool(minconn, maxconn, **db_params)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._last_used: Dict[int, float] = {}
+
+    def _is_healthy(self, conn) -> bool:
+        """
+        Vérifie qu'une connexion est encore utilisable (SELECT 1 si elle est restée inactive trop longtemps).
+        """
+        if conn.closed:
+            return False
+        last_used = self._last_used.get(id(conn))
+        if last_used is not None and monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        """
+        Emprunte une connexion au pool, en attendant au plus `timeout` secondes.
+        """
+        if not self._slots.acquire(timeout=self.timeout):
+            raise RuntimeError(f"Aucune connexion PostgreSQL disponible après {self.timeout}s")
+        try:
+            conn = self._pool.getconn()
+            if not self._is_healthy(conn):
+                logging.debug("Connexion PostgreSQL invalide, remplacement")
+                self._last_used.pop(id(conn), None)
+                self._pool.putconn(conn, close=True)
+                conn = self._pool.getconn()
+            return conn
+        except Exception as e:
+            self._slots.release()
+            raise RuntimeError(f"Erreur lors de l'obtention d'une connexion PostgreSQL: {e}")
+
+    def putconn(self, conn, close: bool = False) -> None:
+        """
+        Rend une connexion au pool en annulant toute transaction restée ouverte.
+        """
+        try:
+            if conn.closed:
+                close = True
+            elif conn.get_transaction_status() != pg_extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except psycopg2.Error:
+            close = True
+        finally:
+            if close:
+                self._last_used.pop(id(conn), None)
+            else:
+                self._last_used[id(conn)] = monotonic()
+            self._pool.putconn(conn, close=close)
+            self._slots.release()
+
+    def closeall(self) -> None:
+        self._pool.closeall()
+        self._last_used.clear()
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+_current_session: ContextVar = ContextVar("db_session", default=None)
+_functions_installed: bool = False
+_functions_lock = threading.Lock()
+# Noms des instructions préparées sur chaque connexion, du moins au plus récemment utilisé (oubliés avec la connexion)
+_prepared_statements: "weakref.WeakKeyDictionary[pg_extensions.connection, OrderedDict]" = weakref.WeakKeyDictionary()
+# Nombre maximal d'instructions préparées gardées par connexion : les noms de tables font varier le texte des requêtes
+MAX_PREPARED_STATEMENTS: int = 64
+_prepared_lock = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    """
+    Retourne le pool de connexions du processus, en le créant au premier appel.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                params = load_config("db_pool", POOL_DEFAULTS)
+                _pool = ConnectionPool(load_db_params(), **params)
+    return _pool
+
+def close_pool() -> None:
+    """
+    Ferme toutes les connexions du pool (le prochain appel en recrée un).
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+class DatabaseSession:
+    """
+    Connexion empruntée au pool et partagée, dans une seule transaction, par tous les appels
+    décorés par `connect_database` exécutés pendant que la session est active.
+    """
+    def __init__(self) -> None:
+        self.conn = None
+
+    @contextmanager
+    def activate(self):
+        """
+        Rend la session active pour le contexte courant. En cas d'erreur, la transaction est annulée.
+        """
+        if self.conn is None:
+            self.conn = get_pool().getconn()
+        token = _current_session.set(self)
+        try:
+            yield self
+        except Exception:
+            self.close(commit=False)
+            raise
+        finally:
+            _current_session.reset(token)
+
+    def close(self, commit: bool = True) -> None:
+        """
+        Valide (ou annule) la transaction et rend la connexion au pool.
+        """
+        if self.conn is None:
+            return
+        conn, self.conn = self.conn, None
+        try:
+            if commit:
+                conn.commit()
+            else:
+                conn.rollback()
+        finally:
+            get_pool().putconn(conn)
+
+@contextmanager
+def database_session():
+    """
+    Exécute le bloc avec une seule connexion et une seule transaction.
+    Si une session est déjà active, elle est réutilisée.
+    """
+    current = _current_session.get()
+    if current is not None:
+        yield current
+        return
+
+    session = DatabaseSession()
+    try:
+        with session.activate():
+            yield session
+    finally:
+        session.close()
+
 def connect_database(f):
     @wraps(f)
     def wrapper(*args, **kwargs):
-        logging.debug(f"Connexion à PostgreSQL pour la fonction {f.__name__}")
-        
-        try:
-            with open(f"{DATA_FOLDER}/db_params.json") as infile:
-                db_params: Dict = json.load(infile)
-        except Exception as e:
-            raise RuntimeError(f"Erreur lors du chargement des paramètres de la base de donnée: {e}")
-        
-        with psycopg2.connect(**db_params) as conn:
-            with conn.cursor() as cur:
-                response = f(cur, *args, **kwargs)
+        # Curseur instrumenté (empreinte, lignes, durée de chaque requête) seulement si les métriques sont actives
+        cursor_factory = InstrumentedCursor if metrics.enabled else None
+        with metrics.span("db_call", function=f.__name__):
+            session = _current_session.get()
+            if session is not None:
+                with session.conn.cursor(cursor_factory=cursor_factory) as cur:
+                    return f(cur, *args, **kwargs)
+
+            logging.debug(f"Connexion à PostgreSQL pour la fonction {f.__name__}")
+            pool = get_pool()
+            conn = pool.getconn()
+            try:
+                with conn:
+                    with conn.cursor(cursor_factory=cursor_factory) as cur:
+                        response = f(cur, *args, **kwargs)
+            finally:
+                pool.putconn(conn)
 
-        return response
+            return response
     return wrapper
 
+class QueryParams:
+    """
+    Valeurs d'une requête préparée : chaque appel ajoute une valeur et retourne son paramètre positionnel ($1, $2...).
+    """
+    def __init__(self) -> None:
+        self.values: List[Any] = []
+
+    def __call__(self, value: Any, cast: str = "float8") -> sql.SQL:
+        self.values.append(value)
+        return sql.SQL(f"${len(self.values)}::{cast}")
+
+def execute_prepared(cur: psycopg2.extensions.cursor, query: sql.Composable, params: QueryParams = None) -> None:
+    """
+    Exécute une requête paramétrée ($1, $2...) par une instruction préparée, nommée d'après son texte.
+    L'instruction est préparée une seule fois par connexion : les appels suivants réutilisent son plan.
+    Au-delà de MAX_PREPARED_STATEMENTS instructions sur une connexion, la moins récemment utilisée est libérée (DEALLOCATE).
+    Les identifiants sont composés avec psycopg2.sql.Identifier, les valeurs passent toujours par `params`.
+    psycopg2 n'a pas de protocole étendu : les valeurs de EXECUTE sont échappées et insérées dans le texte
+    côté client. Seuls l'analyse et la planification de la requête sont économisées, pas le transfert des valeurs.
+    """
+    text = query.as_string(cur)
+    name = f"epeire_{hashlib.sha1(text.encode()).hexdigest()[:16]}"
+    with _prepared_lock:
+        prepared = _prepared_statements.setdefault(cur.connection, OrderedDict())
+    if name in prepared:
+        prepared.move_to_end(name)
+    else:
+        while len(prepared) >= MAX_PREPARED_STATEMENTS:
+            oldest, _ = prepared.popitem(last=False)
+            cur.execute(f"DEALLOCATE {oldest}")
+        cur.execute(f"PREPARE {name} AS {text}")
+        prepared[name] = True
+    values = params.values if params is not None else []
+    if values:
+        cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(values))})", values)
+    else:
+        cur.execute(f"EXECUTE {name}")
+
+def point_expression(params: QueryParams, point: Tuple[float, float]) -> sql.Composable:
+    """
+    Retourne l'expression SQL d'un point (lat, lon) projeté en EPSG:3857, coordonnées passées en paramètres.
+    """
+    return sql.SQL("ST_Transform(ST_SetSRID(ST_MakePoint({}, {}), 4326), 3857)").format(params(point[1]), params(point[0]))
+
 @connect_database
 def get_db_attributes(cur: psycopg2.extensions.cursor, blacklist: list, table_name: str = 'filtered_nodes') -> list:
     """
     Récupère les attributs de la base de données en excluant ceux de la blacklist.
+    La table est résolue selon le search_path : une table temporaire masque une table permanente de même nom.
     """
     try:
-        cur.execute(f"SELECT column_name FROM information_schema.columns WHERE table_name = '{table_name}';")
+        params = QueryParams()
+        execute_prepared(
+            cur,
+            sql.SQL(
+                """
+                SELECT attname FROM pg_attribute
+                WHERE attrelid = to_regclass({}) AND attnum > 0 AND NOT attisdropped
+                ORDER BY attnum
+                """
+            ).format(params(table_name, "text")),
+            params
+        )
         return [row[0] for row in cur.fetchall() if row[0] not in blacklist]
     except Exception as e:
         raise RuntimeError(f"Erreur lors de la récupération des attributs: {e}")
 
 @connect_database
-def create_table_from_isochrone(cur: psycopg2.extensions.cursor, table_name: str, isochrone: str) -> None:
+def create_table_from_isochrone(cur: psycopg2.extensions.cursor, table_name: str, isochrone: BaseGeometry, temporary: bool = True, srid: int = 4326,
+                                attrs: list = None) -> int:
     """
-    Crée une table temporaire à partir d'une isochrone.
+    Crée une table de travail à partir d'une isochrone, avec la géométrie et les attributs `attrs` des nœuds
+    (par défaut tous les attributs de score) : les autres colonnes de filtered_nodes ne sont pas copiées.
+    Par défaut la table est temporaire (TEMP ... ON COMMIT DROP) : propre à la connexion, sans WAL,
+    et supprimée automatiquement à la fin de la transaction ; elle doit donc être utilisée dans une
+    session (voir DatabaseSession). Sinon, la table est créée UNLOGGED et doit être supprimée par l'appelant.
+    Une isochrone déjà projetée (`srid=3857`) est comparée telle quelle aux nœuds, sans reprojection côté serveur.
+    Le polygone est passé en paramètre d'une insertion préparée, dont le plan est réutilisé d'une requête à l'autre.
+    Les nœuds sont présélectionnés par leur emprise (&&, index GiST, voir ensure_spatial_index) avant le test exact.
+    Retourne le nombre de nœuds de la zone.
     """
     try:
-        cur.execute(
-            f"""
-            DROP TABLE IF EXISTS {table_name};
-            CREATE TABLE {table_name} AS
-            SELECT * FROM filtered_nodes
-            WHERE ST_Intersects(
-                geometry,
-                ST_Transform(ST_GeomFromText('{isochrone}', 4326), 3857)
-            );
-            """
+        table = sql.Identifier(table_name)
+        attrs = attrs if attrs is not None else get_db_attributes(blacklist=NON_FEATURE_COLUMNS)
+        columns = sql.SQL(", ").join(sql.Identifier(column) for column in ["geometry"] + list(attrs))
+        if temporary:
+            create = "DROP TABLE IF EXISTS {}; CREATE TEMP TABLE {} ON COMMIT DROP AS SELECT {} FROM filtered_nodes WITH NO DATA;"
+            cur.execute(sql.SQL(create).format(sql.Identifier("pg_temp", table_name), table, columns))
+        else:
+            create = "DROP TABLE IF EXISTS {}; CREATE UNLOGGED TABLE {} AS SELECT {} FROM filtered_nodes WITH NO DATA;"
+            cur.execute(sql.SQL(create).format(table, table, columns))
+
+        params = QueryParams()
+        if srid == 3857:
+            # Précision centimétrique : inutile de transmettre plus de décimales
+            polygon = sql.SQL("ST_GeomFromText({}, 3857)").format(params(shapely.to_wkt(isochrone, rounding_precision=2), "text"))
+        else:
+            polygon = sql.SQL("ST_Transform(ST_GeomFromText({}, {}), 3857)").format(params(isochrone.wkt, "text"), params(srid, "int"))
+        execute_prepared(
+            cur,
+            sql.SQL(
+                """
+                INSERT INTO {table}
+                SELECT {columns} FROM filtered_nodes, (SELECT {polygon} AS polygon) AS zone
+                WHERE geometry && zone.polygon AND ST_Intersects(geometry, zone.polygon)
+                """
+            ).format(table=table, columns=columns, polygon=polygon),
+            params
         )
+        return cur.rowcount
     except Exception as e:
         raise RuntimeError(f"Erreur lors de la création de la table à partir de l'isochrone: {e}")
 
+@connect_database
+def count_rows(cur: psycopg2.extensions.cursor, table_name: str) -> int:
+    """
+    Retourne le nombre de lignes d'une table.
+    """
+    execute_prepared(cur, sql.SQL("SELECT COUNT(*) FROM {}").format(sql.Identifier(table_name)))
+    return cur.fetchone()[0]
+
+@connect_database
+def get_zone_nodes(cur: psycopg2.extensions.cursor, table_name: str, attrs: list) -> Dict[str, list]:
+    """
+    Récupère en une seule requête les coordonnées (EPSG:3857) et les attributs des nœuds d'une table.
+    """
+    try:
+        columns = sql.SQL("").join(sql.SQL(", {}").format(sql.Identifier(attr)) for attr in attrs)
+        execute_prepared(cur, sql.SQL("SELECT ST_X(geometry), ST_Y(geometry){} FROM {}").format(columns, sql.Identifier(table_name)))
+        rows = cur.fetchall()
+        names = ["x", "y"] + list(attrs)
+        return {name: [row[i] for row in rows] for i, name in enumerate(names)}
+    except Exception as e:
+        raise RuntimeError(f"Erreur lors de la récupération des nœuds de la zone: {e}")
+
 def set_distance_to_start(table_name: str, starting_point: Tuple[float, float]):
     """
     Définit la distance au point de départ.
@@ -74,20 +418,16 @@ def set_distance_to_point(cur: psycopg2.extensions.cursor, table_name: str, poin
     Ajoute une colonne {column_name} à la table filtered_nodes et remplit cette colonne avec la distance entre chaque point et un point donné.
     """
     try:
-        cur.execute(
-            f"""
-            -- Ajout de la colonne si elle n'existe pas
-            DO $$
-            BEGIN
-                IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='{table_name}' AND column_name='{column_name}') THEN
-                    ALTER TABLE {table_name} ADD COLUMN {column_name} FLOAT;
-                END IF;
-            END $$;
-
-            -- Mise à jour de la colonne avec les distances calculées
-            UPDATE {table_name}
-            SET {column_name} = ST_Distance(geometry, ST_Transform(ST_SetSRID(ST_MakePoint({point[1]}, {point[0]}), 4326), 3857));
-            """
+        table, column = sql.Identifier(table_name), sql.Identifier(column_name)
+        # Ajout de la colonne si elle n'existe pas
+        cur.execute(sql.SQL("ALTER TABLE {} ADD COLUMN IF NOT EXISTS {} FLOAT;").format(table, column))
+
+        # Mise à jour de la colonne avec les distances calculées
+        params = QueryParams()
+        execute_prepared(
+            cur,
+            sql.SQL("UPDATE {} SET {} = ST_Distance(geometry, {})").format(table, column, point_expression(params, point)),
+            params
         )
     except Exception as e:
         raise RuntimeError(f"Erreur lors de l'ajout de la colonne distance au point de départ: {e}")
@@ -98,72 +438,50 @@ def normalize_column(cur: psycopg2.extensions.cursor, table_name: str, attr: str
     Normalise les colonnes d'une table donnée.
     """
     try:
-        cur.execute(
-            f"""
-            -- Calculer les valeurs min et max
-            WITH stats AS (
-                SELECT
-                    MIN({attr}) AS min_val,
-                    MAX({attr}) AS max_val
-                FROM {table_name}
-            )
-            -- Mettre à jour la colonne avec les {attr}s normalisées
-            UPDATE {table_name}
-            SET {attr} = CASE
-                WHEN (SELECT max_val FROM stats) = (SELECT min_val FROM stats) THEN 0.0
-                ELSE ({attr} - (SELECT min_val FROM stats)) / ((SELECT max_val FROM stats) - (SELECT min_val FROM stats))
-            END;
-            """
+        execute_prepared(
+            cur,
+            sql.SQL(
+                """
+                -- Calculer les valeurs min et max
+                WITH stats AS (
+                    SELECT
+                        MIN({attr}) AS min_val,
+                        MAX({attr}) AS max_val
+                    FROM {table}
+                )
+                -- Mettre à jour la colonne avec les valeurs normalisées
+                UPDATE {table}
+                SET {attr} = CASE
+                    WHEN (SELECT max_val FROM stats) = (SELECT min_val FROM stats) THEN 0.0
+                    ELSE ({attr} - (SELECT min_val FROM stats)) / ((SELECT max_val FROM stats) - (SELECT min_val FROM stats))
+                END
+                """
+            ).format(attr=sql.Identifier(attr), table=sql.Identifier(table_name))
         )
     except Exception as e:
         raise RuntimeError(f"Erreur lors de la normalisation des colonnes: {e}")
-    
+
 @connect_database
 def set_difference_angle(cur: psycopg2.extensions.cursor, table_name: str, starting_point: Tuple[float, float], angle_fuite: float) -> None:
     """
     Ajoute une colonne difference_angle à la table donnée et remplit cette colonne avec la différence angulaire entre chaque point et la direction de fuite.
     """
     try:
+        table = sql.Identifier(table_name)
+        # Ajout de la colonne si elle n'existe pas
+        cur.execute(sql.SQL("ALTER TABLE {} ADD COLUMN IF NOT EXISTS difference_angle FLOAT;").format(table))
+
+        # Mise à jour de la colonne avec les différences angulaires calculées
+        params = QueryParams()
         if type(angle_fuite) == int:
-            cur.execute(
-                f"""
-                -- Ajout de la colonne si elle n'existe pas
-                DO $$
-                BEGIN
-                    IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='{table_name}' AND column_name='difference_angle') THEN
-                        ALTER TABLE {table_name} ADD COLUMN difference_angle FLOAT;
-                    END IF;
-                END $$;
-
-                -- Mise à jour de la colonne avec les différences angulaires calculées
-                UPDATE {table_name}
-                SET difference_angle = LEAST(
-                    ABS(DEGREES(ST_Azimuth(
-                        ST_Transform(ST_SetSRID(ST_MakePoint({starting_point[1]}, {starting_point[0]}), 4326), 3857),
-                        geometry
-                    )) - {angle_fuite}),
-                    360 - ABS(DEGREES(ST_Azimuth(
-                        ST_Transform(ST_SetSRID(ST_MakePoint({starting_point[1]}, {starting_point[0]}), 4326), 3857),
-                        geometry
-                    )) - {angle_fuite})
-                );"""
+            azimuth = sql.SQL("ABS(DEGREES(ST_Azimuth({}, geometry)) - {})").format(point_expression(params, starting_point), params(angle_fuite))
+            execute_prepared(
+                cur,
+                sql.SQL("UPDATE {table} SET difference_angle = LEAST({azimuth}, 360 - {azimuth})").format(table=table, azimuth=azimuth),
+                params
             )
         else:
-            cur.execute(
-                f"""
-                -- Ajout de la colonne si elle n'existe pas
-                DO $$
-                BEGIN
-                    IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='{table_name}' AND column_name='difference_angle') THEN
-                        ALTER TABLE {table_name} ADD COLUMN difference_angle FLOAT;
-                    END IF;
-                END $$;
-
-                -- Mise à jour de la colonne avec les différences angulaires calculées
-                UPDATE {table_name}
-                SET difference_angle = 0;
-                """
-            )
+            execute_prepared(cur, sql.SQL("UPDATE {} SET difference_angle = 0").format(table))
     except Exception as e:
         raise RuntimeError(f"Erreur lors de l'ajout de la colonne difference_angle: {e}")
 
@@ -173,12 +491,13 @@ def apply_sigmoid(cur: psycopg2.extensions.cursor, table_name: str, attr: str, s
     Applique la fonction sigmoid sur une colonne donnée.
     """
     scale = scale if scale != 0 else 1
-    cur.execute(
-        f"""
-        -- Mise à jour de la colonne avec la fonction sigmoid
-        UPDATE {table_name}
-        SET {attr} = sigmoid({attr}, {offset}, {scale});
-        """
+    column = sql.Identifier(attr)
+    params = QueryParams()
+    # Mise à jour de la colonne avec la fonction sigmoid
+    execute_prepared(
+        cur,
+        sql.SQL("UPDATE {} SET {} = sigmoid({}, {}, {})").format(sql.Identifier(table_name), column, column, params(offset), params(scale)),
+        params
     )
 
 @connect_database
@@ -187,43 +506,429 @@ def set_sigmoid(cur: psycopg2.extensions.cursor) -> None:
     Crée une fonction sigmoid dans la base de données. 
     """
     # 5.29330482472 = ln(1.99)
+    # Fonction SQL IMMUTABLE à une seule expression : le planificateur peut l'intégrer directement dans les requêtes
     cur.execute(
         f"""
         -- Création de la fonction sigmoid
         CREATE OR REPLACE FUNCTION sigmoid(x DOUBLE PRECISION, o DOUBLE PRECISION, a DOUBLE PRECISION)
         RETURNS DOUBLE PRECISION AS $$
-        BEGIN
-            RETURN 2 / (1 + EXP((o - x) * 5.29330482472 / a)) - 1;
-        END;
-        $$ LANGUAGE plpgsql;
+            SELECT 2 / (1 + EXP((o - x) * 5.29330482472 / a)) - 1;
+        $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
         """
     )
 
 @connect_database
-def set_score(cur: psycopg2.extensions.cursor, table_name: str, strategie: Dict[str, float]) -> None:
+def ensure_spatial_index(cur: psycopg2.extensions.cursor) -> None:
     """
-    Calcule le score de chaque point en fonction de la stratégie donnée.
+    Crée, s'ils manquent, l'index GiST sur la géométrie de filtered_nodes et l'index des régions.
+    Réservée à la maintenance (voir utils/maintenance.py) : à l'exécution, seul check_spatial_index est appelé.
     """
     try:
-        logging.debug(strategie)
-        cur.execute(f"""
-            -- Ajout de la colonne si elle n'existe pas
-            DO $$
-            BEGIN
-                IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='{table_name}' AND column_name='score') THEN
-                    ALTER TABLE {table_name} ADD COLUMN score FLOAT;
-                END IF;
-            END $$;
+        cur.execute(FILTERED_NODES_INDEXES)
+    except Exception as e:
+        raise RuntimeError(f"Erreur lors de la création des index de filtered_nodes: {e}")
+
+@connect_database
+def check_spatial_index(cur: psycopg2.extensions.cursor) -> bool:
+    """
+    Vérifie, sans rien modifier, qu'un index GiST existe sur filtered_nodes ; sinon, journalise un avertissement.
+    Les index sont créés par les commandes de maintenance (voir utils/maintenance.py) : les créer ici
+    demanderait d'être propriétaire de la table et la verrouillerait pendant une requête.
+    """
+    try:
+        cur.execute("""
+            SELECT 1 FROM pg_indexes
+            WHERE tablename = 'filtered_nodes' AND indexdef ILIKE '%USING gist%'
+            LIMIT 1
+        """)
+        exists = cur.fetchone() is not None
+    except Exception as e:
+        raise RuntimeError(f"Erreur lors de la vérification des index de filtered_nodes: {e}")
+    if not exists:
+        logging.warning("Aucun index GiST sur filtered_nodes : l'extraction des zones parcourra toute la table "
+                        "(python -m utils.maintenance index)")
+    return exists
+
+def install_database_functions() -> None:
+    """
+    Installe une seule fois par processus les fonctions SQL utilisées par Epeire (sigmoid)
+    et vérifie que l'index spatial utilisé pour extraire les zones existe.
+    Les appels suivants ne font rien : le DDL n'est pas rejoué à chaque requête.
+    """
+    global _functions_installed
+    if _functions_installed:
+        return
+    with _functions_lock:
+        if not _functions_installed:
+            set_sigmoid()
+            check_spatial_index()
+            _functions_installed = True
+
+def window_normalized_expression(attr: str) -> sql.Composable:
+    """
+    Retourne l'expression SQL de la normalisation min-max d'une colonne par agrégats de fenêtre sur toute la table.
+    """
+    return sql.SQL(
+        "CASE WHEN MAX({0}) OVER () = MIN({0}) OVER () THEN 0.0 "
+        "ELSE (({0})::float - MIN({0}) OVER ()) / (MAX({0}) OVER () - MIN({0}) OVER ()) END"
+    ).format(sql.Identifier(attr))
+
+def normalized_expression(attr: str, min_val: float, max_val: float, params: QueryParams) -> sql.Composable:
+    """
+    Retourne l'expression SQL de la normalisation min-max d'une colonne (0 si la colonne est constante),
+    les bornes étant passées en paramètres.
+    """
+    if min_val is None or max_val is None or max_val == min_val:
+        return sql.SQL("0.0")
+    return sql.SQL("(({})::float - {}) / {}").format(sql.Identifier(attr), params(float(min_val)), params(float(max_val) - float(min_val)))
+
+@connect_database
+def get_column_stats(cur: psycopg2.extensions.cursor, table_name: str, attrs: list) -> Dict[str, Tuple[float, float]]:
+    """
+    Retourne le minimum et le maximum de chaque colonne, en une seule requête.
+    """
+    if not attrs:
+        return {}
+    try:
+        aggregates = sql.SQL(", ").join(sql.SQL("MIN({0})::float, MAX({0})::float").format(sql.Identifier(attr)) for attr in attrs)
+        execute_prepared(cur, sql.SQL("SELECT {} FROM {}").format(aggregates, sql.Identifier(table_name)))
+        row = cur.fetchone()
+        return {attr: (row[2 * i], row[2 * i + 1]) for i, attr in enumerate(attrs)}
+    except Exception as e:
+        raise RuntimeError(f"Erreur lors du calcul des statistiques des colonnes: {e}")
+
+@connect_database
+def get_node_stats(cur: psycopg2.extensions.cursor, region: str = '*') -> Dict[str, Tuple[float, float]]:
+    """
+    Retourne les statistiques (min, max) précalculées des attributs statiques, globales ('*') ou d'une région.
+    """
+    try:
+        params = QueryParams()
+        execute_prepared(
+            cur,
+            sql.SQL("SELECT attr, min_val, max_val FROM filtered_nodes_stats WHERE region = {}").format(params(region, "text")),
+            params
+        )
+        stats = {attr: (min_val, max_val) for attr, min_val, max_val in cur.fetchall()}
+        if not stats:
+            raise ValueError(f"aucune statistique pour la région '{region}'")
+        return stats
+    except Exception as e:
+        raise RuntimeError(f"Erreur lors de la récupération des statistiques des nœuds: {e}")
+
+@connect_database
+def get_region(cur: psycopg2.extensions.cursor, point: Tuple[float, float]) -> str:
+    """
+    Retourne la région du nœud le plus proche d'un point (lat, lon).
+    """
+    try:
+        params = QueryParams()
+        execute_prepared(
+            cur,
+            sql.SQL("SELECT region FROM filtered_nodes ORDER BY geometry <-> {} LIMIT 1").format(point_expression(params, point)),
+            params
+        )
+        row = cur.fetchone()
+        if row is None:
+            raise ValueError("la table filtered_nodes est vide")
+        return row[0]
+    except Exception as e:
+        raise RuntimeError(f"Erreur lors de la recherche de la région: {e}")
+
+@connect_database
+def get_nodes_extent(cur: psycopg2.extensions.cursor) -> Dict[str, Any]:
+    """
+    Retourne l'emprise EPSG:3857 (xmin, ymin, xmax, ymax), le nombre de nœuds et la liste des régions de filtered_nodes.
+    """
+    try:
+        cur.execute(
+            """
+            SELECT MIN(ST_X(geometry)), MIN(ST_Y(geometry)), MAX(ST_X(geometry)), MAX(ST_Y(geometry)),
+                   COUNT(*), array_agg(DISTINCT region)
+            FROM filtered_nodes;
             """
         )
+        xmin, ymin, xmax, ymax, count, regions = cur.fetchone()
+        if not count:
+            raise ValueError("la table filtered_nodes est vide")
+        return {"bounds": (xmin, ymin, xmax, ymax), "count": count, "regions": sorted(regions)}
+    except Exception as e:
+        raise RuntimeError(f"Erreur lors du calcul de l'emprise des nœuds: {e}")
+
+@connect_database
+def fetch_nodes_by_cell(cur: psycopg2.extensions.cursor, attrs: list, origin: Tuple[float, float], cell_size: float, n_cols: int,
+                        consumer: Callable[[list], None], chunk_size: int = 100_000) -> None:
+    """
+    Parcourt filtered_nodes trié par cellule d'une grille régulière (origine, taille de cellule, nombre de colonnes)
+    avec un curseur serveur, et passe chaque bloc de lignes (cellule, x, y, région, attributs...) à `consumer`.
+    """
+    columns = sql.SQL("").join(sql.SQL(", {}").format(sql.Identifier(attr)) for attr in attrs)
+    query = sql.SQL(
+        """
+        SELECT floor((ST_Y(geometry) - %(y0)s) / %(size)s)::bigint * %(cols)s + floor((ST_X(geometry) - %(x0)s) / %(size)s)::bigint AS cell,
+               ST_X(geometry), ST_Y(geometry), region{}
+        FROM filtered_nodes
+        ORDER BY cell
+        """
+    ).format(columns)
+    try:
+        with cur.connection.cursor(name="fetch_nodes_by_cell") as stream:
+            stream.itersize = chunk_size
+            stream.execute(query, {"x0": origin[0], "y0": origin[1], "size": cell_size, "cols": n_cols})
+            while True:
+                rows = stream.fetchmany(chunk_size)
+                if not rows:
+                    break
+                consumer(rows)
+    except Exception as e:
+        raise RuntimeError(f"Erreur lors du parcours des nœuds: {e}")
+
+@connect_database
+def fetch_roads(cur: psycopg2.extensions.cursor, consumer: Callable[[list], None], roads_table: str = 'roads', chunk_size: int = 50_000) -> None:
+    """
+    Parcourt les routes carrossables (classes de ROAD_IMPORTANCE) avec un curseur serveur, et passe chaque bloc
+    de lignes (highway, maxspeed, oneway, junction, géométrie WKB EPSG:3857) à `consumer`.
+    """
+    query = sql.SQL(
+        """
+        SELECT highway, maxspeed, tags->>'oneway', tags->>'junction', ST_AsBinary(geometry)
+        FROM {}
+        WHERE highway = ANY(%(highways)s)
+        """
+    ).format(sql.Identifier(roads_table))
+    try:
+        with cur.connection.cursor(name="fetch_roads") as stream:
+            stream.itersize = chunk_size
+            stream.execute(query, {"highways": list(ROAD_IMPORTANCE)})
+            while True:
+                rows = stream.fetchmany(chunk_size)
+                if not rows:
+                    break
+                consumer(rows)
+    except Exception as e:
+        raise RuntimeError(f"Erreur lors du parcours des routes: {e}")
+
+@connect_database
+def build_filtered_nodes(cur: psycopg2.extensions.cursor, region: str = 'default', roads_table: str = 'roads') -> int:
+    """
+    Construit (ou reconstruit pour une région) la table filtered_nodes à partir de la table des routes
+    produite par scripts/custom.lua : une ligne par intersection, avec des attributs statiques typés
+    (degré, vitesses et nombre de voies min/moyen/max, importance de la route).
+    L'identifiant OSM du nœud est repris de la colonne `nodes` des routes ; il reste NULL pour une table
+    importée avant l'ajout de cette colonne.
+    Retourne le nombre de nœuds insérés.
+    """
+    importance = " ".join(f"WHEN '{highway}' THEN {rank}" for highway, rank in ROAD_IMPORTANCE.items())
+    highways = ", ".join(f"'{highway}'" for highway in ROAD_IMPORTANCE)
+    try:
+        cur.execute(
+            "SELECT 1 FROM pg_attribute WHERE attrelid = to_regclass(%s) AND attname = 'nodes' AND NOT attisdropped",
+            (roads_table,)
+        )
+        # Les sommets d'une ligne correspondent aux nœuds de la route tant qu'osm2pgsql n'en a retiré aucun
+        osmid = ("CASE WHEN array_length(r.nodes, 1) = ST_NPoints(r.geometry) THEN r.nodes[(dp).path[1]] END"
+                 if cur.fetchone() is not None else "NULL::bigint")
+        cur.execute(
+            sql.SQL(f"""
+            {FILTERED_NODES_DDL}
+            {FILTERED_NODES_INDEXES}
 
-        for attr, weight in strategie["weights"].items():
-            cur.execute(
-                f"""
-                -- Mise à jour de la colonne avec les scores calculés
-                UPDATE {table_name}
-                SET score = COALESCE(score, 0) + ({attr} * {weight});
+            DELETE FROM filtered_nodes WHERE region = %(region)s;
+
+            INSERT INTO filtered_nodes (osmid, region, degree, max_speed, mean_speed, min_speed, max_lane, mean_lane, min_lane, road_importance, geometry)
+            WITH vertices AS (
+                SELECT
+                    (dp).geom AS geometry,
+                    {osmid} AS osmid,
+                    -- Un sommet intérieur relie deux tronçons, une extrémité un seul
+                    CASE WHEN (dp).path[1] IN (1, ST_NPoints(r.geometry)) THEN 1 ELSE 2 END AS edges,
+                    r.maxspeed,
+                    r.lanes,
+                    CASE r.highway {importance} END AS importance
+                FROM {{roads}} r, LATERAL ST_DumpPoints(r.geometry) AS dp
+                WHERE r.highway IN ({highways})
+            )
+            SELECT
+                MIN(osmid),
+                %(region)s,
+                SUM(edges),
+                MAX(maxspeed), AVG(maxspeed), MIN(maxspeed),
+                MAX(lanes), AVG(lanes), MIN(lanes),
+                MAX(importance),
+                geometry
+            FROM vertices
+            GROUP BY geometry
+            -- Les intersections et les impasses, pas les sommets intermédiaires d'une route ni les raccords
+            -- bout à bout de deux routes (ou la fermeture d'une boucle), qui relient eux aussi deux tronçons
+            HAVING SUM(edges) <> 2;
+            """).format(roads=sql.Identifier(roads_table)),
+            {"region": region}
+        )
+        return cur.rowcount
+    except Exception as e:
+        raise RuntimeError(f"Erreur lors de la construction de filtered_nodes: {e}")
+
+@connect_database
+def cluster_filtered_nodes(cur: psycopg2.extensions.cursor, precision: int = 12) -> None:
+    """
+    Réordonne physiquement filtered_nodes selon le geohash de chaque nœud (courbe de remplissage de l'espace) :
+    les nœuds proches sont rangés dans les mêmes pages, et une zone ne lit que quelques plages contiguës de la table.
+    L'index du geohash est conservé pour les réordonnancements suivants. La table est verrouillée pendant l'opération.
+    """
+    try:
+        cur.execute(
+            sql.SQL(
+                """
+                CREATE INDEX IF NOT EXISTS filtered_nodes_geohash_idx ON filtered_nodes (ST_GeoHash(ST_Transform(geometry, 4326), {precision}));
+                CLUSTER filtered_nodes USING filtered_nodes_geohash_idx;
+                ANALYZE filtered_nodes;
                 """
+            ).format(precision=sql.Literal(precision))
+        )
+    except Exception as e:
+        raise RuntimeError(f"Erreur lors du réordonnancement de filtered_nodes: {e}")
+
+@connect_database
+def refresh_node_stats(cur: psycopg2.extensions.cursor) -> None:
+    """
+    Recalcule, en un seul parcours de filtered_nodes, le minimum et le maximum de chaque attribut statique
+    pour chaque région et pour l'ensemble des nœuds (région '*').
+    """
+    values = ", ".join(f"('{attr}', {attr}::float)" for attr in STATIC_FEATURES)
+    try:
+        cur.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS filtered_nodes_stats (
+                region TEXT NOT NULL,
+                attr TEXT NOT NULL,
+                min_val DOUBLE PRECISION,
+                max_val DOUBLE PRECISION,
+                PRIMARY KEY (region, attr)
+            );
+            TRUNCATE filtered_nodes_stats;
+
+            INSERT INTO filtered_nodes_stats (region, attr, min_val, max_val)
+            SELECT COALESCE(region, '*'), attr, MIN(val), MAX(val)
+            FROM filtered_nodes, LATERAL (VALUES {values}) AS v(attr, val)
+            GROUP BY GROUPING SETS ((region, attr), (attr));
+
+            ANALYZE filtered_nodes;
+            """
+        )
+    except Exception as e:
+        raise RuntimeError(f"Erreur lors du calcul des statistiques de filtered_nodes: {e}")
+
+@connect_database
+def score_zone(cur: psycopg2.extensions.cursor, table_name: str, starting_point: Tuple[float, float], angle_fuite: float, strategie: Dict, attrs: list, stats: Dict[str, Tuple[float, float]] = None) -> None:
+    """
+    Calcule en une seule requête distance au départ, différence angulaire, normalisations, sigmoïdes et score.
+    Les attributs statiques `attrs` sont normalisés avec `stats` ({attr: (min, max)}) s'il est fourni,
+    sinon par agrégats de fenêtre sur la zone. Les colonnes statiques ne sont pas réécrites.
+    Point de départ, angle, poids et bornes sont des paramètres : le plan est réutilisé pour une même forme de stratégie.
+    """
+    stats = stats or {}
+    features = list(attrs) + ['distance_to_start', 'difference_angle']
+    unknown = [attr for attr in strategie["weights"] if attr not in features]
+    if unknown:
+        raise RuntimeError(f"Attributs inconnus dans la stratégie: {unknown}")
+
+    table = sql.Identifier(table_name)
+    params = QueryParams()
+    start = point_expression(params, starting_point)
+    if type(angle_fuite) == int:
+        azimuth = sql.SQL("ABS(DEGREES(ST_Azimuth(s.geom, t.geometry)) - {})").format(params(angle_fuite))
+        angle = sql.SQL("LEAST(azimuth_diff, 360 - azimuth_diff)")
+    else:
+        azimuth, angle = sql.SQL("0.0"), sql.SQL("0.0")
+    direction_alpha = params(strategie['direction_alpha'] or 1)
+
+    static = sql.SQL("").join(
+        sql.SQL(", {} AS {}").format(
+            normalized_expression(attr, *stats[attr], params) if attr in stats else window_normalized_expression(attr),
+            sql.Identifier(attr)
+        )
+        for attr in attrs
+    )
+    score = sql.SQL(" + ").join(
+        sql.SQL("COALESCE(n.{}, 0) * {}").format(sql.Identifier(attr), params(weight))
+        for attr, weight in strategie["weights"].items()
+    ) if strategie["weights"] else sql.SQL("0.0")
+    columns = sql.SQL("").join(sql.SQL(", {}").format(sql.Identifier(attr)) for attr in attrs)
+
+    try:
+        cur.execute(
+            sql.SQL(
+                """
+                ALTER TABLE {}
+                    ADD COLUMN IF NOT EXISTS distance_to_start FLOAT,
+                    ADD COLUMN IF NOT EXISTS difference_angle FLOAT,
+                    ADD COLUMN IF NOT EXISTS score FLOAT;
+                """
+            ).format(table)
+        )
+        execute_prepared(
+            cur,
+            sql.SQL(
+                """
+                WITH start AS (
+                    SELECT {start} AS geom
+                ),
+                raw AS (
+                    -- L'azimut n'est calculé qu'une fois par nœud
+                    SELECT t.ctid AS rid, ST_Distance(t.geometry, s.geom) AS distance, {azimuth} AS azimuth_diff{columns}
+                    FROM {table} t, start s
+                ),
+                features AS (
+                    SELECT rid, distance, {angle} AS angle{columns}
+                    FROM raw
+                ),
+                normalized AS (
+                    SELECT
+                        rid,
+                        sigmoid({distance}, 0, 1) AS distance_to_start,
+                        sigmoid({angle_norm}, 0.5, {direction_alpha}) AS difference_angle
+                        {static}
+                    FROM features
+                )
+                UPDATE {table} t
+                SET distance_to_start = n.distance_to_start,
+                    difference_angle = n.difference_angle,
+                    score = {score}
+                FROM normalized n
+                WHERE t.ctid = n.rid
+                """
+            ).format(
+                start=start, azimuth=azimuth, columns=columns, table=table, angle=angle,
+                distance=window_normalized_expression("distance"), angle_norm=window_normalized_expression("angle"),
+                direction_alpha=direction_alpha, static=static, score=score,
+            ),
+            params
+        )
+    except Exception as e:
+        raise RuntimeError(f"Erreur lors du calcul des scores: {e}")
+
+@connect_database
+def set_score(cur: psycopg2.extensions.cursor, table_name: str, strategie: Dict[str, float], stats: Dict[str, Tuple[float, float]] = None) -> None:
+    """
+    Calcule le score de chaque point en fonction de la stratégie donnée.
+    Les attributs présents dans `stats` ({attr: (min, max)}) sont normalisés à la volée dans le calcul,
+    sans réécrire leur colonne.
+    """
+    try:
+        logging.debug(strategie)
+        table = sql.Identifier(table_name)
+        # Ajout de la colonne si elle n'existe pas
+        cur.execute(sql.SQL("ALTER TABLE {} ADD COLUMN IF NOT EXISTS score FLOAT;").format(table))
+
+        stats = stats or {}
+        for attr, weight in strategie["weights"].items():
+            params = QueryParams()
+            value = normalized_expression(attr, *stats[attr], params) if attr in stats else sql.Identifier(attr)
+            # Mise à jour de la colonne avec les scores calculés ; une valeur manquante ne contribue pas, comme dans score_zone
+            execute_prepared(
+                cur,
+                sql.SQL("UPDATE {} SET score = COALESCE(score, 0) + COALESCE({} * {}, 0)").format(table, value, params(weight)),
+                params
             )
     except Exception as e:
         raise RuntimeError(f"Erreur lors du calcul des scores: {e}")
@@ -233,34 +938,46 @@ def update_score_from_points_repeltion(cur: psycopg2.extensions.cursor, table_na
     """
     Met à jour le score d'un nœud donné.
     """
-    cur.execute(
-        f"""
-        -- Mise à jour de la colonne avec les scores calculés
-        UPDATE {table_name}
-        SET score = COALESCE(score, 0) + ({strategie["points_repeltion"]} * {column_name});
-        """
+    params = QueryParams()
+    # Mise à jour de la colonne avec les scores calculés
+    execute_prepared(
+        cur,
+        sql.SQL("UPDATE {} SET score = COALESCE(score, 0) + ({} * {})").format(
+            sql.Identifier(table_name), params(strategie["points_repeltion"]), sql.Identifier(column_name)
+        ),
+        params
     )
 
 @connect_database
-def get_top_point(cur: psycopg2.extensions.cursor, table_name: str) -> Tuple[float, float]:
+def get_top_point(cur: psycopg2.extensions.cursor, table_name: str, rng: Optional[random.Random] = None) -> Tuple[float, float]:
     """
     Retourne le point ayant le score le plus élevé et le supprime de la table.
+    Le point est tiré parmi les meilleurs avec `rng` : un générateur initialisé rend la sélection reproductible.
+    Sans `rng`, le tirage utilise le module random.
     """
+    rng = rng or random
     entropie = 5
-    best_point_index = random.randint(0, entropie - 1)
-    cur.execute(
-        f"""
-        WITH top_point AS (
-            SELECT ST_AsText(ST_Transform(geometry, 4326)) AS geom, ctid
-            FROM {table_name}
-            ORDER BY score DESC
-            LIMIT 1
-            OFFSET {best_point_index}
-        )
-        DELETE FROM {table_name}
-        WHERE ctid = (SELECT ctid FROM top_point)
-        RETURNING (SELECT geom FROM top_point);
-        """
+    best_point_index = rng.randint(0, entropie - 1)
+    table = sql.Identifier(table_name)
+    params = QueryParams()
+    execute_prepared(
+        cur,
+        sql.SQL(
+            """
+            WITH top_point AS (
+                SELECT ST_AsText(ST_Transform(geometry, 4326)) AS geom, ctid
+                FROM {table}
+                ORDER BY score DESC
+                LIMIT 1
+                OFFSET {offset}
+            )
+            DELETE FROM {table}
+            WHERE ctid = (SELECT ctid FROM top_point)
+            RETURNING (SELECT geom FROM top_point)
+            """
+        ).format(table=table, offset=params(best_point_index, "int")),
+        params
     )
     point = wkt.loads(cur.fetchone()[0])
     return (point.y, point.x)
+
@@ -0,0 +1,67 @@
+# utils/geocoding.py
+import logging
+import re
+import threading
+import unicodedata
+from typing import Dict, Tuple, Union
+from geopy.geocoders import Nominatim
+
+from utils.cache import LRUCache
+from utils.utils import load_config
+from utils.metrics import metrics
+
+GEOCODING_DEFAULTS: Dict = {
+    "user_agent": "e-pervier",
+    "domain": "nominatim.openstreetmap.org",
+    "scheme": "https",
+    "timeout": 10,
+    "max_size": 2048,
+    "path": None,
+}
+
+_geolocator: Union[Nominatim, None] = None
+_geocoding_cache: Union[LRUCache, None] = None
+_geocoding_lock = threading.Lock()
+
+def normalize_address(address: str) -> str:
+    """
+    Normalise une adresse pour l'utiliser comme clé de cache (casse, accents composés, espaces).
+    """
+    address = unicodedata.normalize("NFKC", address).lower().strip()
+    return re.sub(r"\s+", " ", address)
+
+def get_geocoding_cache() -> LRUCache:
+    """
+    Retourne le cache adresse -> (lat, lon) du processus.
+    """
+    global _geolocator, _geocoding_cache
+    if _geocoding_cache is None:
+        with _geocoding_lock:
+            if _geocoding_cache is None:
+                params = load_config("geocoding", GEOCODING_DEFAULTS)
+                _geolocator = Nominatim(user_agent=params["user_agent"], domain=params["domain"], scheme=params["scheme"])
+                _geocoding_cache = LRUCache(params["max_size"], None, params["path"])
+    return _geocoding_cache
+
+def geocode(address: str) -> Tuple[float, float]:
+    """
+    Renvoie les coordonnées (lat, lon) d'une adresse, depuis le cache ou via Nominatim.
+    """
+    if not address:
+        raise ValueError("Adresse vide")
+    cache = get_geocoding_cache()
+    key = normalize_address(address)
+    cached = cache.get(key)
+    metrics.inc("cache_requests_total", cache="geocoding", result="miss" if cached is None else "hit")
+    if cached is not None:
+        return tuple(cached)
+
+    logging.debug(f"Géocodage de l'adresse '{address}'")
+    with metrics.span("geocode_request"):
+        location = _geolocator.geocode(address, timeout=load_config("geocoding", GEOCODING_DEFAULTS)["timeout"])
+    if location is None:
+        raise ValueError(f"Adresse non trouvée: '{address}'")
+
+    coords = (location.latitude, location.longitude)
+    cache.set(key, list(coords))
+    return coords
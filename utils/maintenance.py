@@ -0,0 +1,117 @@
+# utils/maintenance.py
+"""
+Commandes de maintenance de la base de données.
+
+    python -m utils.maintenance build-nodes --region occitanie
+    python -m utils.maintenance import-osm occitanie-latest.osm.pbf --region occitanie
+    python -m utils.maintenance stats
+    python -m utils.maintenance index
+    python -m utils.maintenance cluster
+    python -m utils.maintenance export-store data/node_store
+    python -m utils.maintenance export-graph data/road_graph
+"""
+import argparse
+import logging
+
+from utils.db_utils import build_filtered_nodes, refresh_node_stats, cluster_filtered_nodes, ensure_spatial_index, database_session
+
+def build_nodes(args: argparse.Namespace) -> None:
+    """
+    Matérialise filtered_nodes depuis la table des routes, puis recalcule les statistiques.
+    """
+    with database_session():
+        count = build_filtered_nodes(args.region, args.roads_table)
+        refresh_node_stats()
+    logging.info(f"{count} nœuds importés pour la région '{args.region}'")
+
+def import_pbf(args: argparse.Namespace) -> None:
+    """
+    Importe directement un extrait .osm.pbf dans filtered_nodes, puis recalcule les statistiques.
+    """
+    from utils.osm_import import import_osm
+
+    with database_session():
+        count = import_osm(args.pbf, args.region, args.location_index, args.chunk_size)
+        refresh_node_stats()
+    logging.info(f"{count} nœuds importés depuis {args.pbf} pour la région '{args.region}'")
+
+def stats(args: argparse.Namespace) -> None:
+    """
+    Recalcule les statistiques globales et par région des attributs statiques.
+    """
+    refresh_node_stats()
+    logging.info("Statistiques de filtered_nodes recalculées")
+
+def index(args: argparse.Namespace) -> None:
+    """
+    Crée les index de filtered_nodes qui manquent (tables construites avant leur introduction).
+    """
+    ensure_spatial_index()
+    logging.info("Index de filtered_nodes créés")
+
+def cluster(args: argparse.Namespace) -> None:
+    """
+    Réordonne filtered_nodes par geohash pour que l'extraction d'une zone lise des pages contiguës.
+    """
+    cluster_filtered_nodes(args.precision)
+    logging.info("filtered_nodes réordonnée par geohash")
+
+def export_store(args: argparse.Namespace) -> None:
+    """
+    Exporte filtered_nodes dans un magasin de nœuds projeté en mémoire (voir core/node_store.py).
+    """
+    from core.node_store import NodeStore
+
+    store = NodeStore.export(args.path, args.cell_size)
+    logging.info(f"{len(store)} nœuds exportés dans {args.path}")
+
+def export_graph(args: argparse.Namespace) -> None:
+    """
+    Exporte le graphe routier et les intersections de filtered_nodes pour le calcul local des isochrones (voir core/road_graph.py).
+    """
+    from core.road_graph import RoadGraph
+
+    graph = RoadGraph.export(args.path, args.roads_table)
+    logging.info(f"{len(graph)} sommets et {graph.edges} arêtes exportés dans {args.path}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Maintenance de la base de données Epeire")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build-nodes", help="construit filtered_nodes depuis la table des routes")
+    build.add_argument("--region", default="default", help="nom de la région importée (remplace ses nœuds)")
+    build.add_argument("--roads-table", default="roads", help="table des routes produite par scripts/custom.lua")
+    build.set_defaults(func=build_nodes)
+
+    osm = commands.add_parser("import-osm", help="construit filtered_nodes en flux depuis un extrait .osm.pbf")
+    osm.add_argument("pbf", help="chemin de l'extrait .osm.pbf")
+    osm.add_argument("--region", default="default", help="nom de la région importée (remplace ses nœuds)")
+    osm.add_argument("--location-index", default="flex_mem", help="index de positions pyosmium (ex. dense_file_array,/tmp/nodes.idx)")
+    osm.add_argument("--chunk-size", type=int, default=500_000, help="occurrences de nœuds envoyées par COPY")
+    osm.set_defaults(func=import_pbf)
+
+    refresh = commands.add_parser("stats", help="recalcule les statistiques des attributs statiques")
+    refresh.set_defaults(func=stats)
+
+    indexes = commands.add_parser("index", help="crée les index manquants de filtered_nodes")
+    indexes.set_defaults(func=index)
+
+    reorder = commands.add_parser("cluster", help="réordonne physiquement filtered_nodes par geohash")
+    reorder.add_argument("--precision", type=int, default=12, help="nombre de caractères du geohash")
+    reorder.set_defaults(func=cluster)
+
+    export = commands.add_parser("export-store", help="exporte filtered_nodes dans un magasin de nœuds en mémoire")
+    export.add_argument("path", help="dossier du magasin (remplacé)")
+    export.add_argument("--cell-size", type=float, default=2000.0, help="taille des cellules de la grille, en mètres EPSG:3857")
+    export.set_defaults(func=export_store)
+
+    graph = commands.add_parser("export-graph", help="exporte le graphe routier pour le calcul local des isochrones")
+    graph.add_argument("path", help="dossier du graphe (remplacé)")
+    graph.add_argument("--roads-table", default="roads", help="table des routes produite par scripts/custom.lua")
+    graph.set_defaults(func=export_graph)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+# utils/metrics.py
+import hashlib
+import json
+import logging
+import re
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from time import perf_counter
+from typing import Callable, Dict, Tuple
+
+import psycopg2.extensions
+
+PREFIX: str = "epeire_"
+DURATION_BUCKETS: Tuple[float, ...] = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS: Tuple[float, ...] = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+_NO_SPAN = nullcontext()
+
+def _labels_key(labels: Dict[str, str]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: Dict[str, str] = None) -> str:
+    items = list(labels) + list((extra or {}).items())
+    if not items:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in items)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(items, escaped)) + "}"
+
+class Histogram:
+    """
+    Histogramme cumulatif à bornes fixes (format Prometheus).
+    """
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class Metrics:
+    """
+    Registre de compteurs et d'histogrammes, exporté au format texte Prometheus.
+    Quand il est désactivé, les spans et les observations ne font rien.
+    """
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self._counters: Dict[str, Dict[tuple, float]] = {}
+        self._histograms: Dict[str, Dict[tuple, Histogram]] = {}
+        self._buckets: Dict[str, Tuple[float, ...]] = {}
+        self._collectors: Dict[str, Callable[[], Dict[tuple, float]]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """
+        Incrémente un compteur.
+        """
+        if not self.enabled:
+            return
+        key = _labels_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = DURATION_BUCKETS, **labels) -> None:
+        """
+        Ajoute une observation à un histogramme.
+        """
+        if not self.enabled:
+            return
+        key = _labels_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            self._buckets.setdefault(name, buckets)
+            if key not in series:
+                series[key] = Histogram(self._buckets[name])
+            series[key].observe(value)
+
+    def span(self, name: str, **labels):
+        """
+        Mesure la durée d'un bloc : histogramme `{name}_seconds` et ligne de log structurée.
+        """
+        if not self.enabled:
+            return _NO_SPAN
+        return self._span(name, labels)
+
+    @contextmanager
+    def _span(self, name: str, labels: Dict[str, str]):
+        start = perf_counter()
+        status = "ok"
+        try:
+            yield
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            duration = perf_counter() - start
+            self.observe(f"{name}_seconds", duration, **labels)
+            logging.debug(json.dumps({"span": name, **labels, "status": status, "duration": duration}))
+
+    def register_collector(self, name: str, collector: Callable[[], Dict[tuple, float]]) -> None:
+        """
+        Enregistre une série lue au moment de l'export : `collector()` retourne {labels: valeur}.
+        """
+        self._collectors[name] = collector
+
+    def render(self) -> str:
+        """
+        Retourne toutes les séries au format texte Prometheus.
+        """
+        lines = []
+        with self._lock:
+            for name, series in self._counters.items():
+                lines.append(f"# TYPE {PREFIX}{name} counter")
+                lines.extend(f"{PREFIX}{name}{_format_labels(key)} {value}" for key, value in series.items())
+            for name, series in self._histograms.items():
+                lines.append(f"# TYPE {PREFIX}{name} histogram")
+                for key, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+                        cumulative += count
+                        lines.append(f"{PREFIX}{name}_bucket{_format_labels(key, {'le': str(bound)})} {cumulative}")
+                    lines.append(f"{PREFIX}{name}_sum{_format_labels(key)} {histogram.sum}")
+                    lines.append(f"{PREFIX}{name}_count{_format_labels(key)} {histogram.count}")
+        for name, collector in self._collectors.items():
+            lines.append(f"# TYPE {PREFIX}{name} gauge")
+            lines.extend(f"{PREFIX}{name}{_format_labels(_labels_key(dict(key)))} {value}" for key, value in collector().items())
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?(?:e[-+]?\d+)?\b", re.IGNORECASE)
+_COMMENTS = re.compile(r"--[^\n]*")
+
+def sql_fingerprint(query: str) -> str:
+    """
+    Empreinte d'une requête SQL : littéraux remplacés par ?, commentaires et espaces retirés.
+    """
+    normalized = _LITERALS.sub("?", _COMMENTS.sub("", query))
+    normalized = " ".join(normalized.split())
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+class InstrumentedCursorMixin:
+    """
+    Mesure chaque requête d'un curseur : empreinte SQL, nombre de lignes affectées et durée.
+    Se place avant la classe de curseur dont il mesure `execute`.
+    """
+    def execute(self, query, vars=None):
+        start = perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            duration = perf_counter() - start
+            if isinstance(query, bytes):
+                text = query.decode()
+            elif isinstance(query, str):
+                text = query
+            else:
+                text = query.as_string(self)
+            fingerprint = sql_fingerprint(text)
+            metrics.observe("db_query_seconds", duration, fingerprint=fingerprint)
+            metrics.inc("db_rows_total", max(self.rowcount, 0), fingerprint=fingerprint)
+            logging.debug(json.dumps({"span": "db_query", "fingerprint": fingerprint, "rows": self.rowcount, "duration": duration}))
+
+class InstrumentedCursor(InstrumentedCursorMixin, psycopg2.extensions.cursor):
+    """
+    Curseur psycopg2 instrumenté, passé en cursor_factory quand les métriques sont activées.
+    """
@@ -0,0 +1,79 @@
+# utils/np_utils.py
+import numpy as np
+from typing import Dict, Tuple, Union
+
+ArrayLike = Union[float, np.ndarray]
+
+EARTH_RADIUS: float = 6378137.0
+# Même constante que la fonction sigmoid SQL (voir set_sigmoid)
+SIGMOID_STEEPNESS: float = 5.29330482472
+
+def to_mercator(lat: ArrayLike, lon: ArrayLike) -> Tuple[ArrayLike, ArrayLike]:
+    """
+    Projette des coordonnées (lat, lon) EPSG:4326 en EPSG:3857.
+    """
+    x = EARTH_RADIUS * np.radians(lon)
+    y = EARTH_RADIUS * np.log(np.tan(np.pi / 4 + np.radians(lat) / 2))
+    return x, y
+
+def to_wgs84(x: ArrayLike, y: ArrayLike) -> Tuple[ArrayLike, ArrayLike]:
+    """
+    Projette des coordonnées EPSG:3857 en (lat, lon) EPSG:4326.
+    """
+    lon = np.degrees(np.asarray(x) / EARTH_RADIUS)
+    lat = np.degrees(2 * np.arctan(np.exp(np.asarray(y) / EARTH_RADIUS)) - np.pi / 2)
+    return lat, lon
+
+def normalize(values: np.ndarray, bounds: Tuple[float, float] = None) -> np.ndarray:
+    """
+    Normalisation min-max, identique à normalize_column (colonne constante -> 0, NaN conservés).
+    Les bornes (min, max) peuvent être imposées, par exemple celles précalculées à l'import.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if bounds is not None:
+        min_val, max_val = bounds
+    elif values.size == 0 or np.all(np.isnan(values)):
+        return values.copy()
+    else:
+        min_val, max_val = np.nanmin(values), np.nanmax(values)
+    if min_val is None or max_val is None or max_val == min_val:
+        return np.where(np.isnan(values), np.nan, 0.0)
+    return (values - min_val) / (max_val - min_val)
+
+def sigmoid(values: np.ndarray, offset: float = 0, scale: float = 1) -> np.ndarray:
+    """
+    Sigmoïde centrée sur `offset`, identique à la fonction SQL installée par set_sigmoid.
+    """
+    scale = scale if scale != 0 else 1
+    return 2 / (1 + np.exp((offset - values) * SIGMOID_STEEPNESS / scale)) - 1
+
+def distance_to_point(x: np.ndarray, y: np.ndarray, point_x: float, point_y: float) -> np.ndarray:
+    """
+    Distance euclidienne (EPSG:3857) entre chaque nœud et un point, comme ST_Distance.
+    """
+    return np.hypot(x - point_x, y - point_y)
+
+def difference_angle(x: np.ndarray, y: np.ndarray, start_x: float, start_y: float, angle_fuite: float) -> np.ndarray:
+    """
+    Différence angulaire (degrés) entre l'azimut de chaque nœud et la direction de fuite, comme set_difference_angle.
+    Un nœud confondu avec le départ n'a pas d'azimut : NaN, comme le NULL de ST_Azimuth pour deux points identiques
+    (ignoré par la normalisation et compté 0 dans le score), et non l'azimut 0 que donnerait arctan2(0, 0).
+    """
+    if type(angle_fuite) != int:
+        return np.zeros(len(x))
+    dx, dy = x - start_x, y - start_y
+    azimuth = np.degrees(np.arctan2(dx, dy)) % 360
+    diff = np.abs(azimuth - angle_fuite)
+    return np.where((dx == 0) & (dy == 0), np.nan, np.minimum(diff, 360 - diff))
+
+def weighted_score(features: Dict[str, np.ndarray], weights: Dict[str, float]) -> np.ndarray:
+    """
+    Somme pondérée des attributs ; les valeurs manquantes ne contribuent pas au score.
+    """
+    size = len(next(iter(features.values()))) if features else 0
+    score = np.zeros(size)
+    for attr, weight in weights.items():
+        if attr not in features:
+            raise KeyError(f"Attribut inconnu dans la stratégie: {attr}")
+        score += np.nan_to_num(features[attr]) * weight
+    return score
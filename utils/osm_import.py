@@ -0,0 +1,235 @@
+# utils/osm_import.py
+"""
+Import en flux d'un extrait .osm.pbf vers filtered_nodes.
+
+Les ways routières sont lues une seule fois avec pyosmium, sans matérialiser le graphe en mémoire :
+chaque occurrence d'un nœud dans une route est accumulée dans des tampons de taille bornée, puis
+envoyée par COPY binaire dans une table de travail temporaire. L'agrégation par nœud (degré, vitesses
+et voies min/moyen/max, importance) et le filtrage des intersections sont ensuite faits par PostgreSQL.
+Seules les lignes de la région importée sont remplacées : les index de filtered_nodes ne sont supprimés
+puis reconstruits en une fois que lorsque la table ne contient aucune autre région.
+"""
+import io
+import re
+import math
+import logging
+import struct
+import psycopg2
+import numpy as np
+from array import array
+from typing import List, Optional, Sequence
+
+from utils.db_utils import connect_database, ROAD_IMPORTANCE, FILTERED_NODES_DDL, FILTERED_NODES_INDEXES
+from utils.np_utils import to_mercator
+
+CHUNK_SIZE: int = 500_000
+MPH_TO_KMH: float = 1.609344
+
+# En-tête et fin du format binaire de COPY (signature, drapeaux, extension d'en-tête vide)
+COPY_HEADER: bytes = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+COPY_TRAILER: bytes = struct.pack(">h", -1)
+
+# Une ligne de la table de travail : nombre de champs, puis (longueur, valeur) pour chaque champ, en big-endian
+STAGING_FIELDS = [('osmid', '>i8'), ('edges', '>i2'), ('importance', '>i2'), ('speed', '>f4'), ('lanes', '>f4'), ('x', '>f8'), ('y', '>f8')]
+STAGING_DTYPE = np.dtype(
+    [('count', '>i2')]
+    + [field for name, dtype in STAGING_FIELDS for field in ((f"{name}_len", '>i4'), (name, dtype))]
+)
+
+_NUMBER = re.compile(r"\s*(\d+(?:\.\d+)?)")
+
+def parse_maxspeed(value: str) -> float:
+    """
+    Convertit une valeur de maxspeed OSM en km/h ("50", "30 mph", "50;70").
+    Les valeurs symboliques ("FR:urban", "walk"...) donnent NaN.
+    """
+    if not value:
+        return math.nan
+    match = _NUMBER.match(value)
+    if match is None:
+        return math.nan
+    speed = float(match.group(1))
+    return speed * MPH_TO_KMH if "mph" in value else speed
+
+def parse_lanes(value: str) -> float:
+    """
+    Convertit une valeur de lanes OSM en nombre ("2", "2;3" donne 2). Les valeurs invalides donnent NaN.
+    """
+    if not value:
+        return math.nan
+    match = _NUMBER.match(value)
+    return float(match.group(1)) if match is not None else math.nan
+
+def encode_copy_chunk(osmid: array, edges: array, importance: array, speed: array, lanes: array, lat: array, lon: array) -> bytes:
+    """
+    Encode un bloc d'occurrences de nœuds au format binaire de COPY, sans boucle Python par ligne.
+    Les valeurs manquantes sont transmises en NaN et converties en NULL lors de l'agrégation.
+    """
+    rows = np.empty(len(osmid), dtype=STAGING_DTYPE)
+    rows['count'] = len(STAGING_FIELDS)
+    x, y = to_mercator(np.frombuffer(lat, dtype=np.float64), np.frombuffer(lon, dtype=np.float64))
+    values = {
+        'osmid': np.frombuffer(osmid, dtype=np.int64),
+        'edges': np.frombuffer(edges, dtype=np.int16),
+        'importance': np.frombuffer(importance, dtype=np.int16),
+        'speed': np.frombuffer(speed, dtype=np.float32),
+        'lanes': np.frombuffer(lanes, dtype=np.float32),
+        'x': x,
+        'y': y,
+    }
+    for name, dtype in STAGING_FIELDS:
+        rows[f"{name}_len"] = np.dtype(dtype).itemsize
+        rows[name] = values[name]
+    return rows.tobytes()
+
+def way_node_edges(highway: Optional[str], refs: Sequence[int]) -> List[int]:
+    """
+    Nombre de tronçons reliés à chaque nœud d'une route (1 aux extrémités, 2 aux sommets intérieurs).
+    Une route fermée (rond-point) perd son nœud de fermeture et n'a pas d'extrémité.
+    Retourne une liste vide si la route n'est pas carrossable ou compte moins de deux nœuds.
+    """
+    if highway not in ROAD_IMPORTANCE:
+        return []
+    refs = list(refs)
+    if len(refs) > 2 and refs[0] == refs[-1]:
+        return [2] * (len(refs) - 1)
+    if len(refs) < 2:
+        return []
+    return [1] + [2] * (len(refs) - 2) + [1]
+
+def _road_handler():
+    """
+    Construit la classe du handler pyosmium (import différé : pyosmium n'est nécessaire qu'à l'import).
+    """
+    import osmium
+
+    class RoadHandler(osmium.SimpleHandler):
+        """
+        Accumule les occurrences de nœuds des routes retenues et les envoie par blocs à `flush`.
+        """
+        def __init__(self, flush, chunk_size: int = CHUNK_SIZE):
+            super().__init__()
+            self.flush = flush
+            self.chunk_size = chunk_size
+            self.ways = 0
+            self.rows = 0
+            self.reset()
+
+        def reset(self) -> None:
+            self.osmid = array('q')
+            self.edges = array('h')
+            self.importance = array('h')
+            self.speed = array('f')
+            self.lanes = array('f')
+            self.lat = array('d')
+            self.lon = array('d')
+
+        def way(self, w) -> None:
+            highway = w.tags.get('highway')
+            if highway not in ROAD_IMPORTANCE:
+                return
+
+            nodes = [n for n in w.nodes if n.location.valid()]
+            edges = way_node_edges(highway, [n.ref for n in nodes])
+            if not edges:
+                return
+
+            speed = parse_maxspeed(w.tags.get('maxspeed'))
+            lanes = parse_lanes(w.tags.get('lanes'))
+            importance = ROAD_IMPORTANCE[highway]
+            # zip écarte le nœud de fermeture d'une route fermée
+            for node, edge in zip(nodes, edges):
+                self.osmid.append(node.ref)
+                self.edges.append(edge)
+                self.importance.append(importance)
+                self.speed.append(speed)
+                self.lanes.append(lanes)
+                self.lat.append(node.location.lat)
+                self.lon.append(node.location.lon)
+
+            self.ways += 1
+            if len(self.osmid) >= self.chunk_size:
+                self.send()
+
+        def send(self) -> None:
+            if not self.osmid:
+                return
+            self.flush(encode_copy_chunk(self.osmid, self.edges, self.importance, self.speed, self.lanes, self.lat, self.lon))
+            self.rows += len(self.osmid)
+            self.reset()
+
+    return RoadHandler
+
+@connect_database
+def import_osm(cur: psycopg2.extensions.cursor, pbf_path: str, region: str = 'default', location_index: str = 'flex_mem', chunk_size: int = CHUNK_SIZE) -> int:
+    """
+    Importe (ou remplace pour une région) les intersections d'un extrait .osm.pbf dans filtered_nodes.
+    `location_index` est l'index de positions de pyosmium : 'flex_mem' convient aux extraits régionaux,
+    'dense_file_array,<fichier>' borne la mémoire pour un extrait national.
+    Retourne le nombre de nœuds insérés.
+    """
+    try:
+        cur.execute(
+            """
+            CREATE TEMP TABLE osm_way_nodes (
+                osmid BIGINT,
+                edges SMALLINT,
+                importance SMALLINT,
+                speed REAL,
+                lanes REAL,
+                x DOUBLE PRECISION,
+                y DOUBLE PRECISION
+            ) ON COMMIT DROP;
+            """
+        )
+
+        def flush(chunk: bytes) -> None:
+            cur.copy_expert("COPY osm_way_nodes FROM STDIN WITH (FORMAT binary)", io.BytesIO(COPY_HEADER + chunk + COPY_TRAILER))
+
+        handler = _road_handler()(flush, chunk_size)
+        handler.apply_file(pbf_path, locations=True, idx=location_index)
+        handler.send()
+        logging.info(f"{handler.ways} routes lues, {handler.rows} occurrences de nœuds chargées")
+
+        cur.execute(FILTERED_NODES_DDL)
+        cur.execute("SELECT EXISTS (SELECT 1 FROM filtered_nodes WHERE region <> %s)", (region,))
+        if not cur.fetchone()[0]:
+            # Table vide (hors région importée) : les index sont supprimés pendant l'insertion massive
+            # puis reconstruits en une fois ; sinon ils sont conservés pour ne pas réindexer les autres régions
+            cur.execute(
+                """
+                DROP INDEX IF EXISTS filtered_nodes_geometry_idx;
+                DROP INDEX IF EXISTS filtered_nodes_region_idx;
+                """
+            )
+        cur.execute(
+            """
+            DELETE FROM filtered_nodes WHERE region = %s;
+
+            INSERT INTO filtered_nodes (osmid, region, degree, max_speed, mean_speed, min_speed, max_lane, mean_lane, min_lane, road_importance, geometry)
+            SELECT
+                osmid,
+                %s,
+                SUM(edges),
+                MAX(NULLIF(speed, 'NaN')), AVG(NULLIF(speed, 'NaN')), MIN(NULLIF(speed, 'NaN')),
+                MAX(NULLIF(lanes, 'NaN')), AVG(NULLIF(lanes, 'NaN')), MIN(NULLIF(lanes, 'NaN')),
+                MAX(importance),
+                ST_SetSRID(ST_MakePoint(MIN(x), MIN(y)), 3857)
+            FROM osm_way_nodes
+            GROUP BY osmid
+            -- Les intersections et les impasses, pas les sommets intermédiaires d'une route ni les raccords
+            -- bout à bout de deux routes (ou la fermeture d'une boucle), qui relient eux aussi deux tronçons
+            HAVING SUM(edges) <> 2;
+            """,
+            (region, region)
+        )
+        count = cur.rowcount
+        cur.execute(
+            f"""
+            {FILTERED_NODES_INDEXES}
+            ANALYZE filtered_nodes;
+            """
+        )
+        return count
+    except Exception as e:
+        raise RuntimeError(f"Erreur lors de l'import OSM de '{pbf_path}': {e}")
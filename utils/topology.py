@@ -0,0 +1,136 @@
+# utils/topology.py
+"""
+Encodage TopoJSON de géométries GeoJSON polygonales.
+
+Les coordonnées sont quantifiées sur une grille entière couvrant l'emprise de toutes les géométries,
+puis les contours sont découpés en arcs aux jonctions (points où deux contours se séparent).
+Un arc commun à plusieurs polygones (la bordure de isoB est partagée par isoB, valid_zone et zpp)
+n'est transmis qu'une fois, et chaque arc est codé en différences successives.
+"""
+from typing import Any, Dict, List, Tuple
+
+Point = Tuple[int, int]
+
+def _rings(geometry: Dict[str, Any]) -> List[List[List[float]]]:
+    """
+    Retourne tous les contours (extérieurs et trous) d'une géométrie GeoJSON polygonale.
+    """
+    if geometry is None:
+        return []
+    kind = geometry["type"]
+    if kind == "Polygon":
+        return list(geometry["coordinates"])
+    if kind == "MultiPolygon":
+        return [ring for polygon in geometry["coordinates"] for ring in polygon]
+    if kind == "GeometryCollection":
+        return [ring for member in geometry["geometries"] for ring in _rings(member)]
+    return []
+
+class _ArcBuilder:
+    """
+    Découpe les contours quantifiés en arcs et déduplique les arcs parcourus dans un sens ou dans l'autre.
+    """
+    def __init__(self, junctions: set) -> None:
+        self.junctions = junctions
+        self.arcs: List[List[Point]] = []
+        self.index: Dict[Tuple[Point, ...], int] = {}
+
+    def __add(self, arc: List[Point]) -> int:
+        key = tuple(arc)
+        if key in self.index:
+            return self.index[key]
+        reverse = key[::-1]
+        if reverse in self.index:
+            return ~self.index[reverse]
+        self.index[key] = len(self.arcs)
+        self.arcs.append(arc)
+        return self.index[key]
+
+    def ring(self, ring: List[Point]) -> List[int]:
+        """
+        Retourne les indices des arcs d'un contour ouvert (sans répétition du premier point).
+        """
+        cuts = [i for i, point in enumerate(ring) if point in self.junctions]
+        if not cuts:
+            # Contour sans jonction : un seul arc fermé, commencé au plus petit point pour être reconnu
+            # quel que soit le point de départ ou le sens de parcours
+            start = ring.index(min(ring))
+            rotated = ring[start:] + ring[:start]
+            return [self.__add(rotated + rotated[:1])]
+
+        rotated = ring[cuts[0]:] + ring[:cuts[0]]
+        cuts = [i - cuts[0] for i in cuts] + [len(ring)]
+        closed = rotated + rotated[:1]
+        return [self.__add(closed[start:end + 1]) for start, end in zip(cuts, cuts[1:])]
+
+def to_topology(geometries: Dict[str, Dict[str, Any]], quantization: int = 100_000) -> Dict[str, Any]:
+    """
+    Encode des géométries GeoJSON (Polygon, MultiPolygon, GeometryCollection) nommées en une topologie
+    TopoJSON quantifiée sur `quantization` pas dans chaque direction.
+    """
+    all_rings = [ring for geometry in geometries.values() for ring in _rings(geometry)]
+    coords = [point for ring in all_rings for point in ring]
+    if coords:
+        x0 = min(point[0] for point in coords)
+        y0 = min(point[1] for point in coords)
+        kx = (max(point[0] for point in coords) - x0) / (quantization - 1) or 1.0
+        ky = (max(point[1] for point in coords) - y0) / (quantization - 1) or 1.0
+    else:
+        x0, y0, kx, ky = 0.0, 0.0, 1.0, 1.0
+
+    def quantize(ring: List[List[float]]) -> List[Point]:
+        points: List[Point] = []
+        for x, y, *_ in ring:
+            point = (round((x - x0) / kx), round((y - y0) / ky))
+            if not points or point != points[-1]:
+                points.append(point)
+        # Contour ouvert : le dernier point, égal au premier, est retiré
+        if len(points) > 1 and points[0] == points[-1]:
+            points.pop()
+        return points
+
+    quantized = {id(ring): quantize(ring) for ring in all_rings}
+
+    # Un point est une jonction s'il n'a pas toujours les mêmes voisins
+    neighbours: Dict[Point, Tuple[Point, Point]] = {}
+    junctions = set()
+    for ring in quantized.values():
+        if len(ring) < 3:
+            continue
+        for i, point in enumerate(ring):
+            pair = tuple(sorted((ring[i - 1], ring[(i + 1) % len(ring)])))
+            if neighbours.setdefault(point, pair) != pair:
+                junctions.add(point)
+
+    builder = _ArcBuilder(junctions)
+
+    def encode_polygon(rings: List[List[List[float]]]) -> List[List[int]]:
+        encoded = [quantized[id(ring)] for ring in rings]
+        return [builder.ring(ring) for ring in encoded if len(ring) >= 3]
+
+    def encode(geometry: Dict[str, Any]) -> Dict[str, Any]:
+        if geometry is None:
+            return {"type": None}
+        kind = geometry["type"]
+        if kind == "Polygon":
+            return {"type": "Polygon", "arcs": encode_polygon(geometry["coordinates"])}
+        if kind == "MultiPolygon":
+            return {"type": "MultiPolygon", "arcs": [encode_polygon(polygon) for polygon in geometry["coordinates"]]}
+        if kind == "GeometryCollection":
+            return {"type": "GeometryCollection", "geometries": [encode(member) for member in geometry["geometries"]]}
+        raise ValueError(f"Type de géométrie non supporté: {kind}")
+
+    objects = {name: encode(geometry) for name, geometry in geometries.items()}
+
+    arcs = []
+    for arc in builder.arcs:
+        deltas = [list(arc[0])]
+        deltas.extend([b[0] - a[0], b[1] - a[1]] for a, b in zip(arc, arc[1:]))
+        arcs.append(deltas)
+
+    return {
+        "type": "Topology",
+        "transform": {"scale": [kx, ky], "translate": [x0, y0]},
+        "objects": objects,
+        "arcs": arcs,
+    }
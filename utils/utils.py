@@ -1,16 +1,53 @@
 # utils/utils.py
 from math import atan2, degrees
-from typing import Tuple, Dict, Union
+from typing import Tuple, Dict, Union, List
 import requests
-from shapely.geometry import shape, Polygon
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+import json
+import math
+import numpy as np
+import shapely
+from shapely.geometry import shape, mapping, Polygon
+from shapely.geometry.base import BaseGeometry
 from functools import wraps
 from time import time
 from flask import jsonify
 import logging
+import threading
+
+from utils.cache import LRUCache
+from utils.metrics import metrics
+from utils.np_utils import to_mercator, to_wgs84
+
+CONFIG_FILE: str = "data/config.json"
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 
+_config_overrides: Dict[str, Dict] = {}
+
+def load_config(section: str, defaults: Dict = None) -> Dict:
+    """
+    Charge une section du fichier de configuration, complétée par les valeurs par défaut.
+    """
+    config = dict(defaults or {})
+    try:
+        with open(CONFIG_FILE) as infile:
+            config.update(json.load(infile).get(section, {}))
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        raise RuntimeError(f"Erreur lors du chargement de la configuration '{section}': {e}")
+    config.update(_config_overrides.get(section, {}))
+    return config
+
+def set_config(section: str, values: Dict) -> None:
+    """
+    Surcharge en mémoire une section de la configuration (benchmarks, outils en ligne de commande).
+    """
+    _config_overrides.setdefault(section, {}).update(values)
+
 def get_angle_fuite(direction: Union[str, int]) -> Union[float, None]:
     """
     Obtient l'angle de fuite en fonction de la direction donnée.
@@ -23,15 +60,112 @@ def get_angle_fuite(direction: Union[str, int]) -> Union[float, None]:
         return float(direction)
     raise RuntimeError(f"Il y a une erreur dans get_direction_fuite pour la direction suivante : {direction}")
 
-def get_isochrone(center_coords: Tuple[float, float], time_lim: int) -> Polygon:
+ISOCHRONE_CACHE_DEFAULTS: Dict = {
+    "enabled": True,
+    "grid": 0.001,
+    "max_size": 256,
+    "ttl": 24 * 3600,
+    "path": None,
+}
+
+GRAPHHOPPER_DEFAULTS: Dict = {
+    "url": "http://localhost:8989",
+    "connect_timeout": 3.0,
+    "read_timeout": 30.0,
+    "pool_maxsize": 10,
+    "max_workers": 3,
+}
+
+_http_session: Union[requests.Session, None] = None
+_http_lock = threading.Lock()
+
+_isochrone_cache: Union[LRUCache, None] = None
+_isochrone_cache_lock = threading.Lock()
+
+def get_isochrone_cache() -> Union[LRUCache, None]:
+    """
+    Retourne le cache des isochrones du processus (None s'il est désactivé dans la configuration).
+    """
+    global _isochrone_cache
+    params = load_config("isochrone_cache", ISOCHRONE_CACHE_DEFAULTS)
+    if not params["enabled"]:
+        return None
+    if _isochrone_cache is None:
+        with _isochrone_cache_lock:
+            if _isochrone_cache is None:
+                _isochrone_cache = LRUCache(params["max_size"], params["ttl"], params["path"])
+    return _isochrone_cache
+
+def snap_coords(coords: Tuple[float, float], grid: float) -> Tuple[float, float]:
+    """
+    Arrondit des coordonnées (lat, lon) sur une grille de pas `grid` degrés.
+    """
+    if not grid:
+        return coords
+    decimals = max(0, -int(f"{grid:e}".split("e")[1]))
+    return tuple(round(round(c / grid) * grid, decimals + 1) for c in coords)
+
+def get_http_session() -> requests.Session:
+    """
+    Retourne la session HTTP du processus (connexions keep-alive réutilisées vers GraphHopper).
+    """
+    global _http_session
+    if _http_session is None:
+        with _http_lock:
+            if _http_session is None:
+                params = load_config("graphhopper", GRAPHHOPPER_DEFAULTS)
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=params["pool_maxsize"])
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _http_session = session
+    return _http_session
+
+def get_isochrones(center_coords: Tuple[float, float], time_limits: List[int], profile: str = "car") -> List[Polygon]:
+    """
+    Renvoie les polygones isochrones pour plusieurs durées, demandés en parallèle.
+    Les polygones sont retournés dans l'ordre de `time_limits`.
+    Chaque appel a son propre pool de threads : les calculs concurrents (jobs du serveur web)
+    ne se disputent pas un pool partagé et n'attendent pas les requêtes des autres.
+    """
+    if len(time_limits) <= 1:
+        return [get_isochrone(center_coords, time_lim, profile) for time_lim in time_limits]
+    params = load_config("graphhopper", GRAPHHOPPER_DEFAULTS)
+    with ThreadPoolExecutor(max_workers=min(params["max_workers"], len(time_limits)), thread_name_prefix="isochrone") as executor:
+        futures = [executor.submit(get_isochrone, center_coords, time_lim, profile) for time_lim in time_limits]
+        return [future.result() for future in futures]
+
+def get_isochrone(center_coords: Tuple[float, float], time_lim: int, profile: str = "car") -> Polygon:
     """
     Renvoie un polygone isochrone.
+    Les résultats sont mis en cache, indexés par les coordonnées arrondies sur une grille, la durée et le profil.
+    """
+    cache = get_isochrone_cache()
+    if cache is not None:
+        center_coords = snap_coords(center_coords, load_config("isochrone_cache", ISOCHRONE_CACHE_DEFAULTS)["grid"])
+        key = (*center_coords, time_lim, profile)
+        cached = cache.get(key)
+        metrics.inc("cache_requests_total", cache="isochrone", result="miss" if cached is None else "hit")
+        if cached is not None:
+            logging.debug(f"Isochrone en cache pour le centre {center_coords} et le temps {time_lim}")
+            return shape(cached)
+
+    with metrics.span("isochrone_request", profile=profile):
+        polygon = _request_isochrone(center_coords, time_lim, profile)
+    if cache is not None:
+        cache.set(key, mapping(polygon))
+    return polygon
+
+def _request_isochrone(center_coords: Tuple[float, float], time_lim: int, profile: str) -> Polygon:
+    """
+    Demande un polygone isochrone au serveur GraphHopper.
     """
     lat, lon = center_coords
-    url: str = f'http://localhost:8989/isochrone?point={lat},{lon}&time_limit={time_lim}&profile=car'
+    params = load_config("graphhopper", GRAPHHOPPER_DEFAULTS)
+    url: str = f'{params["url"]}/isochrone?point={lat},{lon}&time_limit={time_lim}&profile={profile}'
     try:
         logging.debug(f"Requesting isochrone for center {center_coords} with time limit {time_lim}")
-        response = requests.get(url)
+        response = get_http_session().get(url, timeout=(params["connect_timeout"], params["read_timeout"]))
         response.raise_for_status()
         isochrone: Dict = response.json()
         polygon_feature = isochrone.get('polygons', [None])[0]
@@ -47,6 +181,38 @@ def get_isochrone(center_coords: Tuple[float, float], time_lim: int) -> Polygon:
         logging.error(f"Erreur dans get_isochrone: {e}")
         raise RuntimeError(f"Erreur dans get_isochrone: {e}")
 
+GEOMETRY_DEFAULTS: Dict = {
+    # Tolérance de simplification des isochrones, en mètres au sol (0 pour désactiver)
+    "simplify_tolerance": 20.0,
+}
+
+def to_mercator_geometry(geometry: BaseGeometry) -> BaseGeometry:
+    """
+    Projette une géométrie EPSG:4326 (lon, lat) en EPSG:3857.
+    """
+    return shapely.transform(geometry, lambda coords: np.column_stack(to_mercator(coords[:, 1], coords[:, 0])))
+
+def to_wgs84_geometry(geometry: BaseGeometry) -> BaseGeometry:
+    """
+    Projette une géométrie EPSG:3857 en EPSG:4326 (lon, lat).
+    """
+    def project(coords: np.ndarray) -> np.ndarray:
+        lat, lon = to_wgs84(coords[:, 0], coords[:, 1])
+        return np.column_stack((lon, lat))
+    return shapely.transform(geometry, project)
+
+def simplify_geometry(geometry: BaseGeometry, tolerance: float = None) -> BaseGeometry:
+    """
+    Simplifie une géométrie EPSG:3857 en préservant sa topologie. `tolerance` est en mètres au sol :
+    elle est convertie en unités EPSG:3857, dilatées d'un facteur 1 / cos(lat) à la latitude de la géométrie.
+    """
+    if tolerance is None:
+        tolerance = load_config("geometry", GEOMETRY_DEFAULTS)["simplify_tolerance"]
+    if not tolerance or geometry.is_empty:
+        return geometry
+    lat, _ = to_wgs84(0.0, geometry.centroid.y)
+    return geometry.simplify(tolerance / math.cos(math.radians(lat)), preserve_topology=True)
+
 def measure_time(f):
     @wraps(f)
     def wrapper(*args, **kwargs):
@@ -1,6 +1,9 @@
 # web/__init__.py
 
 from .web_utils import load_data, save_data, load_menu, load_advanced_menu
+from .jobs import JobQueue, Job, QueueFullError
+from .bootstrap import AppMetadata, validate_modes
+from .encoding import encode_result, json_response, TOPOJSON_MIMETYPE
 from .webapp import app
 
-__all__ = ["load_data", "save_data", "load_menu", "load_advanced_menu", "app"]
+__all__ = ["load_data", "save_data", "load_menu", "load_advanced_menu", "JobQueue", "Job", "QueueFullError", "encode_result", "json_response", "TOPOJSON_MIMETYPE", "AppMetadata", "validate_modes", "app"]
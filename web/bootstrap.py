@@ -0,0 +1,104 @@
+# web/bootstrap.py
+"""
+Préparation de l'application au démarrage : fonctions SQL installées une fois, stratégies validées,
+attributs de filtered_nodes et menus HTML calculés une fois puis servis depuis la mémoire.
+Les stratégies sont rechargées quand le fichier change (date de modification), sans autre travail par requête.
+"""
+import os
+import logging
+import threading
+from typing import Any, Callable, Dict, List
+
+from web.web_utils import load_data, load_menu, load_advanced_menu
+
+# Clés numériques obligatoires d'une stratégie, en plus de "weights"
+STRATEGY_PARAMETERS: tuple = ("points_repeltion", "points_repeltion_alpha", "direction_alpha")
+# Attributs calculés par Epeire, utilisables dans les poids en plus des attributs de filtered_nodes
+DYNAMIC_FEATURES: tuple = ("distance_to_start", "difference_angle")
+# Libellés des attributs dynamiques dans le menu avancé
+DYNAMIC_LABELS: List[str] = ["distance de l'origine", "angle"]
+
+def validate_modes(modes: Dict[str, Any], attrs: List[str]) -> None:
+    """
+    Vérifie que chaque stratégie a ses paramètres numériques et des poids portant sur des attributs connus.
+    """
+    if not isinstance(modes, dict) or not modes:
+        raise ValueError("aucune stratégie définie")
+    known = set(attrs) | set(DYNAMIC_FEATURES)
+    for name, strategie in modes.items():
+        for key in STRATEGY_PARAMETERS:
+            if not isinstance(strategie.get(key), (int, float)):
+                raise ValueError(f"stratégie '{name}': paramètre '{key}' manquant ou non numérique")
+        weights = strategie.get("weights")
+        if not isinstance(weights, dict):
+            raise ValueError(f"stratégie '{name}': poids manquants")
+        for attr, weight in weights.items():
+            if attrs and attr not in known:
+                raise ValueError(f"stratégie '{name}': attribut inconnu '{attr}'")
+            if not isinstance(weight, (int, float)):
+                raise ValueError(f"stratégie '{name}': poids non numérique pour '{attr}'")
+
+class AppMetadata:
+    """
+    Stratégies, attributs et menus de l'application, rechargés seulement quand le fichier des stratégies change.
+    Si le nouveau fichier est invalide, la dernière version valide continue d'être servie.
+    """
+    def __init__(self, modes_file: str, attrs_loader: Callable[[], List[str]]) -> None:
+        self.modes_file = modes_file
+        self.attrs_loader = attrs_loader
+        self._lock = threading.Lock()
+        self._mtime: int = None
+        self._attrs: List[str] = None
+        self.modes: Dict[str, Any] = {}
+        self.basic_menu: str = ""
+        self.advanced_menu: str = ""
+
+    @property
+    def attrs(self) -> List[str]:
+        """
+        Attributs de score de filtered_nodes, lus une seule fois (nouvelle tentative si la base était indisponible).
+        """
+        if self._attrs is None:
+            try:
+                self._attrs = list(self.attrs_loader())
+                self.advanced_menu = load_advanced_menu(self._attrs + DYNAMIC_LABELS)
+            except Exception as e:
+                logging.warning(f"Attributs de filtered_nodes indisponibles: {e}")
+                return []
+        return self._attrs
+
+    def load(self) -> None:
+        """
+        Charge et valide les stratégies, puis construit les menus. Lève une erreur si le fichier est invalide.
+        """
+        with self._lock:
+            mtime = os.stat(self.modes_file).st_mtime_ns
+            modes = load_data(self.modes_file)
+            attrs = self.attrs
+            validate_modes(modes, attrs)
+            self.modes = modes
+            self.basic_menu = load_menu(modes)
+            self.advanced_menu = load_advanced_menu(attrs + DYNAMIC_LABELS)
+            self._mtime = mtime
+
+    def refresh(self) -> "AppMetadata":
+        """
+        Recharge les stratégies si le fichier a été modifié depuis le dernier chargement, ou si les attributs
+        de filtered_nodes n'ont pas encore pu être lus : menu avancé et validation des poids sont alors refaits.
+        """
+        try:
+            if os.stat(self.modes_file).st_mtime_ns != self._mtime or self._attrs is None:
+                self.load()
+        except Exception as e:
+            if self._mtime is None:
+                raise RuntimeError(f"Erreur lors du chargement des stratégies: {e}")
+            logging.error(f"Stratégies invalides dans '{self.modes_file}', dernière version conservée: {e}")
+            # Pas de nouvelle tentative avant la prochaine modification du fichier
+            self._mtime = os.stat(self.modes_file).st_mtime_ns if os.path.exists(self.modes_file) else self._mtime
+        return self
+
+    def strategie(self, name: str) -> Dict[str, Any]:
+        """
+        Retourne la stratégie `name`, ou None si elle n'existe pas.
+        """
+        return self.refresh().modes.get(name)
@@ -0,0 +1,71 @@
+# web/encoding.py
+"""
+Négociation du format des réponses : JSON GeoJSON par défaut, ou topologie quantifiée (TopoJSON) si le client
+la demande par l'en-tête Accept ; compression gzip ou brotli selon Accept-Encoding.
+"""
+import gzip
+import json
+from flask import Response, request
+from typing import Any, Dict
+
+from utils.utils import load_config
+from utils.topology import to_topology
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+TOPOJSON_MIMETYPE: str = "application/vnd.epeire.topo+json"
+# Géométries d'un résultat d'Epeire, encodées ensemble pour partager leurs bordures communes
+GEOMETRY_KEYS: tuple = ("isoA", "isoB", "isoC", "valid_zone", "zpp")
+
+ENCODING_DEFAULTS: Dict = {
+    "quantization": 100_000,
+    "compress_min_size": 1024,
+    "gzip_level": 6,
+    "brotli_quality": 5,
+}
+
+def wants_topology() -> bool:
+    """
+    Indique si le client préfère la topologie quantifiée au GeoJSON.
+    """
+    return request.accept_mimetypes.best_match(["application/json", TOPOJSON_MIMETYPE]) == TOPOJSON_MIMETYPE
+
+def encode_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Remplace les géométries d'un résultat par une clé "topology" si le client l'a demandée.
+    """
+    if not wants_topology() or not any(key in result for key in GEOMETRY_KEYS):
+        return result
+    params = load_config("encoding", ENCODING_DEFAULTS)
+    geometries = {key: result[key] for key in GEOMETRY_KEYS if key in result}
+    encoded = {key: value for key, value in result.items() if key not in GEOMETRY_KEYS}
+    encoded["topology"] = to_topology(geometries, params["quantization"])
+    return encoded
+
+def json_response(payload: Any, status: int = 200) -> Response:
+    """
+    Sérialise une réponse en JSON compact, compressée avec brotli ou gzip si le client l'accepte.
+    """
+    params = load_config("encoding", ENCODING_DEFAULTS)
+    body = json.dumps(payload, separators=(",", ":")).encode()
+    mimetype = TOPOJSON_MIMETYPE if isinstance(payload, dict) and _has_topology(payload) else "application/json"
+    response = Response(body, status=status, mimetype=mimetype)
+    response.vary.add("Accept")
+    response.vary.add("Accept-Encoding")
+
+    if len(body) < params["compress_min_size"]:
+        return response
+    encodings = request.accept_encodings
+    if brotli is not None and encodings["br"]:
+        response.set_data(brotli.compress(body, quality=params["brotli_quality"]))
+        response.content_encoding = "br"
+    elif encodings["gzip"]:
+        response.set_data(gzip.compress(body, compresslevel=params["gzip_level"]))
+        response.content_encoding = "gzip"
+    return response
+
+def _has_topology(payload: Dict[str, Any]) -> bool:
+    return "topology" in payload or (isinstance(payload.get("result"), dict) and "topology" in payload["result"])
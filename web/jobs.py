@@ -0,0 +1,94 @@
+# web/jobs.py
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from time import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+class QueueFullError(RuntimeError):
+    """
+    Levée quand la file d'attente des tâches est pleine.
+    """
+
+class Job:
+    """
+    Tâche soumise à la file : état, résultat ou erreur, et événement de fin.
+    """
+    def __init__(self, key: Hashable) -> None:
+        self.id: str = uuid.uuid4().hex
+        self.key = key
+        self.status: str = "queued"
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created: float = time()
+        self.finished: Optional[float] = None
+        self.done = threading.Event()
+
+    def to_dict(self) -> Dict[str, Any]:
+        job = {"job_id": self.id, "status": self.status}
+        if self.status == "done":
+            job["result"] = self.result
+        elif self.status == "error":
+            job["error"] = self.error
+        return job
+
+class JobQueue:
+    """
+    File de tâches exécutées par un nombre borné de workers.
+    Le nombre de tâches en attente ou en cours est limité (au-delà, QueueFullError) et
+    une tâche identique à une tâche en cours n'est pas relancée : la tâche existante est retournée.
+    Les tâches terminées sont conservées `ttl` secondes.
+    """
+    def __init__(self, max_workers: int = 4, max_pending: int = 32, ttl: float = 600) -> None:
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="epeire-job")
+        self._jobs: Dict[str, Job] = {}
+        self._in_flight: Dict[Hashable, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key: Hashable, func: Callable, *args, **kwargs) -> Job:
+        """
+        Soumet `func(*args, **kwargs)` et retourne la tâche associée (ou la tâche identique déjà en cours).
+        """
+        with self._lock:
+            self._purge()
+            job = self._in_flight.get(key)
+            if job is not None:
+                return job
+            if len(self._in_flight) >= self.max_pending:
+                raise QueueFullError(f"File d'attente pleine ({self.max_pending} tâches en cours)")
+            job = Job(key)
+            self._jobs[job.id] = job
+            self._in_flight[key] = job
+        self._executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def _run(self, job: Job, func: Callable, args: tuple, kwargs: dict) -> None:
+        job.status = "running"
+        try:
+            job.result = func(*args, **kwargs)
+            job.status = "done"
+        except Exception as e:
+            logging.error(f"Erreur dans la tâche {job.id}: {e}")
+            job.error = str(e)
+            job.status = "error"
+        finally:
+            job.finished = time()
+            with self._lock:
+                self._in_flight.pop(job.key, None)
+            job.done.set()
+
+    def _purge(self) -> None:
+        expired = [job_id for job_id, job in self._jobs.items() if job.finished and time() - job.finished > self.ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"in_flight": len(self._in_flight), "max_pending": self.max_pending, "stored": len(self._jobs)}
@@ -1,11 +1,21 @@
 # web/webapp.py
-from flask import Flask, render_template, request, jsonify
-from geopy.geocoders import Nominatim
-from web.web_utils import load_data, load_menu, load_advanced_menu
-from utils.utils import measure_time, time_to_seconds
-from utils.db_utils import get_db_attributes
-from core.epeire import Epeire
-from typing import Dict, Union
+from flask import Flask, render_template, request, jsonify, Response
+import json
+import hashlib
+from time import time as now
+from web.bootstrap import AppMetadata
+from web.jobs import JobQueue, QueueFullError
+from web.encoding import encode_result, json_response
+from utils.utils import measure_time, time_to_seconds, load_config, get_isochrone_cache
+from utils.cache import LRUCache
+from utils.geocoding import geocode, get_geocoding_cache
+from utils.metrics import metrics
+from utils.db_utils import get_db_attributes, install_database_functions, NON_FEATURE_COLUMNS
+from core.epeire import Epeire, BATCH_ENGINES
+from core.node_store import NodeStore
+from core.road_graph import RoadGraph, ROAD_GRAPH_DEFAULTS
+from typing import Dict, List, Union, Any
+import logging
 
 app = Flask(__name__, template_folder="../templates", static_folder="../static")
 
@@ -18,8 +28,81 @@ except Exception as e:
 
 modes_file: str = 'data/modes.json'
 
-# Configuration du géocodeur
-geolocator = Nominatim(user_agent="e-pervier")
+JOBS_DEFAULTS: Dict = {
+    "max_workers": 4,
+    "max_pending": 32,
+    "ttl": 600,
+    "max_wait": 30,
+}
+jobs_params = load_config("jobs", JOBS_DEFAULTS)
+jobs = JobQueue(jobs_params["max_workers"], jobs_params["max_pending"], jobs_params["ttl"])
+
+RESULT_CACHE_DEFAULTS: Dict = {
+    "max_size": 512,
+    "ttl": 3600,
+}
+result_cache_params = load_config("result_cache", RESULT_CACHE_DEFAULTS)
+result_cache = LRUCache(result_cache_params["max_size"], result_cache_params["ttl"])
+
+# Magasin de nœuds en mémoire partagée : s'il est configuré, les zones sont extraites sans PostGIS
+NODE_STORE_DEFAULTS: Dict = {
+    "path": None,
+}
+node_store_params = load_config("node_store", NODE_STORE_DEFAULTS)
+node_store = NodeStore(node_store_params["path"]) if node_store_params["path"] else None
+
+# Graphe routier local : s'il est configuré, isochrones et zones sont calculées sans GraphHopper ni PostGIS
+road_graph_params = load_config("road_graph", ROAD_GRAPH_DEFAULTS)
+road_graph = RoadGraph(road_graph_params["path"]) if road_graph_params["path"] else None
+
+def load_feature_attrs() -> List[str]:
+    """
+    Attributs de score proposés dans le menu avancé : ceux du graphe routier, du magasin de nœuds ou de filtered_nodes.
+    """
+    if road_graph is not None:
+        return road_graph.attrs
+    if node_store is not None:
+        return node_store.attrs
+    return get_db_attributes(blacklist=NON_FEATURE_COLUMNS)
+
+# Stratégies, attributs et menus préparés une fois au démarrage (voir web/bootstrap.py)
+metadata = AppMetadata(modes_file, load_feature_attrs)
+
+def bootstrap() -> None:
+    """
+    Prépare l'application : fonctions SQL installées et stratégies validées avant la première requête.
+    """
+    if node_store is None and road_graph is None:
+        try:
+            install_database_functions()
+        except Exception as e:
+            # La base peut démarrer après l'application : Epeire réessaiera à sa première utilisation
+            logging.warning(f"Installation des fonctions SQL différée: {e}")
+    metadata.refresh()
+
+bootstrap()
+
+# Instrumentation (spans, histogrammes, compteurs) exposée sur /metrics
+metrics.enabled = load_config("metrics", {"enabled": False})["enabled"]
+
+def collect_caches() -> Dict[tuple, float]:
+    """
+    Taille et compteurs de succès/échecs des caches, lus au moment de l'export des métriques.
+    """
+    caches = {"result": result_cache, "isochrone": get_isochrone_cache(), "geocoding": get_geocoding_cache()}
+    values = {}
+    for name, cache in caches.items():
+        if cache is None:
+            continue
+        for stat, value in cache.stats().items():
+            values[(("cache", name), ("stat", stat))] = value
+    return values
+
+def collect_jobs() -> Dict[tuple, float]:
+    return {(("stat", stat),): value for stat, value in jobs.stats().items()}
+
+metrics.register_collector("cache", collect_caches)
+metrics.register_collector("jobs", collect_jobs)
 
 @app.route('/')
 def index() -> str:
@@ -27,12 +110,8 @@ def index() -> str:
     Affiche la page d'accueil avec les menus de stratégies de base et avancées.
     """
     try:
-        modes = load_data(modes_file)
-        basic = load_menu(modes)
-        attrs = get_db_attributes(blacklist=['id', 'osmid', 'geometry'])
-        attrs += ["distance de l'origine", "angle"]  # TODO Comment faire ça dynamiquement ?
-        advanced = load_advanced_menu(attrs)
-        return render_template('index.html', strategie_basic=basic, strategie_advanced=advanced)
+        metadata.refresh()
+        return render_template('index.html', strategie_basic=metadata.basic_menu, strategie_advanced=metadata.advanced_menu)
     except Exception as e:
         return f"Erreur lors du chargement de la page d'accueil: {e}"
 
@@ -44,14 +123,94 @@ def chercher() -> Dict[str, Union[float, str]]:
     """
     try:
         adresse = request.form.get('adresse')
-        location = geolocator.geocode(adresse, timeout=10)
-        if location:
-            return jsonify({'lat': location.latitude, 'lon': location.longitude})
-        else:
-            return jsonify({'error': 'Adresse non trouvée'}), 404
+        lat, lon = geocode(adresse)
+        return jsonify({'lat': lat, 'lon': lon})
+    except ValueError:
+        return jsonify({'error': 'Adresse non trouvée'}), 404
     except Exception as e:
         return jsonify({'error': f"Erreur lors de la recherche d'adresse: {e}"}), 500
 
+def read_submission(form) -> Dict[str, Any]:
+    """
+    Lit et valide les champs du formulaire principal.
+    """
+    strategie = form.get('strategie')
+    strat = metadata.strategie(strategie)
+    if strat is None:
+        raise ValueError('Stratégie invalide')
+
+    lat = form.get("lat")
+    lon = form.get("lon")
+    return {
+        "adresse": form.get('adresse'),
+        # Coordonnées déjà résolues par /chercher : pas de second géocodage
+        "coords": (float(lat), float(lon)) if lat and lon else None,
+        "time": time_to_seconds(form.get('temps_fuite')),
+        "dt": time_to_seconds(form.get("dt", "00:10")),
+        "direction_fuite": form.get('direction_fuite'),
+        "strategie": strat,
+        "num": int(form.get("num", "0")),
+        # Moteur en mémoire par défaut : mêmes points que le moteur SQL, et la zone préparée est réutilisée
+        "engine": form.get("engine", "numpy"),
+        "normalization": form.get("normalization", "zone"),
+        "seed": int(form["seed"]) if form.get("seed") else None,
+    }
+
+def result_key(params: Dict[str, Any]) -> tuple:
+    """
+    Clé du cache des résultats : tout ce qui détermine les points retournés, graine comprise.
+    """
+    strategie = hashlib.sha1(json.dumps(params["strategie"], sort_keys=True).encode()).hexdigest()
+    return (
+        *params["coords"], params["time"], params["dt"], params["direction_fuite"],
+        strategie, params["num"], params["seed"], params["engine"], params["normalization"],
+    )
+
+def default_seed(params: Dict[str, Any]) -> int:
+    """
+    Graine d'une soumission qui n'en fournit pas : dérivée de tous les autres champs de la clé du cache,
+    pour que deux soumissions identiques retournent les mêmes points et soient servies par le cache.
+    """
+    key = json.dumps(result_key({**params, "seed": None}))
+    return int(hashlib.sha1(key.encode()).hexdigest()[:8], 16) % 2**31
+
+def run_investigation(params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Exécute le calcul complet d'Epeire : isochrones, zone valide et sélection des points.
+    La graine utilisée est retournée avec le résultat ; un calcul déjà fait avec la même graine est servi depuis le cache.
+    """
+    params = dict(params)
+    if params["coords"] is None:
+        params["coords"] = geocode(params["adresse"])
+    if (node_store is not None or road_graph is not None) and params["engine"] == "sql":
+        # Même résultat que le moteur SQL, calculé en mémoire
+        params["engine"] = "numpy"
+    if params["seed"] is None:
+        params["seed"] = default_seed(params)
+
+    key = result_key(params)
+    cached = result_cache.get(key)
+    if cached is not None:
+        return dict(cached)
+
+    with metrics.span("investigation"):
+        with Epeire(params["adresse"], params["direction_fuite"], params["coords"], params["normalization"], node_store, road_graph) as epeire:
+            # Zone préparée réutilisée quand seuls la stratégie ou le nombre de points changent
+            result = epeire.get_graph_from_isochrones(params["time"], params["dt"], reuse=params["engine"] != "sql")
+            points = epeire.select_points(params["strategie"], params["num"], params["engine"], params["seed"])
+
+    result = {**result, "points": points, "seed": params["seed"]}
+    result_cache.set(key, dict(result))
+    return result
+
+def timed_investigation(params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Exécute run_investigation et ajoute la durée du calcul au résultat.
+    """
+    start_time = now()
+    result = run_investigation(params)
+    return {**result, "dt": now() - start_time}
+
 @app.route('/submit', methods=['POST'])
 @measure_time
 def submit_form() -> Union[str, Dict]:
@@ -59,28 +218,101 @@ def submit_form() -> Union[str, Dict]:
     Traite le formulaire soumis, calcule des points et retourne le résultat en JSON.
     """
     try:
-        adresse = request.form.get('adresse')
-        temps_fuite = request.form.get('temps_fuite')
-        direction_fuite = request.form.get('direction_fuite')
-        strategie = request.form.get('strategie')
-        num = int(request.form.get("num", "0"))
-        delta_time = request.form.get("dt", "00:10")
-        modes = load_data(modes_file)
-
-        time = time_to_seconds(temps_fuite)
-        dt = time_to_seconds(delta_time)
-        strat = modes.get(strategie)
-        if strat is None:
-            return {'error': 'Stratégie invalide'}, 400
-
-        epeire = Epeire(adresse, direction_fuite)
-        result = epeire.get_graph_from_isochrones(time, dt)
-        
-        points = epeire.select_points(strat, num)
-        
-        return {**result, "points": points}
+        params = read_submission(request.form)
+    except ValueError as e:
+        return {'error': str(e)}, 400
+    except Exception as e:
+        return {'error': f"Erreur lors du traitement du formulaire: {e}"}
+
+    try:
+        # Topologie quantifiée et compression négociées avec le client (voir web/encoding.py)
+        return json_response(encode_result(timed_investigation(params)))
     except Exception as e:
         return {'error': f"Erreur lors du traitement du formulaire: {e}"}
 
+@app.route('/batch', methods=['POST'])
+@measure_time
+def submit_batch() -> Union[str, Dict]:
+    """
+    Calcule plusieurs scénarios d'une même affaire (stratégies, temps de fuite, nombres de points)
+    en partageant les isochrones et l'extraction des nœuds. Corps JSON :
+    {"adresse" ou "lat"/"lon", "direction_fuite", "scenarios": [{"strategie", "temps_fuite", "dt", "num", "seed", "engine"}]}
+    """
+    try:
+        data = request.get_json(force=True)
+        modes = metadata.refresh().modes
+        scenarios = []
+        for scenario in data["scenarios"]:
+            strat = modes.get(scenario.get("strategie"))
+            if strat is None:
+                return {'error': f"Stratégie invalide: {scenario.get('strategie')}"}, 400
+            engine = scenario.get("engine", "numpy")
+            if engine not in BATCH_ENGINES:
+                return {'error': f"Moteur de calcul invalide: {engine}"}, 400
+            scenarios.append({
+                "strategie": strat,
+                "time": time_to_seconds(scenario["temps_fuite"]),
+                "dt": time_to_seconds(scenario.get("dt", "00:10")),
+                "num": int(scenario.get("num", 0)),
+                "seed": scenario.get("seed"),
+                "engine": engine,
+            })
+        coords = (float(data["lat"]), float(data["lon"])) if data.get("lat") and data.get("lon") else None
+    except Exception as e:
+        return {'error': f"Erreur lors de la lecture des scénarios: {e}"}, 400
+
+    try:
+        with Epeire(data.get("adresse"), data.get("direction_fuite"), coords, data.get("normalization", "zone"), node_store, road_graph) as epeire:
+            return json_response(epeire.select_points_batch(scenarios))
+    except Exception as e:
+        return {'error': f"Erreur lors du traitement des scénarios: {e}"}
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Soumet le formulaire comme tâche asynchrone et retourne immédiatement son identifiant.
+    Une requête identique à une tâche en cours retourne la tâche existante.
+    """
+    try:
+        params = read_submission(request.form)
+    except Exception as e:
+        return jsonify({'error': f"Erreur lors du traitement du formulaire: {e}"}), 400
+
+    key = json.dumps(params, sort_keys=True)
+    try:
+        job = jobs.submit(key, timed_investigation, params)
+    except QueueFullError as e:
+        response = jsonify({'error': str(e)})
+        response.headers["Retry-After"] = "5"
+        return response, 503
+    return jsonify(job.to_dict()), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id: str):
+    """
+    Retourne l'état d'une tâche ; avec ?wait=s, attend au plus s secondes qu'elle se termine.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Tâche inconnue'}), 404
+    try:
+        wait = float(request.args.get("wait", 0))
+    except ValueError:
+        return jsonify({'error': f"Paramètre wait invalide: {request.args.get('wait')}"}), 400
+    wait = min(max(wait, 0.0), jobs_params["max_wait"])
+    if wait > 0:
+        job.done.wait(wait)
+    payload = job.to_dict()
+    if "result" in payload:
+        payload["result"] = encode_result(payload["result"])
+    return json_response(payload)
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics() -> Response:
+    """
+    Exporte les métriques au format texte Prometheus.
+    """
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 if __name__ == '__main__':
     app.run(debug=True)